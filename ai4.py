@@ -1,5 +1,4 @@
 import os
-import requests
 import json
 import time
 import tkinter as tk
@@ -58,6 +57,12 @@ class ChatApp:
             "presence_penalty": 0.1  # 添加存在惩罚，促进新内容
         }
 
+        # requests（连带 SSL 模块）第一次发消息时才导入
+        try:
+            import requests
+        except ImportError:
+            return "请求出错: 未安装 requests，请先执行 pip install requests"
+
         try:
             # 设置请求超时时间
             response = requests.post(self.API_URL, headers=headers, json=payload, timeout=15)
@@ -0,0 +1,108 @@
+import json
+
+import billing
+import night_audit
+import paging
+import service
+
+# ==== 服务器模式的 JSON 协议 ====
+# server.py 和 client.py 共用的约定。每个 HotelService 公开方法对应一个接口：
+#
+#   POST /api/<方法名>          {"args": [...], "kwargs": {...}}  →  {"result": 返回值}
+#   POST /api/<方法名>/fetch    分页列表取一页，另带 sort / descending / after / before / limit
+#   POST /api/<方法名>/count    分页列表的总数
+#   GET  /api/<方法名>?a=1      只读方法也可以直接用 GET，查询参数作为关键字参数（值都是字符串）
+#   GET  /health                服务器是否在运行、数据库版本
+#
+# 除 /health 和 authenticate 外，每个请求都要在 SESSION_HEADER 头里带上登录时拿到的会话号：
+# authenticate 成功时响应里除了 result（User）还有 "session"。用户管理和夜审（ADMIN_METHODS）
+# 只有管理员的会话能调用；delete_user 的 current_user_id、night_audit 的 audited_by 由服务器按会话填写
+# （SESSION_ARGUMENTS），客户端传来的值不算数。
+#
+# 返回值中的结果类型（Room、Reservation、Bill 等 namedtuple）编码为 {"$type": 类型名, "$fields": [...]}，
+# 客户端还原成同一个类型，界面代码不用区分本地还是远程。*_list() 返回的 PagedList 编码为
+# {"$paged": {...}}（只含排序信息），客户端按需再调 fetch / count 取数据。
+#
+# 业务错误返回 {"error": {"type": 异常类名, "message": 消息}}，HTTP 状态码见 ERROR_STATUS；
+# 客户端抛出 service 中的同名异常，消息与本地调用时一样可以直接展示给用户。
+
+DEFAULT_PORT = 8765
+
+# 可以通过网络调用的方法：HotelService 的公开方法（batch() 跨多次调用的事务不能远程使用）
+METHODS = frozenset(name for name in dir(service.HotelService)
+                    if not name.startswith("_") and name != "batch" and callable(getattr(service.HotelService, name)))
+
+SESSION_HEADER = "X-Hotel-Session"
+
+# 只有管理员能调用的方法（界面里“系统管理”下的功能）
+ADMIN_METHODS = frozenset({"add_user", "update_user", "delete_user", "get_user", "list_users", "user_list",
+                           "night_audit"})
+
+# 由服务器按会话填写的参数：方法名 -> (参数名, 位置参数下标, 取 User 的哪个字段)
+SESSION_ARGUMENTS = {
+    "delete_user": ("current_user_id", 1, "user_id"),
+    "night_audit": ("audited_by", 1, "username"),
+}
+
+# 其他模块的结果类型也会出现在返回值里（check_out 返回 billing.Bill，分页返回 paging.Page 等）
+TYPES = {cls.__name__: cls for cls in (
+    service.Room, service.RoomChanges, service.Customer, service.Reservation, service.Transaction, service.TransactionDetail,
+    service.FinanceSummary, service.User, billing.Bill, billing.FolioLine, night_audit.NightAudit, paging.Page)}
+
+ERROR_STATUS = {
+    "ValidationError": 400,
+    "PermissionDenied": 403,
+    "NotFound": 404,
+    "Conflict": 409,
+    "Busy": 503,
+}
+
+
+def _encodable(value):
+    if isinstance(value, tuple) and hasattr(value, "_fields"):
+        name = type(value).__name__
+        if name not in TYPES:
+            # 未登记的 namedtuple 按字段名编码成对象
+            return {field: _encodable(item) for field, item in zip(value._fields, value)}
+        return {"$type": name, "$fields": [_encodable(item) for item in value]}
+    if isinstance(value, (list, tuple)):
+        return [_encodable(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encodable(item) for key, item in value.items()}
+    if isinstance(value, service.PagedList):
+        return {"$paged": {"sorts": list(value.sorts), "default_sort": value.default_sort,
+                           "default_descending": value.default_descending}}
+    return value
+
+
+def encode(value):
+    """编码成 UTF-8 JSON"""
+    return json.dumps(_encodable(value), ensure_ascii=False).encode("utf-8")
+
+
+def _decode_object(obj):
+    if "$type" in obj and obj["$type"] in TYPES:
+        return TYPES[obj["$type"]](*obj["$fields"])
+    return obj
+
+
+def decode(data):
+    """解码 UTF-8 JSON，结果类型还原成对应的 namedtuple"""
+    return json.loads(data, object_hook=_decode_object)
+
+
+def error_body(error):
+    """业务错误的 (HTTP 状态码, 响应内容)"""
+    name = type(error).__name__
+    status = ERROR_STATUS.get(name, 400 if isinstance(error, service.ServiceError) else 500)
+    return status, {"error": {"type": name, "message": str(error)}}
+
+
+def error_from(body):
+    """把响应中的错误还原成 service 中的异常"""
+    error = body.get("error") or {}
+    cls = getattr(service, error.get("type", ""), None)
+    if not (isinstance(cls, type) and issubclass(cls, service.ServiceError)):
+        cls = service.ServiceError
+    return cls(error.get("message") or "服务器出错")
+# ==== 结束 ====
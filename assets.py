@@ -0,0 +1,72 @@
+import hashlib
+import os
+import sys
+import tkinter as tk
+
+# ==== 图片缓存 ====
+# 登录界面的背景图 1.jpg 是 1080x604 的 JPEG，每次启动都解码再缩放到窗口大小要几十毫秒。
+# 这里把缩放好的结果存成 PNG（Tk 8.6 不用 PIL 就能直接读），以后启动直接加载：
+#   .asset_cache/1-<源文件哈希前16位>-400x300.png
+# 缓存按源文件内容的哈希和目标尺寸命名，换了图片或改了尺寸会自动重新生成，旧文件随之删除。
+# 只有生成缓存时才需要 PIL（Pillow）；缓存已存在时 PIL 没装也能显示背景。
+#
+# 部署时可以先执行 python assets.py 生成缓存，第一次启动也不用缩放。
+
+CACHE_DIR = ".asset_cache"
+LOGIN_BACKGROUND = ("1.jpg", (400, 300))
+
+
+def _digest(path):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read()).hexdigest()[:16]
+
+
+def cached_path(path, size):
+    """path 缩放到 size 后的缓存文件路径（不检查是否存在）"""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    name = f"{stem}-{_digest(path)}-{size[0]}x{size[1]}.png"
+    return os.path.join(os.path.dirname(path), CACHE_DIR, name)
+
+
+def build(path, size):
+    """用 PIL 把 path 缩放到 size 写入缓存，返回缓存文件路径；已是最新时不做任何事"""
+    target = cached_path(path, size)
+    if os.path.exists(target):
+        return target
+    from PIL import Image
+
+    # Pillow 10 删掉了 Image.ANTIALIAS，9.1 起改用 Image.Resampling.LANCZOS
+    lanczos = getattr(Image, "Resampling", Image).LANCZOS
+    with Image.open(path) as image:
+        scaled = image.convert("RGB").resize(size, lanczos)
+
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    scaled.save(target + ".tmp", format="PNG")
+    os.replace(target + ".tmp", target)
+
+    # 同一张图、同一尺寸的旧版本缓存不再需要
+    stem = os.path.splitext(os.path.basename(path))[0]
+    suffix = f"-{size[0]}x{size[1]}.png"
+    for name in os.listdir(directory):
+        old_digest = name[len(stem) + 1:-len(suffix)]
+        if (name.startswith(stem + "-") and name.endswith(suffix) and len(old_digest) == 16
+                and name != os.path.basename(target)):
+            os.remove(os.path.join(directory, name))
+    return target
+
+
+def photo(master, path, size):
+    """path 缩放到 size 后的 tk.PhotoImage，优先读缓存；图片无法加载时返回 None 并在终端说明原因"""
+    try:
+        return tk.PhotoImage(master=master, file=build(path, size))
+    except ImportError:
+        print(f"未安装 Pillow，无法生成 {path} 的缓存图片，请执行 pip install pillow", file=sys.stderr)
+    except (OSError, tk.TclError) as e:
+        print(f"无法加载图片 {path}: {e}", file=sys.stderr)
+    return None
+
+
+if __name__ == "__main__":
+    print(build(*LOGIN_BACKGROUND))
+# ==== 结束 ====
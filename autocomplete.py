@@ -0,0 +1,122 @@
+import tkinter as tk
+
+# ==== 输入提示 ====
+# 在输入框下方弹出候选列表：输入内容变化后（连续按键合并为一次）调用 suggest(text) 取候选，
+# ↑/↓ 选择，回车或单击确定，Esc 或离开输入框时关闭。确定后调用 on_pick(候选)。
+
+DELAY_MS = 80
+MAX_VISIBLE = 8
+
+
+class Autocomplete:
+    """给 ttk.Entry / tk.Entry 加上输入提示
+
+    suggest   suggest(text) -> 候选列表，text 为空时不会调用
+    format    把候选转成列表中显示的文字
+    on_pick   选中候选后的回调
+    """
+
+    def __init__(self, entry, suggest, format, on_pick, delay=DELAY_MS):
+        self.entry = entry
+        self.suggest = suggest
+        self.format = format
+        self.on_pick = on_pick
+        self.delay = delay
+        self._items = []
+        self._popup = None
+        self._listbox = None
+        self._pending = None
+        self._last_text = entry.get()
+
+        entry.bind("<KeyRelease>", self._on_key, add="+")
+        entry.bind("<Down>", lambda event: self._move(1), add="+")
+        entry.bind("<Up>", lambda event: self._move(-1), add="+")
+        entry.bind("<Return>", self._on_return, add="+")
+        entry.bind("<Escape>", lambda event: self.close(), add="+")
+        entry.bind("<FocusOut>", lambda event: entry.after(150, self._close_unless_focused), add="+")
+        entry.bind("<Destroy>", lambda event: self.close(), add="+")
+
+    # ---- 输入 ----
+
+    def _on_key(self, event):
+        text = self.entry.get()
+        if text == self._last_text:
+            return
+        self._last_text = text
+        if self._pending is not None:
+            self.entry.after_cancel(self._pending)
+        self._pending = self.entry.after(self.delay, self._refresh)
+
+    def _refresh(self):
+        self._pending = None
+        text = self.entry.get().strip()
+        self._items = self.suggest(text) if text else []
+        if not self._items:
+            self.close()
+            return
+        self._show()
+
+    def _move(self, step):
+        if self._popup is None:
+            return None
+        current = self._listbox.curselection()
+        index = (current[0] + step) if current else (0 if step > 0 else len(self._items) - 1)
+        index = max(0, min(index, len(self._items) - 1))
+        self._listbox.selection_clear(0, tk.END)
+        self._listbox.selection_set(index)
+        self._listbox.see(index)
+        return "break"
+
+    def _on_return(self, event):
+        if self._popup is None:
+            return None
+        current = self._listbox.curselection()
+        self._pick(current[0] if current else 0)
+        return "break"
+
+    def _pick(self, index):
+        item = self._items[index]
+        self.close()
+        self.on_pick(item)
+        # 回调改写了输入框内容时不应再次弹出提示
+        self._last_text = self.entry.get()
+
+    # ---- 候选列表 ----
+
+    def _show(self):
+        if self._popup is None:
+            self._popup = tk.Toplevel(self.entry)
+            self._popup.overrideredirect(True)
+            self._listbox = tk.Listbox(self._popup, takefocus=0, activestyle="none", exportselection=False)
+            self._listbox.pack(fill=tk.BOTH, expand=True)
+            self._listbox.bind("<ButtonRelease-1>", self._on_click)
+
+        self._listbox.delete(0, tk.END)
+        for item in self._items:
+            self._listbox.insert(tk.END, self.format(item))
+        self._listbox.configure(height=min(len(self._items), MAX_VISIBLE),
+                                width=max(len(self.format(item)) for item in self._items) + 2)
+
+        x = self.entry.winfo_rootx()
+        y = self.entry.winfo_rooty() + self.entry.winfo_height()
+        self._popup.geometry(f"+{x}+{y}")
+        self._popup.lift()
+
+    def _on_click(self, event):
+        index = self._listbox.nearest(event.y)
+        if 0 <= index < len(self._items):
+            self._pick(index)
+
+    def _close_unless_focused(self):
+        if self._popup is not None and self.entry.focus_get() is not self.entry:
+            self.close()
+
+    def close(self):
+        if self._pending is not None:
+            self.entry.after_cancel(self._pending)
+            self._pending = None
+        if self._popup is not None:
+            self._popup.destroy()
+            self._popup = None
+            self._listbox = None
+# ==== 结束 ====
@@ -0,0 +1,28 @@
+# ==== 房间可用性检查 ====
+# 预订按半开区间 [入住日期, 退房日期) 计算，退房当天可以再入住。
+# 占用情况以 room_nights 房晚库存为准（见 inventory.py），在 (room_number, night)
+# 主键上做一次范围查找即可得出结论，与预订天数无关。
+
+def find_conflict(conn, room_number, check_in_date, check_out_date, exclude_reservation_id=None):
+    """返回与 [check_in_date, check_out_date) 冲突的预订 (reservation_id, check_in_date, check_out_date)，没有冲突返回 None
+
+    exclude_reservation_id 用于修改预订时排除预订自身。
+    """
+    query = """
+        SELECT n.reservation_id, r.check_in_date, r.check_out_date
+        FROM room_nights n
+        JOIN reservations r ON r.reservation_id = n.reservation_id
+        WHERE n.room_number = ? AND n.night >= ? AND n.night < ?
+    """
+    params = [room_number, check_in_date, check_out_date]
+    if exclude_reservation_id is not None:
+        query += " AND n.reservation_id != ?"
+        params.append(exclude_reservation_id)
+    query += " LIMIT 1"
+    return conn.execute(query, params).fetchone()
+
+
+def is_room_free(conn, room_number, check_in_date, check_out_date, exclude_reservation_id=None):
+    """房间在 [check_in_date, check_out_date) 内是否空闲"""
+    return find_conflict(conn, room_number, check_in_date, check_out_date, exclude_reservation_id) is None
+# ==== 结束 ====
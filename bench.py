@@ -0,0 +1,516 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import availability
+import db
+import export
+import migrations
+import service
+import statuses
+from statuses import ReservationStatus, RoomStatus
+
+# ==== 性能测试 ====
+# 按固定随机种子生成一个大型酒店的模拟数据（几千间房、几十万客户、上百万条交易）到临时数据库，
+# 然后对热点操作逐一计时，输出 p50/p95/p99，并把结果写成 JSON，便于不同版本之间对比。
+#
+#   python bench.py                                  # 默认规模，结果写到 bench_results.json
+#   python bench.py --rooms 500 --customers 20000 --transactions 100000   # 小规模快速跑一遍
+#   python bench.py --reuse --baseline old.json      # 复用已生成的数据，并与上次结果对比
+#
+#   python bench.py --contention 8                  # 8 个进程同时抢订少量房间，检查有没有重复预订
+#
+# 只会写入 --db 指定的临时数据库，不会碰 hotel.db。
+
+ROOM_TYPES = (("标准间", 288), ("大床房", 328), ("双床房", 358), ("商务间", 458), ("豪华套房", 888))
+CLEAN_STATUSES = ("已清洁", "已清洁", "已清洁", "未清洁")
+CHARGE_TYPES = ("房费", "餐饮", "会议室", "SPA", "迷你吧", "洗衣", "其他")
+SURNAMES = "王李张刘陈杨黄赵吴周徐孙马朱胡郭何高林罗郑梁谢宋唐许韩冯邓曹彭曾肖田董袁潘于蒋蔡余杜叶程苏魏吕丁任沈"
+GIVEN_NAMES = "伟芳娜敏静丽强磊军洋勇艳杰娟涛明超秀霞平刚桂英华玉兰萍红鹏辉建国志文斌浩宇欣怡子涵梓轩"
+ID_CARD_WEIGHTS = (7, 9, 10, 5, 8, 4, 2, 1, 6, 3, 7, 9, 10, 5, 8, 4, 2)
+ID_CARD_CHECK = "10X98765432"
+
+BENCH_PASSWORD = "bench123"
+BATCH = 5000
+
+
+def _id_card(rng):
+    """生成格式和校验位都正确的18位身份证号"""
+    birthday = date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55))
+    body = f"{rng.choice(('110101', '310104', '440305', '330106', '510107'))}{birthday:%Y%m%d}{rng.randrange(1000):03d}"
+    total = sum(int(d) * w for d, w in zip(body, ID_CARD_WEIGHTS))
+    return body + ID_CARD_CHECK[total % 11]
+
+
+def _chunks(rows, size=BATCH):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate(args):
+    """生成模拟数据；返回计时阶段需要用到的样本（房间号、待入住预订等）"""
+    rng = random.Random(args.seed)
+    today = date.today()
+    start = today - timedelta(days=args.days)
+    horizon = today + timedelta(days=60)
+
+    with db.writer() as conn:
+        # 房间
+        rooms = []
+        for floor in range(1, args.rooms // 100 + 2):
+            for n in range(1, 101):
+                if len(rooms) < args.rooms:
+                    rooms.append(floor * 100 + n)
+        conn.executemany(
+            "INSERT INTO rooms (room_number, room_type, price, status, clean_status) VALUES (?, ?, ?, ?, ?)",
+            ((number, *rng.choice(ROOM_TYPES), RoomStatus.AVAILABLE, rng.choice(CLEAN_STATUSES)) for number in rooms))
+
+        # 客户
+        for batch in _chunks(range(args.customers)):
+            conn.executemany(
+                "INSERT INTO customers (name, contact, id_card, points) VALUES (?, ?, ?, ?)",
+                [(rng.choice(SURNAMES) + "".join(rng.choice(GIVEN_NAMES) for _ in range(rng.randint(1, 2))),
+                  f"1{rng.choice('3578')}{rng.randrange(10 ** 9):09d}", _id_card(rng), rng.randrange(5000))
+                 for _ in batch])
+
+        # 预订：每个房间按时间顺序排入互不重叠的入住，过去的已完成、今天在住的已入住、将来的已预订
+        reservations = []
+        nights = []
+        reservation_id = 0
+        occupied = set()
+        for number in rooms:
+            day = start + timedelta(days=rng.randrange(3))
+            while day < horizon:
+                stay = rng.choice((1, 1, 2, 2, 3, 4, 7))
+                check_out = day + timedelta(days=stay)
+                reservation_id += 1
+                if rng.random() < 0.04:
+                    status = ReservationStatus.CANCELED
+                elif check_out <= today:
+                    status = ReservationStatus.COMPLETED
+                elif day <= today:
+                    status = ReservationStatus.CHECKED_IN
+                    occupied.add(number)
+                else:
+                    status = ReservationStatus.RESERVED
+                reservations.append((reservation_id, number, rng.randrange(1, args.customers + 1),
+                                     day.isoformat(), check_out.isoformat(), status))
+                if status != ReservationStatus.CANCELED:
+                    nights.extend((number, (day + timedelta(days=i)).isoformat(), reservation_id)
+                                  for i in range(stay))
+                day = check_out + timedelta(days=rng.choice((0, 0, 1, 1, 2, 3)))
+
+        for batch in _chunks(reservations):
+            conn.executemany("INSERT INTO reservations (reservation_id, room_number, customer_id, check_in_date, "
+                             "check_out_date, status) VALUES (?, ?, ?, ?, ?, ?)", batch)
+        for batch in _chunks(nights):
+            conn.executemany("INSERT INTO room_nights (room_number, night, reservation_id) VALUES (?, ?, ?)", batch)
+        conn.executemany("UPDATE rooms SET status = ? WHERE room_number = ?",
+                         ((RoomStatus.OCCUPIED, number) for number in occupied))
+        reserved_rooms = {r[1] for r in reservations if r[5] == ReservationStatus.RESERVED} - occupied
+        conn.executemany("UPDATE rooms SET status = ? WHERE room_number = ?",
+                         ((RoomStatus.RESERVED, number) for number in reserved_rooms))
+
+        # 交易：挂在已入住/已完成的预订上，日期落在入住期间（营收汇总由触发器同步维护）
+        billable = [r for r in reservations if r[5] in (ReservationStatus.COMPLETED, ReservationStatus.CHECKED_IN)]
+
+        def transactions():
+            for _ in range(args.transactions):
+                r = rng.choice(billable)
+                check_in = date.fromisoformat(r[3])
+                stay = (date.fromisoformat(r[4]) - check_in).days
+                when = datetime.combine(check_in + timedelta(days=rng.randrange(stay)), datetime.min.time()) \
+                    + timedelta(seconds=rng.randrange(8 * 3600, 23 * 3600))
+                charge = rng.choice(CHARGE_TYPES)
+                yield (r[0], round(rng.uniform(20, 1500), 2), when.strftime("%Y-%m-%d %H:%M:%S"), f"{charge} 费用")
+
+        for batch in _chunks(transactions()):
+            conn.executemany("INSERT INTO transactions (reservation_id, amount, transaction_date, description) "
+                             "VALUES (?, ?, ?, ?)", batch)
+
+        conn.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                     ("bench", service.hash_password(BENCH_PASSWORD), "frontdesk"))
+
+    with db.writer() as conn:
+        conn.execute("PRAGMA optimize")
+
+
+def load_samples():
+    """从数据库中取出计时用的样本"""
+    with db.reader() as conn:
+        rooms = [row[0] for row in conn.execute("SELECT room_number FROM rooms")]
+        pending = conn.execute(f"SELECT room_number, customer_id FROM reservations "
+                               f"WHERE status = {int(ReservationStatus.RESERVED)}").fetchall()
+        # 已超住的（--reuse 隔了几天再跑时会有）要先续住才能退房，不作为退房样本
+        in_house = [row[0] for row in conn.execute(
+            f"SELECT DISTINCT room_number FROM reservations WHERE status = {int(ReservationStatus.CHECKED_IN)} "
+            f"AND check_out_date >= ?", (date.today().isoformat(),))]
+        first, last = conn.execute("SELECT MIN(transaction_date), MAX(transaction_date) FROM transactions").fetchone()
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("rooms", "customers", "reservations", "room_nights", "transactions")}
+    return {
+        "rooms": rooms,
+        "pending": pending,
+        "in_house": in_house,
+        "first_day": date.fromisoformat(first[:10]) if first else date.today(),
+        "last_day": date.fromisoformat(last[:10]) if last else date.today(),
+        "counts": counts,
+    }
+
+
+def percentile(sorted_values, q):
+    """线性插值的分位数，sorted_values 已排序"""
+    if not sorted_values:
+        return 0.0
+    k = (len(sorted_values) - 1) * q
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (k - lower)
+
+
+def measure(func, iterations, warmup):
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(iterations):
+        began = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - began) * 1000)
+    timings.sort()
+    return {
+        "n": len(timings),
+        "mean_ms": sum(timings) / len(timings),
+        "min_ms": timings[0],
+        "p50_ms": percentile(timings, 0.50),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+        "max_ms": timings[-1],
+    }
+
+
+def build_operations(samples, rng, export_dir):
+    """各个热点操作：(名称, 函数, 迭代次数系数, 最多能执行几次)
+
+    最多能执行几次为 None 表示不限；退房之类会消耗样本的操作，样本用完就不能再计时。
+    """
+    svc = service.HotelService()
+    first_day, last_day = samples["first_day"], samples["last_day"]
+    span = max((last_day - first_day).days - 30, 1)
+
+    def random_day(offset=0):
+        return first_day + timedelta(days=rng.randrange(span) + offset)
+
+    def conflict_check():
+        day = date.today() + timedelta(days=rng.randrange(-30, 60))
+        with db.reader() as conn:
+            availability.find_conflict(conn, rng.choice(samples["rooms"]), day.isoformat(),
+                                       (day + timedelta(days=rng.randint(1, 5))).isoformat())
+
+    def check_in_lookup():
+        room_number, customer_id = rng.choice(samples["pending"])
+        svc.find_check_in_reservation(room_number, customer_id)
+
+    def check_out():
+        # 每个在住房间只能退房一次
+        svc.check_out(samples["in_house"].pop(rng.randrange(len(samples["in_house"]))))
+
+    def finance_summary():
+        svc.finance_summary(7)
+
+    def transaction_search():
+        start = random_day()
+        svc.search_transactions(start.isoformat(), (start + timedelta(days=6)).isoformat())
+
+    def transaction_keyword_search():
+        start = random_day()
+        svc.search_transactions(start.isoformat(), (start + timedelta(days=30)).isoformat(),
+                                rng.choice(SURNAMES))
+
+    def transaction_fulltext_search():
+        # 三个字符以上的关键词走全文索引
+        start = random_day()
+        svc.search_transactions(start.isoformat(), (start + timedelta(days=30)).isoformat(),
+                                rng.choice([charge for charge in CHARGE_TYPES if len(charge) >= 3]))
+
+    def transaction_list_page():
+        # 交易记录窗口滚动到任意位置时取下一页（键集分页，与已翻过多少行无关）
+        cursor = (f"{random_day().isoformat()} 23:59:59", 0)
+        svc.transaction_list().fetch(after=cursor)
+
+    def csv_export():
+        start = random_day()
+        rows = svc.transaction_list(start.isoformat(), (start + timedelta(days=30)).isoformat()).all()
+        export.write_csv(os.path.join(export_dir, "export.csv"),
+                         ["交易ID", "订单ID", "房间号", "客户姓名", "金额", "交易日期", "描述"], rows)
+
+    def login():
+        svc.authenticate("bench", BENCH_PASSWORD, "frontdesk")
+
+    return [
+        ("conflict_check", conflict_check, 1.0, None),
+        ("check_in_lookup", check_in_lookup, 1.0, None),
+        ("check_out", check_out, 0.5, len(samples["in_house"])),
+        ("finance_summary", finance_summary, 1.0, None),
+        ("transaction_search_7d", transaction_search, 0.5, None),
+        ("transaction_search_keyword_30d", transaction_keyword_search, 0.1, None),
+        ("transaction_search_fulltext_30d", transaction_fulltext_search, 0.1, None),
+        ("transaction_list_page", transaction_list_page, 1.0, None),
+        ("csv_export_30d", csv_export, 0.1, None),
+        ("login", login, 1.0, None),
+    ]
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+# ---- 并发预订 ----
+# 每个进程模拟一台前台终端（各自的连接），在几间“热门”房间上反复随机预订未来两周内的 1~3 晚，
+# 偶尔取消自己订到的预订以腾出房晚。结束后检查同一房间是否有时间重叠的有效预订，必须为 0。
+
+def _contention_worker(path, seed, rooms, customers, seconds, start, results):
+    db.configure(path)
+    svc = service.HotelService()
+    rng = random.Random(seed)
+    counts = {"booked": 0, "conflicts": 0, "busy": 0, "canceled": 0, "errors": 0}
+    timings = []
+    mine = []
+    today = date.today()
+    start.wait()
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            if mine and rng.random() < 0.2:
+                svc.cancel_reservation(mine.pop(rng.randrange(len(mine))))
+                counts["canceled"] += 1
+                continue
+            check_in = today + timedelta(days=rng.randrange(1, 15))
+            reservation = svc.create_reservation(rng.choice(rooms), rng.randint(1, customers), check_in.isoformat(),
+                                                 (check_in + timedelta(days=rng.randint(1, 3))).isoformat())
+            mine.append(reservation.reservation_id)
+            counts["booked"] += 1
+        except service.Busy:
+            counts["busy"] += 1
+        except service.ServiceError:
+            counts["conflicts"] += 1
+        except Exception:
+            counts["errors"] += 1
+        timings.append((time.perf_counter() - began) * 1000)
+    db.get_manager().close()
+    results.put((counts, timings))
+
+
+def double_bookings(conn):
+    """同一房间时间重叠的有效预订对数"""
+    active = statuses.sql_in(statuses.ACTIVE_RESERVATION_STATUSES)
+    return conn.execute(f"""
+        SELECT COUNT(*) FROM reservations a
+        JOIN reservations b ON b.room_number = a.room_number AND b.reservation_id > a.reservation_id
+        WHERE a.status IN {active} AND b.status IN {active}
+          AND a.check_in_date < b.check_out_date AND b.check_in_date < a.check_out_date
+    """).fetchone()[0]
+
+
+def run_contention(args):
+    path = args.db
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    db.configure(path)
+    migrations.migrate()
+    rooms = list(range(801, 801 + args.contention_rooms))
+    customers = 200
+    with db.writer() as conn:
+        conn.executemany("INSERT INTO rooms (room_number, room_type, price, status, clean_status) "
+                         "VALUES (?, '标准间', 288, ?, '已清洁')", ((number, RoomStatus.AVAILABLE) for number in rooms))
+        conn.executemany("INSERT INTO customers (name, contact, id_card) VALUES (?, ?, ?)",
+                         ((f"压测{i}", "13800000000", f"{i:018d}") for i in range(customers)))
+    db.get_manager().close()
+
+    print(f"{args.contention} 个进程并发预订 {len(rooms)} 间房，持续 {args.contention_seconds} 秒 ...", flush=True)
+    context = multiprocessing.get_context()
+    start = context.Event()
+    results = context.Queue()
+    workers = [context.Process(target=_contention_worker,
+                               args=(path, args.seed + i, rooms, customers, args.contention_seconds, start, results))
+               for i in range(args.contention)]
+    for worker in workers:
+        worker.start()
+    start.set()
+    totals = {"booked": 0, "conflicts": 0, "busy": 0, "canceled": 0, "errors": 0}
+    timings = []
+    for _ in workers:
+        counts, worker_timings = results.get()
+        for key, value in counts.items():
+            totals[key] += value
+        timings.extend(worker_timings)
+    for worker in workers:
+        worker.join()
+    timings.sort()
+
+    db.configure(path)
+    with db.reader() as conn:
+        overlaps = double_bookings(conn)
+        # 房晚库存与有效预订一致
+        expected_nights = conn.execute(f"""
+            SELECT IFNULL(SUM(julianday(check_out_date) - julianday(check_in_date)), 0) FROM reservations
+            WHERE status IN {statuses.sql_in(statuses.ACTIVE_RESERVATION_STATUSES)}
+        """).fetchone()[0]
+        nights = conn.execute("SELECT COUNT(*) FROM room_nights").fetchone()[0]
+    db.get_manager().close()
+
+    attempts = sum(totals.values())
+    result = {
+        "workers": args.contention,
+        "rooms": len(rooms),
+        "seconds": args.contention_seconds,
+        **totals,
+        "attempts_per_second": attempts / args.contention_seconds,
+        "bookings_per_second": totals["booked"] / args.contention_seconds,
+        "p50_ms": percentile(timings, 0.50),
+        "p95_ms": percentile(timings, 0.95),
+        "p99_ms": percentile(timings, 0.99),
+        "double_bookings": overlaps,
+        "inventory_mismatch": int(expected_nights) - nights,
+    }
+    print(f"操作 {attempts} 次（每秒 {result['attempts_per_second']:.0f}），订到 {totals['booked']}，"
+          f"日期冲突被拒 {totals['conflicts']}，取消 {totals['canceled']}，"
+          f"重试后仍忙 {totals['busy']}，其他错误 {totals['errors']}")
+    print(f"延迟 p50 {result['p50_ms']:.2f} ms，p95 {result['p95_ms']:.2f} ms，p99 {result['p99_ms']:.2f} ms")
+    print(f"重复预订 {overlaps} 对，房晚库存差异 {result['inventory_mismatch']}")
+    return result
+
+
+def print_report(results, baseline=None):
+    base = (baseline or {}).get("operations", {})
+    header = f"{'操作':<32}{'n':>6}{'p50(ms)':>11}{'p95(ms)':>11}{'p99(ms)':>11}"
+    if base:
+        header += f"{'p50 变化':>12}"
+    print(header)
+    print("-" * len(header.encode("gbk")))
+    for name, stats in results["operations"].items():
+        line = f"{name:<32}{stats['n']:>6}{stats['p50_ms']:>11.3f}{stats['p95_ms']:>11.3f}{stats['p99_ms']:>11.3f}"
+        if name in base and base[name]["p50_ms"]:
+            change = (stats["p50_ms"] - base[name]["p50_ms"]) / base[name]["p50_ms"] * 100
+            line += f"{change:>+11.1f}%"
+        print(line)
+    for name, reason in results.get("skipped", {}).items():
+        print(f"{name:<32}{'跳过':>6}  {reason}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="酒店住房管理系统性能测试")
+    parser.add_argument("--db", default=os.path.join(tempfile.gettempdir(), "hotel_bench.db"),
+                        help="临时数据库路径（会被覆盖）")
+    parser.add_argument("--reuse", action="store_true", help="数据库已存在时直接复用，不重新生成数据")
+    parser.add_argument("--seed", type=int, default=20240601)
+    parser.add_argument("--rooms", type=int, default=3000)
+    parser.add_argument("--customers", type=int, default=300000)
+    parser.add_argument("--transactions", type=int, default=2000000)
+    parser.add_argument("--days", type=int, default=730, help="生成多少天的历史数据")
+    parser.add_argument("--iterations", type=int, default=200, help="每个操作的计时次数（重操作按比例减少）")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--output", default="bench_results.json", help="JSON 结果文件")
+    parser.add_argument("--baseline", help="上一次的 JSON 结果，用于对比 p50 变化")
+    parser.add_argument("--contention", type=int, metavar="N",
+                        help="改为并发预订测试：N 个进程同时抢订房间，报告吞吐量和重复预订数")
+    parser.add_argument("--contention-rooms", type=int, default=10, help="并发预订测试的房间数")
+    parser.add_argument("--contention-seconds", type=float, default=10, help="并发预订测试的持续时间（秒）")
+    args = parser.parse_args(argv)
+
+    if os.path.abspath(args.db) == os.path.abspath(db.DB_PATH):
+        parser.error("不能在正式数据库 hotel.db 上运行性能测试")
+
+    if args.contention:
+        result = run_contention(args)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "revision": git_revision(),
+                       "sqlite": sqlite3.sqlite_version, "contention": result}, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已写入 {args.output}")
+        return 1 if result["double_bookings"] or result["inventory_mismatch"] else 0
+
+    generated = None
+    if not (args.reuse and os.path.exists(args.db)):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+        db.configure(args.db)
+        migrations.migrate()
+        print(f"生成模拟数据到 {args.db} ...", flush=True)
+        began = time.perf_counter()
+        generate(args)
+        generated = time.perf_counter() - began
+        print(f"数据生成完成，用时 {generated:.1f} 秒", flush=True)
+    else:
+        db.configure(args.db)
+        migrations.migrate()
+
+    samples = load_samples()
+    print("数据规模: " + ", ".join(f"{k}={v}" for k, v in samples["counts"].items()), flush=True)
+
+    rng = random.Random(args.seed + 1)
+    results = {
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "dataset": samples["counts"],
+        "generate_seconds": generated,
+        "operations": {},
+        "skipped": {},
+    }
+    with tempfile.TemporaryDirectory() as export_dir:
+        for name, func, weight, available in build_operations(samples, rng, export_dir):
+            iterations = max(int(args.iterations * weight), 10)
+            warmup = args.warmup
+            if available is not None and available < iterations + warmup:
+                # 样本不够（--reuse 多次后在住房间都退完了）：少做几次，太少就不计时，免得结果不可比
+                warmup = min(warmup, available // 10)
+                iterations = available - warmup
+                if iterations < 10:
+                    print(f"  {name} 跳过：样本只剩 {available} 个，请去掉 --reuse 重新生成数据", flush=True)
+                    results["skipped"][name] = f"样本只剩 {available} 个"
+                    continue
+            print(f"  {name} x{iterations} ...", flush=True)
+            results["operations"][name] = measure(func, iterations, warmup)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    print()
+    print_report(results, baseline)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+    db.get_manager().close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# ==== 结束 ====
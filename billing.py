@@ -0,0 +1,110 @@
+from collections import namedtuple
+
+import dates
+import inventory
+from statuses import ReservationStatus, RoomStatus
+
+# ==== 账单（退房结账） ====
+# 一个预订的账单（folio）就是 transactions 中 reservation_id 为该预订的全部交易：
+# 夜审逐晚记的房费（posting_night 为那一晚）、收费项目里添加的各种消费，以及退房时补记的房费。
+#
+# 退房时房费按实际住宿晚数计算：[入住日期, 退房日期) 每晚按房间价钱计费，退房日期为今天
+# （当天入住当天退房按一晚计）。夜审已记过的晚数不再重复计费，其余晚数合并成一笔“房费”补记。
+# 只认 [入住日期, 退房日期) 之内的夜审房费，记在这之外的（落后补做的夜审多记的）结账时作废，
+# 所以房费总是 晚数 × 房价。
+# 住过了预订的退房日期（超住）时不能直接结账：多住的几晚没有占房晚库存，可能已经卖给了别人，
+# 要先修改预订把退房日期延后（续住），占上这几晚或发现冲突后再结账。
+# 补记房费、关闭预订、释放房晚、恢复房间状态在调用方的同一个写事务中完成，
+# 最后一条按 idx_transactions_reservation 索引的查询取出全部账目，耗时与住了多少晚无关。
+
+FolioLine = namedtuple("FolioLine", "transaction_id transaction_date description amount")
+
+Bill = namedtuple("Bill",
+                  "reservation_id room_number customer_name check_in_date check_out_date "
+                  "nights rate room_charge lines total")
+
+ROOM_CHARGE_DESCRIPTION = "房费"
+
+
+class NoGuestInRoom(Exception):
+    """房间里没有已入住的预订"""
+
+
+class Overstay(Exception):
+    """客人住过了预订的退房日期，需要先续住"""
+
+
+def _in_house(conn, room_number):
+    """房间的在住预订 (reservation_id, customer_name, check_in_date, check_out_date, price)，有多个时取最近入住的"""
+    return conn.execute(f"""
+        SELECT r.reservation_id, c.name, r.check_in_date, r.check_out_date, rm.price
+        FROM reservations r
+        JOIN rooms rm ON rm.room_number = r.room_number
+        LEFT JOIN customers c ON c.customer_id = r.customer_id
+        WHERE r.room_number = ? AND r.status = {int(ReservationStatus.CHECKED_IN)}
+        ORDER BY r.check_in_date DESC
+        LIMIT 1
+    """, (room_number,)).fetchone()
+
+
+def folio(conn, reservation_id):
+    """预订的全部账目，按交易时间排列"""
+    rows = conn.execute("""
+        SELECT transaction_id, transaction_date, description, amount
+        FROM transactions WHERE reservation_id = ?
+        ORDER BY transaction_date, transaction_id
+    """, (reservation_id,)).fetchall()
+    return [FolioLine(*row) for row in rows]
+
+
+def check_out(conn, room_number, departure=None):
+    """结账退房，必须在写事务中调用；返回 Bill
+
+    departure 为退房日期，不给时为今天。房间里没有已入住的预订时抛出 NoGuestInRoom，
+    退房日期晚于预订的退房日期时抛出 Overstay。
+    """
+    row = _in_house(conn, room_number)
+    if row is None:
+        raise NoGuestInRoom(f"房间 {room_number} 没有已入住的预订")
+    reservation_id, customer_name, check_in_date, booked_check_out, rate = row
+
+    left_on = departure or dates.now()[:10]
+    if left_on > booked_check_out:
+        raise Overstay(f"房间 {room_number} 的客人预订住到 {booked_check_out}，已超住，"
+                       f"请先修改预订把退房日期延到 {left_on}（续住）再结账")
+    # 当天入住当天退房（或入住日期填在今天之后）按一晚计
+    departure = max(left_on, dates.next_day(check_in_date))
+    nights = (dates.parse(departure) - dates.parse(check_in_date)).days
+    # 住宿日期之外的夜审房费作废，再取这次住宿内已记的晚数（都走 idx_transactions_posting）
+    conn.execute("DELETE FROM transactions WHERE reservation_id = ? AND posting_night IS NOT NULL "
+                 "AND (posting_night < ? OR posting_night >= ?)", (reservation_id, check_in_date, departure))
+    posted, posted_amount = conn.execute(
+        "SELECT COUNT(*), IFNULL(SUM(amount), 0) FROM transactions "
+        "WHERE reservation_id = ? AND posting_night >= ? AND posting_night < ?",
+        (reservation_id, check_in_date, departure)).fetchone()
+
+    # 夜审还没记到的晚数一次补记（同一晚最多记一次，posted 不会超过 nights）
+    unposted = nights - posted
+    if unposted:
+        conn.execute("INSERT INTO transactions (reservation_id, amount, transaction_date, description) "
+                     "VALUES (?, ?, ?, ?)",
+                     (reservation_id, unposted * rate, dates.now(), f"{ROOM_CHARGE_DESCRIPTION}（{unposted}晚）"))
+
+    conn.execute("UPDATE reservations SET status = ?, check_out_date = ? WHERE reservation_id = ?",
+                 (ReservationStatus.COMPLETED, departure, reservation_id))
+    # 客人离开当天起房间就可以再预订（提前退房、当天入住当天退房都一样）
+    inventory.release_nights(conn, reservation_id, from_date=left_on)
+    # 还有人预订了这个房间时回到“已预订”
+    conn.execute(f"""
+        UPDATE rooms SET clean_status = '未清洁',
+            status = CASE WHEN EXISTS (SELECT 1 FROM reservations r
+                                       WHERE r.room_number = rooms.room_number
+                                         AND r.status = {int(ReservationStatus.RESERVED)})
+                          THEN {int(RoomStatus.RESERVED)} ELSE {int(RoomStatus.AVAILABLE)} END
+        WHERE room_number = ?
+    """, (room_number,))
+
+    lines = folio(conn, reservation_id)
+    return Bill(reservation_id, room_number, customer_name, check_in_date, departure, nights, rate,
+                posted_amount + unposted * rate, lines, sum(line.amount for line in lines))
+# ==== 结束 ====
@@ -0,0 +1,280 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from collections import namedtuple
+from contextlib import nullcontext
+
+import db
+import dbworker
+import export
+import migrations
+import search
+import service
+from statuses import RoomStatus
+
+# ==== 批量导入 ====
+# 从 CSV 批量导入房间或客户（新开业录入全部房间、从旧系统迁移客户资料）：
+#
+#   python bulk_import.py rooms rooms.csv
+#   python bulk_import.py customers old_pms.csv --encoding gbk
+#
+# 界面里在“系统管理 - 批量导入”中使用。
+#
+# 文件第一行是表头，按列名识别各列（中文或英文列名均可，顺序不限，多余的列忽略）：
+#   房间：房间号/room_number、房间类型/room_type、价钱/price、清洁状态/clean_status
+#   客户：姓名/name、联系方式/contact、身份证号/id_card，可选 积分/points
+# 逐行读取、校验（规则与界面里添加房间、客户相同，见 service.validate_room / validate_customer），
+# 每 BATCH_SIZE 行在一个事务里查重后用 executemany 写入，内存占用与文件大小无关；
+# 客户的全文索引整批补写，不逐行触发（见 search.bulk_customers）。
+# 不合格或与已有记录重复（房间号、身份证号）的行写到拒绝文件，附上行号和原因，其余照常导入。
+#
+# 每批单独提交：导入中途出错或取消时，已提交的批次保留。修正拒绝文件后可以直接再导入一次，
+# 已导入的行会按重复拒绝，不会重复写入。
+
+BATCH_SIZE = 5000
+IN_CHUNK = 500  # 查重时每条 IN (...) 语句带的参数个数
+
+ImportResult = namedtuple("ImportResult", "imported rejected rejected_path")
+
+
+class ImportCancelled(dbworker.TaskCancelled):
+    """导入被取消"""
+
+
+def _room_values(room_number, room_type, price, clean_status):
+    room_number, room_type, price, clean_status = service.validate_room(room_number, room_type, price,
+                                                                        clean_status)
+    return room_number, room_type, price, RoomStatus.AVAILABLE, clean_status
+
+
+def _customer_values(name, contact, id_card, points):
+    name, contact, id_card = service.validate_customer(name, contact, id_card)
+    try:
+        points = int(points or 0)
+    except ValueError:
+        raise service.ValidationError("积分必须为整数")
+    if points < 0:
+        raise service.ValidationError("积分不能为负数")
+    return name, contact, id_card, points
+
+
+# 一种可导入的记录：
+#   columns    必填列 [(英文列名, 中文列名)]，optional 为可选列 [(英文列名, 中文列名, 缺省值)]
+#   values     按 columns + optional 的顺序接收各列的值，校验后返回要插入的值，不合格时抛出 ValidationError
+#   key        查重的列，key_index 为它在 values 结果中的位置
+#   bulk       bulk(conn) 返回包住整批 INSERT 的上下文（例如暂停逐行维护全文索引）
+Kind = namedtuple("Kind", "label table columns optional values key key_index duplicate_message insert bulk")
+
+KINDS = {
+    "rooms": Kind(
+        "房间", "rooms",
+        [("room_number", "房间号"), ("room_type", "房间类型"), ("price", "价钱"), ("clean_status", "清洁状态")],
+        [],
+        _room_values, "room_number", 0, "该房间号已存在",
+        "INSERT INTO rooms (room_number, room_type, price, status, clean_status) VALUES (?, ?, ?, ?, ?)",
+        lambda conn: nullcontext()),
+    "customers": Kind(
+        "客户", "customers",
+        [("name", "姓名"), ("contact", "联系方式"), ("id_card", "身份证号")],
+        [("points", "积分", "0")],
+        _customer_values, "id_card", 2, "该身份证号已存在",
+        "INSERT INTO customers (name, contact, id_card, points) VALUES (?, ?, ?, ?)",
+        search.bulk_customers),
+}
+
+
+def _column_positions(kind, header):
+    """表头中各列的位置，必填列缺失时抛出 ValidationError"""
+    names = {}
+    for position, name in enumerate(header):
+        names.setdefault(name.strip().lower(), position)
+    positions = []
+    missing = []
+    for field, label in kind.columns:
+        position = names.get(field, names.get(label))
+        if position is None:
+            missing.append(label)
+        positions.append(position)
+    if missing:
+        raise service.ValidationError(f"文件缺少必填列: {'、'.join(missing)}")
+    defaults = []
+    for field, label, default in kind.optional:
+        positions.append(names.get(field, names.get(label)))
+        defaults.append(default)
+    return positions, [""] * len(kind.columns) + defaults
+
+
+def default_rejected_path(path):
+    base, _ = os.path.splitext(path)
+    return base + "_rejected.csv"
+
+
+def count_rows(path):
+    """文件的大致记录数（行数减表头），只用于显示进度"""
+    lines = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(1 << 20)
+            if not block:
+                break
+            lines += block.count(b"\n")
+    return max(lines - 1, 0)
+
+
+class _Rejects:
+    """拒绝文件：第一次有被拒绝的行时才创建"""
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.count = 0
+        self._file = None
+        self._writer = None
+
+    def add(self, line, reason, row):
+        if self._file is None:
+            self._file = open(self.path, "w", newline="", encoding=export.CSV_ENCODING)
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(["行号", "原因"] + self.header)
+        self._writer.writerow([line, reason] + row)
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+
+
+def _existing_keys(conn, kind, keys):
+    column = kind.key
+    found = set()
+    for start in range(0, len(keys), IN_CHUNK):
+        chunk = keys[start:start + IN_CHUNK]
+        placeholders = ", ".join("?" * len(chunk))
+        found.update(row[0] for row in conn.execute(
+            f"SELECT {column} FROM {kind.table} WHERE {column} IN ({placeholders})", chunk))
+    return found
+
+
+def _write_batch(kind, batch, rejects):
+    """batch 为 [(行号, 原始行, 校验后的值)]，在一个事务中查重并写入，返回写入的行数"""
+    key_index = kind.key_index
+    # 写事务以 BEGIN IMMEDIATE 开始，查重和写入之间不会有其他终端插进来写同样的记录
+    with db.writer() as conn:
+        existing = _existing_keys(conn, kind, list({values[key_index] for _, _, values in batch}))
+        seen = {}
+        rows = []
+        for line, raw, values in batch:
+            key = values[key_index]
+            if key in existing:
+                rejects.add(line, kind.duplicate_message, raw)
+            elif key in seen:
+                rejects.add(line, f"与第 {seen[key]} 行重复", raw)
+            else:
+                seen[key] = line
+                rows.append(values)
+        with kind.bulk(conn):
+            conn.executemany(kind.insert, rows)
+    return len(rows)
+
+
+def import_csv(kind_name, path, rejected_path=None, encoding=export.CSV_ENCODING, progress=None, cancelled=None):
+    """把 CSV 文件 path 中的记录导入 kind_name（"rooms" 或 "customers"），返回 ImportResult
+
+    rejected_path 不给时为与 path 同目录的 <文件名>_rejected.csv；没有被拒绝的行时不创建该文件。
+    progress(n) 每处理一批调用一次（n 为已处理的行数）；cancelled() 返回 True 时中止并抛出
+    ImportCancelled，已提交的批次保留。
+    """
+    if kind_name not in KINDS:
+        raise ValueError(f"不支持导入: {kind_name}")
+    kind = KINDS[kind_name]
+    rejected_path = rejected_path or default_rejected_path(path)
+    # 上次导入留下的拒绝文件已经过时
+    if os.path.exists(rejected_path):
+        os.remove(rejected_path)
+
+    imported = 0
+    processed = 0
+    try:
+        with open(path, newline="", encoding=encoding) as f:
+            reader = csv.reader(f)
+            header = next(reader, None)
+            if header is None:
+                raise service.ValidationError("文件是空的")
+            positions, defaults = _column_positions(kind, header)
+            rejects = _Rejects(rejected_path, header)
+            try:
+                batch = []
+                for row in reader:
+                    if not any(cell.strip() for cell in row):
+                        continue
+                    processed += 1
+                    fields = [row[position].strip() if position is not None and position < len(row) else default
+                              for position, default in zip(positions, defaults)]
+                    try:
+                        batch.append((reader.line_num, row, kind.values(*fields)))
+                    except service.ValidationError as e:
+                        rejects.add(reader.line_num, str(e), row)
+                    if len(batch) >= BATCH_SIZE:
+                        if cancelled and cancelled():
+                            raise ImportCancelled()
+                        imported += _write_batch(kind, batch, rejects)
+                        batch = []
+                        if progress:
+                            progress(processed)
+                if batch:
+                    imported += _write_batch(kind, batch, rejects)
+            finally:
+                rejects.close()
+    except UnicodeDecodeError:
+        raise service.ValidationError(f"文件不是 {encoding} 编码，请换一种编码（例如 gbk）再导入")
+    if progress:
+        progress(processed)
+    return ImportResult(imported, rejects.count, rejected_path if rejects.count else None)
+
+
+class ImportTask(dbworker.BackgroundTask):
+    """在后台线程中批量导入，界面用法与导出任务相同；完成后结果在 result 中"""
+
+    def __init__(self, kind_name, path, encoding=export.CSV_ENCODING):
+        super().__init__(lambda: count_rows(path))
+        self.kind_name = kind_name
+        self.path = path
+        self.encoding = encoding
+        self.result = None
+
+    def _write(self, progress, cancelled):
+        self.result = import_csv(self.kind_name, self.path, encoding=self.encoding,
+                                 progress=progress, cancelled=cancelled)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 CSV 批量导入房间或客户")
+    parser.add_argument("kind", choices=sorted(KINDS), help="导入房间（rooms）还是客户（customers）")
+    parser.add_argument("path", help="CSV 文件，第一行为表头")
+    parser.add_argument("--db", default=db.DB_PATH, help="数据库文件")
+    parser.add_argument("--encoding", default=export.CSV_ENCODING, help="文件编码，旧系统导出的文件常为 gbk")
+    parser.add_argument("--rejected", help="拒绝文件路径，默认为 <文件名>_rejected.csv")
+    args = parser.parse_args(argv)
+
+    db.configure(args.db)
+    migrations.migrate()
+    began = time.perf_counter()
+    try:
+        result = import_csv(args.kind, args.path, args.rejected, args.encoding,
+                            progress=lambda n: print(f"\r已处理 {n} 行", end="", flush=True))
+    except (service.ServiceError, OSError) as e:
+        print(f"\n导入失败: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - began
+    print(f"\n导入{KINDS[args.kind].label} {result.imported} 条，用时 {elapsed:.1f} 秒"
+          f"（每秒 {result.imported / max(elapsed, 1e-9):.0f} 条）")
+    if result.rejected:
+        print(f"拒绝 {result.rejected} 行，原因见 {result.rejected_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# ==== 结束 ====
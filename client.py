@@ -0,0 +1,145 @@
+import http.client
+import json
+import select
+import threading
+from urllib.parse import urlsplit
+
+import api
+import paging
+import service
+
+# ==== 客户端模式 ====
+# python zhuti1.0.py --server http://127.0.0.1:8765 以客户端模式启动：界面照常调用 self.service 的方法，
+# 只是 self.service 换成了 RemoteService，每次调用变成一次对 server.py 的 HTTP 请求（接口见 api.py）。
+# 返回值还原成与本地相同的结果类型，业务错误抛出同名的 ServiceError 子类，界面代码不需要改。
+#
+# 每个线程（界面线程、DbWorker 的各个线程）各用一条 keep-alive 连接，互不等待。
+# 连接在请求发出后中断时，服务器可能已经执行完了这个请求：只有只读的接口自动重发，
+# 会修改数据的（预订、收费等）把错误交给调用方，避免重复预订、重复收费。
+#
+# 登录窗口调用 authenticate 时服务器发给一个会话号，之后的每个请求都带上它（见 api.py），
+# 所有线程共用；会话过期后服务器返回 PermissionDenied，需要重新登录。
+
+TIMEOUT = 30
+
+
+class Unavailable(service.ServiceError):
+    """连不上服务器"""
+
+
+class RemotePagedList:
+    """服务器上的分页列表，用法与 service.PagedList 相同"""
+
+    def __init__(self, remote, name, args, kwargs, meta):
+        self.remote = remote
+        self.name = name
+        self.args = list(args)
+        self.kwargs = kwargs
+        self.sorts = tuple(meta["sorts"])
+        self.default_sort = meta["default_sort"]
+        self.default_descending = meta["default_descending"]
+
+    def fetch(self, sort=None, descending=None, after=None, before=None, limit=paging.PAGE_SIZE):
+        return self.remote.request(f"/api/{self.name}/fetch",
+                                   {"args": self.args, "kwargs": self.kwargs, "sort": sort,
+                                    "descending": descending, "after": after, "before": before, "limit": limit},
+                                   idempotent=True)
+
+    def count(self):
+        return self.remote.request(f"/api/{self.name}/count", {"args": self.args, "kwargs": self.kwargs},
+                                   idempotent=True)
+
+    def all(self, sort=None, descending=None):
+        # 按页取，每页一次请求；页与页之间不是同一个快照
+        after = None
+        while True:
+            page = self.fetch(sort, descending, after=after, limit=paging.FETCH_SIZE)
+            yield from page.rows
+            if not page.more or not page.rows:
+                return
+            after = page.cursors[-1]
+
+
+class RemoteService:
+    """通过 server.py 调用的 HotelService，方法与 service.HotelService 相同（没有 batch()）"""
+
+    def __init__(self, url):
+        parts = urlsplit(url if "//" in url else f"http://{url}")
+        self.url = f"http://{parts.hostname}:{parts.port or api.DEFAULT_PORT}"
+        self.host = parts.hostname
+        self.port = parts.port or api.DEFAULT_PORT
+        self._local = threading.local()
+        self._session = None
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None and conn.sock is not None and select.select([conn.sock], [], [], 0)[0]:
+            # 空闲的 keep-alive 连接上有数据可读，说明服务器已经关闭了它：发请求之前换一条新连接
+            self._drop_connection()
+            conn = None
+        if conn is None:
+            conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=TIMEOUT)
+        return conn
+
+    def _drop_connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def request(self, path, payload=None, idempotent=False):
+        """POST payload 到 path，返回 result；业务错误抛出对应的 ServiceError
+
+        idempotent 为真（只读接口）时连接中断后自动重发一次，否则抛出 Unavailable。
+        """
+        return self._post(path, payload, idempotent)["result"]
+
+    def _post(self, path, payload, idempotent):
+        """发出请求，返回完整的响应内容"""
+        body = json.dumps(payload or {}, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json; charset=utf-8"}
+        if self._session:
+            headers[api.SESSION_HEADER] = self._session
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request("POST", path, body, headers)
+                response = conn.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # 请求可能已经被服务器执行：只读接口重新连接再发一次，其他的交给调用方确认
+                self._drop_connection()
+                if not idempotent:
+                    raise Unavailable(f"与服务器 {self.url} 的连接中断，操作可能已经完成，请刷新确认后再操作")
+                if attempt:
+                    raise Unavailable(f"与服务器 {self.url} 的连接中断，请稍后重试")
+            except OSError as e:
+                self._drop_connection()
+                raise Unavailable(f"无法连接服务器 {self.url}: {e}")
+        try:
+            content = api.decode(data)
+        except ValueError:
+            raise service.ServiceError(f"服务器返回的内容无法解析（HTTP {response.status}）")
+        if response.status != 200:
+            raise api.error_from(content)
+        return content
+
+    def authenticate(self, username, password, user_type="frontdesk"):
+        """登录，成功后记下服务器发的会话号，返回 User"""
+        content = self._post("/api/authenticate", {"args": [username, password, user_type]}, idempotent=True)
+        self._session = content.get("session")
+        return content["result"]
+
+    def call(self, name, *args, **kwargs):
+        writes = getattr(getattr(service.HotelService, name), "writes", False)
+        result = self.request(f"/api/{name}", {"args": list(args), "kwargs": kwargs}, idempotent=not writes)
+        if isinstance(result, dict) and "$paged" in result:
+            return RemotePagedList(self, name, args, kwargs, result["$paged"])
+        return result
+
+    def __getattr__(self, name):
+        if name not in api.METHODS:
+            raise AttributeError(name)
+        return lambda *args, **kwargs: self.call(name, *args, **kwargs)
+# ==== 结束 ====
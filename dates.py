@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+# ==== 日期存储格式 ====
+# 数据库中的日期统一按本地时间、严格的 ISO 格式存储，这样字符串顺序就是时间顺序，
+# 范围筛选可以直接在索引上做区间扫描，不需要再套 date()/strftime()：
+#   预订的入住/退房日期        DATE_FORMAT      例如 2026-10-18
+#   交易时间                  DATETIME_FORMAT  例如 2026-10-18 14:05:00
+# 数据库触发器会拒绝写入不符合格式的日期（见 migrations._canonical_dates）。
+
+DATE_FORMAT = "%Y-%m-%d"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# 历史数据和用户输入中可能出现的写法
+_INPUT_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+    "%Y.%m.%d",
+    "%Y%m%d",
+)
+
+
+def parse(text):
+    """把各种写法的日期/时间解析成 datetime，无法识别时返回 None"""
+    if text is None:
+        return None
+    text = str(text).strip()
+    for fmt in _INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def canonical_date(text):
+    """规范化为 YYYY-MM-DD，无法识别时返回 None"""
+    value = parse(text)
+    return value.strftime(DATE_FORMAT) if value else None
+
+
+def canonical_datetime(text):
+    """规范化为 YYYY-MM-DD HH:MM:SS，只有日期时按当天 00:00:00 计，无法识别时返回 None"""
+    value = parse(text)
+    return value.strftime(DATETIME_FORMAT) if value else None
+
+
+def next_day(date_text):
+    """YYYY-MM-DD 的下一天，用作“截止到某天（含）”筛选的开区间上界"""
+    return (datetime.strptime(date_text, DATE_FORMAT) + timedelta(days=1)).strftime(DATE_FORMAT)
+
+
+def now():
+    """当前本地时间，按交易时间的存储格式"""
+    return datetime.now().strftime(DATETIME_FORMAT)
+# ==== 结束 ====
@@ -0,0 +1,209 @@
+import atexit
+import functools
+import queue
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# ==== 数据库连接管理 ====
+# 所有界面处理函数和登录窗口都从这里借用连接，不再各自 sqlite3.connect('hotel.db')。
+# 读连接放在连接池里复用，写操作统一走唯一的写连接，避免多个连接同时写库。
+#
+# 多台前台终端共用一个 hotel.db 时，写事务一律以 BEGIN IMMEDIATE 开始：一开始就拿到写锁，
+# 事务里先查（房间是否空闲）再写（插入预订），中间不会有其他终端插进来。
+# 拿不到写锁时 SQLite 先按 busy_timeout 等待；仍然失败（database is locked）时，
+# 用 retry_busy 包装的操作会整体回滚，随机等一小会儿后重新执行，最多 WRITE_RETRIES 次。
+
+DB_PATH = 'hotel.db'
+
+# 每个连接只在创建时设置一次
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-16000",  # 约16MB页缓存
+    "PRAGMA mmap_size=268435456",  # 256MB内存映射
+    "PRAGMA temp_store=MEMORY",
+)
+
+WRITE_RETRIES = 4
+RETRY_BACKOFF = 0.05  # 第 n 次重试前随机等待 0 ~ RETRY_BACKOFF * 2**n 秒
+
+
+class ConnectionManager:
+    def __init__(self, path=DB_PATH, readers=4):
+        self.path = path
+        self.max_readers = readers
+        self._readers = queue.LifoQueue()
+        self._reader_count = 0
+        self._reader_lock = threading.Lock()
+        self._writer = None
+        self._writer_lock = threading.RLock()
+        self._writer_depth = 0
+        self._watcher = None
+        self._watcher_lock = threading.Lock()
+        self._commit_listeners = []
+        self._closed = False
+
+    def _connect(self, read_only=False):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only=1")
+        return conn
+
+    def _acquire_reader(self):
+        try:
+            return self._readers.get_nowait()
+        except queue.Empty:
+            pass
+        with self._reader_lock:
+            if self._reader_count < self.max_readers:
+                self._reader_count += 1
+                return self._connect(read_only=True)
+        # 连接池已满，等待其他线程归还
+        return self._readers.get()
+
+    @contextmanager
+    def reader(self):
+        """借用一个只读连接，用完自动归还连接池"""
+        conn = self._acquire_reader()
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                conn.rollback()
+            if self._closed:
+                conn.close()
+            else:
+                self._readers.put(conn)
+
+    @contextmanager
+    def writer(self):
+        """借用唯一的写连接，以 BEGIN IMMEDIATE 开始事务，正常退出时提交，出现异常时回滚
+
+        同一线程内嵌套调用会并入外层事务，由最外层负责提交。
+        """
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+            conn = self._writer
+            self._writer_depth += 1
+            try:
+                if self._writer_depth == 1 and not conn.in_transaction:
+                    conn.execute("BEGIN IMMEDIATE")
+                yield conn
+                if self._writer_depth == 1:
+                    conn.commit()
+                    for listener in self._commit_listeners:
+                        listener()
+            except BaseException:
+                if self._writer_depth == 1:
+                    conn.rollback()
+                raise
+            finally:
+                self._writer_depth -= 1
+
+    def add_commit_listener(self, listener):
+        """写连接每提交一个事务后调用 listener()（在提交的线程里调用，应当立即返回）"""
+        self._commit_listeners.append(listener)
+
+    def in_writer(self):
+        """当前线程是否正在写事务中（嵌套在 writer() 里）"""
+        # RLock 只有持有者能再次获取；未持有时立即返回 False
+        if not self._writer_lock.acquire(blocking=False):
+            return False
+        try:
+            return self._writer_depth > 0
+        finally:
+            self._writer_lock.release()
+
+    def data_version(self):
+        """数据库的修改计数：本进程的写连接或其他终端每提交一次写事务，返回值都会变
+
+        用一个从不写入的专用连接执行 PRAGMA data_version（它只反映其他连接的提交），
+        不读任何表，比查询便宜得多，适合缓存判断数据是否可能变了。
+        """
+        with self._watcher_lock:
+            if self._watcher is None:
+                self._watcher = self._connect(read_only=True)
+            return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        """关闭所有连接（程序退出时调用）"""
+        self._closed = True
+        with self._watcher_lock:
+            if self._watcher is not None:
+                self._watcher.close()
+                self._watcher = None
+        while True:
+            try:
+                self._readers.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._writer_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+
+
+_manager = None
+_manager_lock = threading.Lock()
+
+
+def get_manager():
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = ConnectionManager()
+            atexit.register(_manager.close)
+        return _manager
+
+
+def configure(path=DB_PATH, readers=4):
+    """切换数据库文件（例如测试或压测用的临时库），旧连接会被关闭"""
+    global _manager
+    with _manager_lock:
+        if _manager is not None:
+            _manager.close()
+        _manager = ConnectionManager(path, readers)
+        atexit.register(_manager.close)
+        return _manager
+
+
+def reader():
+    return get_manager().reader()
+
+
+def writer():
+    return get_manager().writer()
+
+
+def is_busy(error):
+    """是否是拿不到锁（database is locked / busy）导致的错误"""
+    if not isinstance(error, sqlite3.OperationalError):
+        return False
+    message = str(error).lower()
+    return "locked" in message or "busy" in message
+
+
+def retry_busy(func):
+    """装饰器：func 因拿不到写锁失败时整体重试（随机退避），最多 WRITE_RETRIES 次
+
+    func 里用 writer() 开启自己的写事务；失败时事务已经回滚，重新执行不会留下半截数据。
+    已经在外层写事务里调用时不重试（外层事务不能只重做一半），直接抛出。
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(WRITE_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy(e) or attempt == WRITE_RETRIES or get_manager().in_writer():
+                    raise
+            time.sleep(random.uniform(0, RETRY_BACKOFF * 2 ** attempt))
+    return wrapper
+# ==== 结束 ====
@@ -0,0 +1,190 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# ==== 后台数据库任务 ====
+# 界面线程不直接执行耗时的查询：交给 DbWorker 的线程池在后台执行（连接来自 db 的连接池，
+# 每个线程借用自己的连接），结果放进队列，由界面线程通过 root.after 定时取出后调用回调。
+# Tk 只能在界面线程中操作，所以回调里可以直接更新控件。
+#
+#   job = worker.submit(service.finance_summary, 7, on_done=show, owner=window, busy=window)
+#
+# owner 窗口关闭后不再回调；busy 窗口在任务执行期间显示忙碌光标。job.cancel() 取消任务：
+# 还没开始的不再执行，已经在执行的等它结束后丢弃结果。
+#
+# 导出、批量导入这类要显示进度、中途可以取消的长任务写成 BackgroundTask 的子类，
+# 用 worker.submit(task.run) 执行，界面线程定时读取 task 的进度。
+
+POLL_MS = 30
+BUSY_CURSOR = "watch"
+
+
+class TaskCancelled(Exception):
+    """后台任务被取消"""
+
+
+class Job:
+    """提交给 DbWorker 的一个任务"""
+
+    def __init__(self, on_done, on_error, owner, busy):
+        self.on_done = on_done
+        self.on_error = on_error
+        self.owner = owner
+        self.busy = busy
+        self.future = None
+        self._cancelled = False
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @property
+    def running(self):
+        return self.future is not None and not self.future.done()
+
+    def cancel(self):
+        self._cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+
+class DbWorker:
+    """后台执行数据库任务的线程池
+
+    on_error  默认的出错回调 on_error(exception)，在界面线程中调用；不给时交给 Tk 的异常报告
+    """
+
+    def __init__(self, root, threads=3, on_error=None):
+        self.root = root
+        self.on_error = on_error
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="db-worker")
+        self._results = queue.Queue()
+        self._pending = 0
+        self._poll_id = None
+        self._busy = {}  # 窗口 -> [进行中的任务数, 原来的光标]
+
+    def submit(self, func, *args, on_done=None, on_error=None, owner=None, busy=None, **kwargs):
+        """在后台线程中执行 func(*args, **kwargs)，完成后在界面线程中调用 on_done(结果) 或 on_error(异常)"""
+        job = Job(on_done, on_error, owner, busy)
+        self._pending += 1
+        self._set_busy(busy)
+        job.future = self._executor.submit(func, *args, **kwargs)
+        # 完成回调在后台线程（或取消任务的线程）中调用，只把结果放进队列
+        job.future.add_done_callback(lambda future: self._results.put(job))
+        if self._poll_id is None:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+        return job
+
+    def shutdown(self):
+        """程序退出时调用：不再执行排队中的任务，也不等待正在执行的任务"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                job = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            self._deliver(job)
+        if self._pending:
+            self._poll_id = self.root.after(POLL_MS, self._poll)
+
+    def _deliver(self, job):
+        self._clear_busy(job.busy)
+        if job.cancelled or job.future.cancelled():
+            return
+        if job.owner is not None and not self._exists(job.owner):
+            return
+        error = job.future.exception()
+        if error is not None:
+            on_error = job.on_error or self.on_error
+            if on_error:
+                on_error(error)
+            else:
+                self.root.report_callback_exception(type(error), error, error.__traceback__)
+        elif job.on_done:
+            job.on_done(job.future.result())
+
+    # ---- 忙碌光标 ----
+
+    @staticmethod
+    def _exists(widget):
+        try:
+            return bool(widget.winfo_exists())
+        except Exception:
+            return False
+
+    def _set_busy(self, widget):
+        if widget is None or not self._exists(widget):
+            return
+        state = self._busy.get(widget)
+        if state is None:
+            self._busy[widget] = [1, widget.cget("cursor")]
+            widget.configure(cursor=BUSY_CURSOR)
+        else:
+            state[0] += 1
+
+    def _clear_busy(self, widget):
+        state = self._busy.get(widget)
+        if state is None:
+            return
+        state[0] -= 1
+        if state[0] == 0:
+            del self._busy[widget]
+            if self._exists(widget):
+                widget.configure(cursor=state[1])
+
+
+class BackgroundTask:
+    """在后台线程中执行的长任务（导出、导入），子类实现 _write(progress, cancelled)
+
+    count  可选，返回总记录数的函数，在后台线程中调用，用于显示百分比
+    界面线程读取 written（已处理的记录数）/ total / done / cancelled / error 显示进度，调用 cancel() 取消。
+    _write 发现 cancelled() 为真时抛出 TaskCancelled（或它的子类）中止。
+    """
+
+    def __init__(self, count=None):
+        self.count = count
+        self.total = None
+        self.written = 0
+        self.done = False
+        self.error = None
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self.run, name="db-task", daemon=True)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def start(self):
+        """在自己的线程中执行；界面里改用 DbWorker.submit(task.run)"""
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self._cancel.set()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def _progress(self, written):
+        self.written = written
+
+    def _write(self, progress, cancelled):
+        raise NotImplementedError
+
+    def run(self):
+        """执行任务（在当前线程中），出错时记在 error 里而不是抛出"""
+        try:
+            if self.count:
+                self.total = self.count()
+            self._write(self._progress, self._cancel.is_set)
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+# ==== 结束 ====
@@ -0,0 +1,131 @@
+import threading
+import tkinter as tk
+
+import db
+
+# ==== 变更通知 ====
+# 打开着的房间列表、预订列表、交易记录窗口和主界面的房态统计，在数据变了之后只刷新受影响的行，
+# 不用关掉重开或点“筛选”整表重新加载：
+#
+#   bus = ChangeBus(root)
+#   bus.subscribe(events.ROOM, lambda keys: tree.refresh(keys), owner=window)
+#
+# 变更来源是 change_log 表：rooms、reservations、transactions 上的触发器把每次增删改记成
+# (种类, 主键) 一行（见 migrations._change_log）。界面、夜审、批量导入、其他终端——不管哪条写路径
+# 改了数据都会留下记录，不需要每个写操作自己发通知。
+#
+# 何时去读 change_log：
+#   - 本程序的写连接每提交一个事务就通知 ChangeBus（db.add_commit_listener），下一个 WAKE_MS 周期内处理；
+#   - 其他终端的提交靠每 POLL_MS 看一次 PRAGMA data_version（db.data_version()，不读任何表）发现，
+#     没有任何提交时什么都不查。
+# 回调在界面线程中调用，参数是变了的主键集合；日志被夜审清理掉一段、或一次变化太多时参数为 None，
+# 表示“可能全都变了”，订阅方应整体重新加载。
+# 读 change_log 失败（数据库暂时不可用）时下一轮再试；给出 on_error 时在界面线程中报告，同一次故障只报一次。
+
+ROOM = "room"
+RESERVATION = "reservation"
+TRANSACTION = "transaction"
+
+WAKE_MS = 50
+POLL_MS = 1000
+# 一次处理的日志条数上限，超过时（夜审、批量导入）改为通知整体重新加载
+MAX_BATCH = 500
+
+
+class ChangeBus:
+    def __init__(self, root, on_error=None):
+        self.root = root
+        self.on_error = on_error
+        self._failing = False
+        self._subscribers = []  # [(种类, 回调, owner)]
+        self._manager = None
+        self._version = None
+        self._data_version = None
+        self._woken = threading.Event()
+        self._since_poll = 0
+        self._attach()
+        self._tick()
+
+    def subscribe(self, kind, callback, owner=None):
+        """kind 的记录变化时调用 callback(keys)；owner 窗口关闭后自动退订。返回退订函数"""
+        entry = (kind, callback, owner)
+        self._subscribers.append(entry)
+        return lambda: self._subscribers.remove(entry) if entry in self._subscribers else None
+
+    def publish(self, kind, keys):
+        """通知 kind 的 keys 变了（keys 为 None 表示可能全都变了），只能在界面线程中调用"""
+        for entry in list(self._subscribers):
+            subscribed_kind, callback, owner = entry
+            if owner is not None and not _exists(owner):
+                self._subscribers.remove(entry)
+            elif subscribed_kind == kind:
+                callback(keys)
+
+    def _attach(self):
+        """在当前的连接管理器上登记提交通知，并从当前的日志末尾开始"""
+        self._manager = db.get_manager()
+        self._manager.add_commit_listener(self._woken.set)
+        self._data_version = self._manager.data_version()
+        with self._manager.reader() as conn:
+            self._version = conn.execute("SELECT IFNULL(MAX(version), 0) FROM change_log").fetchone()[0]
+
+    def _tick(self):
+        self._since_poll += WAKE_MS
+        if self._woken.is_set() or self._since_poll >= POLL_MS:
+            self._woken.clear()
+            self._since_poll = 0
+            try:
+                self.check()
+            except Exception as e:
+                # 数据库暂时不可用时下一轮再试，不能让定时器停掉；恢复之前不重复报告
+                if not self._failing:
+                    self._failing = True
+                    if self.on_error:
+                        self.on_error(e)
+            else:
+                self._failing = False
+        self.root.after(WAKE_MS, self._tick)
+
+    def check(self):
+        """有新的提交时读 change_log，按种类通知订阅方"""
+        if db.get_manager() is not self._manager:
+            # db.configure() 换了数据库
+            self._attach()
+            for kind in (ROOM, RESERVATION, TRANSACTION):
+                self.publish(kind, None)
+            return
+        # 先取修改计数再读日志：两者之间有新的提交时，下一轮还会再读一次
+        data_version = self._manager.data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+
+        with self._manager.reader() as conn:
+            conn.execute("BEGIN")  # 两条查询看到同一个快照
+            # 两个子查询各自只读主键索引的一头（MIN 和 MAX 写在同一个 SELECT 里会扫描全表）
+            oldest, latest = conn.execute("SELECT (SELECT MIN(version) FROM change_log), "
+                                          "(SELECT MAX(version) FROM change_log)").fetchone()
+            rows = conn.execute("SELECT version, kind, key FROM change_log WHERE version > ? ORDER BY version "
+                                "LIMIT ?", (self._version, MAX_BATCH + 1)).fetchall()
+        if not rows:
+            return
+        # 还没读到的日志已被夜审清理掉（oldest 之前缺了一段）时，不知道具体变了哪些
+        pruned = oldest > self._version + 1
+        self._version = latest
+
+        if pruned or len(rows) > MAX_BATCH:
+            changed = {kind: None for kind in (ROOM, RESERVATION, TRANSACTION)}
+        else:
+            changed = {}
+            for _, kind, key in rows:
+                changed.setdefault(kind, set()).add(key)
+        for kind, keys in changed.items():
+            self.publish(kind, keys)
+
+
+def _exists(widget):
+    try:
+        return bool(widget.winfo_exists())
+    except tk.TclError:
+        return False
+# ==== 结束 ====
@@ -0,0 +1,67 @@
+import csv
+import os
+
+import dbworker
+
+# ==== 报表导出 ====
+# 导出直接从数据库流式读取（见 paging.Listing.rows，每次 fetchmany 一批），边读边写，
+# 内存占用与导出行数无关。ExportTask 在后台线程里写文件（见 dbworker.BackgroundTask），界面线程定时读取进度，
+# 随时可以取消；取消或出错时删除写了一半的文件。
+
+CSV_ENCODING = 'utf-8-sig'  # 带 BOM，Excel 打开中文不乱码
+PROGRESS_EVERY = 1000
+
+
+class ExportCancelled(dbworker.TaskCancelled):
+    """导出被取消"""
+
+
+def write_csv(path, header, rows, preamble=(), progress=None, cancelled=None):
+    """把 preamble（报表头等若干行）、header 和 rows 依次写入 CSV，返回写入的记录数
+
+    progress(n) 每写 PROGRESS_EVERY 条记录调用一次；cancelled() 返回 True 时中止并抛出 ExportCancelled。
+    """
+    written = 0
+    try:
+        with open(path, 'w', newline='', encoding=CSV_ENCODING) as f:
+            writer = csv.writer(f)
+            writer.writerows(preamble)
+            writer.writerow(header)
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+                if written % PROGRESS_EVERY == 0:
+                    if cancelled and cancelled():
+                        raise ExportCancelled()
+                    if progress:
+                        progress(written)
+    except BaseException:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    finally:
+        # 提前结束时让 rows 归还它占用的数据库连接
+        close = getattr(rows, "close", None)
+        if close:
+            close()
+    if progress:
+        progress(written)
+    return written
+
+
+class ExportTask(dbworker.BackgroundTask):
+    """在后台线程中导出 CSV
+
+    rows   可迭代的记录（通常是 PagedList.all() 的生成器，在后台线程中才开始读库）
+    """
+
+    def __init__(self, path, header, rows, count=None, preamble=()):
+        super().__init__(count)
+        self.path = path
+        self.header = header
+        self.rows = rows
+        self.preamble = preamble
+
+    def _write(self, progress, cancelled):
+        write_csv(self.path, self.header, self.rows, self.preamble, progress, cancelled)
+# ==== 结束 ====
@@ -0,0 +1,73 @@
+import sqlite3
+
+# ==== 房晚库存 ====
+# room_nights 表中每一行表示某个房间的某一晚被某个预订占用（只记录被占用的房晚）。
+# (room_number, night) 是主键，所以同一房间同一晚不可能被两个预订同时占用。
+# 新增、修改、取消预订以及退房时，在同一个事务里调用这里的函数维护库存。
+
+# 生成 [入住日期, 退房日期) 之间每一晚的日期
+_NIGHTS_CTE = """
+    WITH RECURSIVE nights(night) AS (
+        SELECT date(?)
+        UNION ALL
+        SELECT date(night, '+1 day') FROM nights WHERE date(night, '+1 day') < date(?)
+    )
+"""
+
+
+class RoomUnavailable(Exception):
+    """要占用的房晚已经被其他预订占用"""
+
+
+def book_nights(conn, reservation_id, room_number, check_in_date, check_out_date):
+    """为预订占用 [check_in_date, check_out_date) 内的每一晚"""
+    try:
+        conn.execute(_NIGHTS_CTE + """
+            INSERT INTO room_nights (room_number, night, reservation_id)
+            SELECT ?, night, ? FROM nights
+        """, (check_in_date, check_out_date, room_number, reservation_id))
+    except sqlite3.IntegrityError:
+        raise RoomUnavailable(f"房间 {room_number} 在 {check_in_date} 至 {check_out_date} 期间已被占用")
+
+
+def release_nights(conn, reservation_id, from_date=None):
+    """释放预订占用的房晚；from_date 不为空时只释放该日期（含）之后的房晚，用于提前退房"""
+    if from_date is None:
+        conn.execute("DELETE FROM room_nights WHERE reservation_id = ?", (reservation_id,))
+    else:
+        conn.execute("DELETE FROM room_nights WHERE reservation_id = ? AND night >= ?",
+                     (reservation_id, from_date))
+
+
+def rebook_nights(conn, reservation_id, room_number, check_in_date, check_out_date):
+    """修改预订的房间或日期：先释放原房晚，再占用新房晚"""
+    release_nights(conn, reservation_id)
+    book_nights(conn, reservation_id, room_number, check_in_date, check_out_date)
+
+
+def find_free_rooms(conn, check_in_date, check_out_date, room_type=None):
+    """查询 [check_in_date, check_out_date) 内全部空闲的房间
+
+    对每个候选房间在 room_nights 主键上做一次范围查找，房间数上千、预订一整年也只需一条查询。
+    返回 (room_number, room_type, price, status, clean_status) 列表。
+    """
+    query = """
+        SELECT r.room_number, r.room_type, r.price, r.status, r.clean_status
+        FROM rooms r
+        WHERE NOT EXISTS (
+            SELECT 1 FROM room_nights n
+            WHERE n.room_number = r.room_number AND n.night >= ? AND n.night < ?
+        )
+    """
+    params = [check_in_date, check_out_date]
+    if room_type:
+        query += " AND r.room_type = ?"
+        params.append(room_type)
+    query += " ORDER BY r.room_number"
+    return conn.execute(query, params).fetchall()
+
+
+def room_types(conn):
+    """所有房间类型，供查询界面的下拉框使用"""
+    return [row[0] for row in conn.execute("SELECT DISTINCT room_type FROM rooms ORDER BY room_type")]
+# ==== 结束 ====
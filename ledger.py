@@ -0,0 +1,239 @@
+import json
+import os
+import re
+from datetime import datetime
+
+import dates
+import db
+import dbworker
+import export
+
+# ==== 分析用账目导出（列式） ====
+# 交易流水连同订单、客户信息导出为带类型、压缩的 Parquet（或 Arrow IPC）文件，按交易月份分区：
+#   <目录>/month=2026-10/part-0000012001-0000015000.parquet
+# 金额是浮点数、时间是时间戳，笔记本里用 pandas / pyarrow / duckdb 直接读整个目录即可，不用再解析 CSV。
+#
+# 增量追加：<目录>/_ledger_state.json 记录已导出的最大 transaction_id，每次只导出比它大的交易，
+# 写成新的 part 文件（已有文件不改）。交易ID自增且按提交顺序分配，所以不会漏掉新交易；
+# 但已导出的交易之后被修改或删除，不会反映到已有文件里，需要时删掉目录全量重新导出。
+#
+# 依赖 pyarrow（pip install pyarrow），只在导出时才导入。
+
+FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+STATE_FILE = "_ledger_state.json"
+FETCH_SIZE = 20000
+COMPRESSION = "zstd"
+UNKNOWN_MONTH = "unknown"  # 交易时间无法识别的历史数据
+
+_PART_PATTERN = re.compile(r"^part-(\d+)-(\d+)\.(parquet|arrow)$")
+
+_QUERY = """
+    SELECT t.transaction_id, t.reservation_id, r.room_number, r.customer_id, c.name, t.amount,
+           t.transaction_date, t.description, r.check_in_date, r.check_out_date
+    FROM transactions t
+    LEFT JOIN reservations r ON t.reservation_id = r.reservation_id
+    LEFT JOIN customers c ON r.customer_id = c.customer_id
+    WHERE t.transaction_id > ?
+    ORDER BY t.transaction_id
+"""
+
+
+class PyArrowMissing(RuntimeError):
+    """没有安装 pyarrow"""
+
+    def __init__(self):
+        super().__init__("列式导出需要 pyarrow，请先执行 pip install pyarrow")
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise PyArrowMissing()
+    return pyarrow
+
+
+def _schema(pa):
+    return pa.schema([
+        ("transaction_id", pa.int64()),
+        ("reservation_id", pa.int64()),
+        ("room_number", pa.int64()),
+        ("customer_id", pa.int64()),
+        ("customer_name", pa.string()),
+        ("amount", pa.float64()),
+        ("transaction_date", pa.timestamp("s")),
+        ("description", pa.string()),
+        ("check_in_date", pa.date32()),
+        ("check_out_date", pa.date32()),
+    ])
+
+
+def _datetime(text):
+    if text is None:
+        return None
+    try:
+        return datetime.fromisoformat(text)
+    except (TypeError, ValueError):
+        return dates.parse(text)
+
+
+def _date(text):
+    value = _datetime(text)
+    return value.date() if value else None
+
+
+def _month(text):
+    value = _datetime(text)
+    return value.strftime("%Y-%m") if value else UNKNOWN_MONTH
+
+
+def read_state(directory):
+    """上次导出的状态 {"last_transaction_id": ..., "format": ...}，还没导出过时返回 None"""
+    try:
+        with open(os.path.join(directory, STATE_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_state(directory, state):
+    path = os.path.join(directory, STATE_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def _remove_orphans(directory, last_transaction_id):
+    """删除上次导出中途失败留下的文件（part 文件已改名但状态文件没来得及更新，或临时文件）"""
+    for month_dir in os.listdir(directory):
+        path = os.path.join(directory, month_dir)
+        if not (month_dir.startswith("month=") and os.path.isdir(path)):
+            continue
+        for name in os.listdir(path):
+            match = _PART_PATTERN.match(name)
+            if name.endswith(".tmp") or (match and int(match.group(1)) > last_transaction_id):
+                os.remove(os.path.join(path, name))
+
+
+def pending_count(directory):
+    """还没导出的交易数"""
+    state = read_state(directory) or {}
+    with db.reader() as conn:
+        return conn.execute("SELECT COUNT(*) FROM transactions WHERE transaction_id > ?",
+                            (state.get("last_transaction_id", 0),)).fetchone()[0]
+
+
+class _MonthWriter:
+    """一个月份分区本次导出的文件：先写临时文件，全部完成后再改成最终文件名"""
+
+    def __init__(self, pa, directory, month, fmt, schema):
+        self.directory = os.path.join(directory, f"month={month}")
+        os.makedirs(self.directory, exist_ok=True)
+        self.fmt = fmt
+        self.first_id = None
+        self.last_id = None
+        self.tmp_path = os.path.join(self.directory, f"_writing{FORMATS[fmt]}.tmp")
+        if fmt == "parquet":
+            self.writer = pa.parquet.ParquetWriter(self.tmp_path, schema, compression=COMPRESSION)
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=COMPRESSION)
+            self.writer = pa.ipc.new_file(self.tmp_path, schema, options=options)
+
+    def write(self, table, first_id, last_id):
+        if self.first_id is None:
+            self.first_id = first_id
+        self.last_id = last_id
+        self.writer.write_table(table)
+
+    def close(self):
+        self.writer.close()
+
+    def commit(self):
+        name = f"part-{self.first_id:010d}-{self.last_id:010d}{FORMATS[self.fmt]}"
+        os.replace(self.tmp_path, os.path.join(self.directory, name))
+
+    def discard(self):
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+
+def export_ledger(directory, fmt="parquet", progress=None, cancelled=None):
+    """把上次导出之后新增的交易追加导出到 directory，返回本次导出的交易数
+
+    fmt 为 "parquet" 或 "arrow"，同一个目录只能用一种格式。
+    progress(n) 每写一批调用一次；cancelled() 返回 True 时中止并抛出 export.ExportCancelled，本次写的文件全部删除。
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"不支持的格式: {fmt}")
+    pa = _pyarrow()
+    schema = _schema(pa)
+
+    os.makedirs(directory, exist_ok=True)
+    state = read_state(directory) or {"last_transaction_id": 0, "format": fmt}
+    if state.get("format", fmt) != fmt:
+        raise ValueError(f"该目录已按 {state['format']} 格式导出过，请换一个目录")
+    last_transaction_id = state["last_transaction_id"]
+    _remove_orphans(directory, last_transaction_id)
+
+    writers = {}
+    written = 0
+    try:
+        with db.reader() as conn:
+            cursor = conn.execute(_QUERY, (last_transaction_id,))
+            while True:
+                rows = cursor.fetchmany(FETCH_SIZE)
+                if not rows:
+                    break
+                by_month = {}
+                for row in rows:
+                    by_month.setdefault(_month(row[6]), []).append(row)
+                for month, month_rows in by_month.items():
+                    if month not in writers:
+                        writers[month] = _MonthWriter(pa, directory, month, fmt, schema)
+                    writers[month].write(_table(pa, schema, month_rows), month_rows[0][0], month_rows[-1][0])
+                written += len(rows)
+                last_transaction_id = rows[-1][0]
+                if cancelled and cancelled():
+                    raise export.ExportCancelled()
+                if progress:
+                    progress(written)
+        for writer in writers.values():
+            writer.close()
+    except BaseException:
+        for writer in writers.values():
+            try:
+                writer.close()
+            except Exception:
+                pass
+            writer.discard()
+        raise
+
+    for writer in writers.values():
+        writer.commit()
+    _write_state(directory, {"last_transaction_id": last_transaction_id, "format": fmt,
+                             "exported_at": dates.now()})
+    return written
+
+
+def _table(pa, schema, rows):
+    columns = list(zip(*rows))
+    columns[6] = [_datetime(value) for value in columns[6]]
+    columns[8] = [_date(value) for value in columns[8]]
+    columns[9] = [_date(value) for value in columns[9]]
+    return pa.Table.from_arrays([pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+                                schema=schema)
+
+
+class LedgerExportTask(dbworker.BackgroundTask):
+    """在后台线程中增量导出列式账目"""
+
+    def __init__(self, directory, fmt="parquet"):
+        super().__init__(lambda: pending_count(directory))
+        self.directory = directory
+        self.fmt = fmt
+
+    def _write(self, progress, cancelled):
+        export_ledger(self.directory, self.fmt, progress, cancelled)
+# ==== 结束 ====
@@ -1,36 +1,33 @@
-import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import hashlib
 from datetime import datetime, timedelta
 from tkinter import *
-from PIL import Image, ImageTk
+
+import assets
+import service
 
 
 # ==== LoginWindow ====
 class LoginWindow(tk.Tk):
-    def __init__(self, login_callback):
+    def __init__(self, login_callback, hotel_service=None):
         super().__init__()
         self.title("酒店住房管理系统 - 登录")
         self.geometry("400x300")
         self.resizable(False, False)
         self.login_callback = login_callback
+        # 客户端模式下是 client.RemoteService，登录校验由服务器完成
+        self.service = hotel_service or service.HotelService()
 
-        # 加载背景图片
-        try:
-            # 尝试加载背景图片
-            background_image = Image.open("1.jpg")
-            # 调整图片大小以适应窗口
-            background_image = background_image.resize((400, 300), Image.ANTIALIAS)
-            self.background_photo = ImageTk.PhotoImage(background_image)
-
+        # 加载背景图片：读取预先缩放好的缓存（见 assets），不用每次启动都解码、缩放 1.jpg
+        self.background_photo = assets.photo(self, *assets.LOGIN_BACKGROUND)
+        if self.background_photo is not None:
             # 创建背景标签
             background_label = tk.Label(self, image=self.background_photo)
             background_label.place(x=0, y=0, relwidth=1, relheight=1)
 
             # 设置透明背景
             self.configure(bg='white')
-        except Exception as e:
+        else:
             # 如果图片加载失败，使用默认背景色
             self.configure(bg="#f0f0f0")
 
@@ -99,31 +96,19 @@ class LoginWindow(tk.Tk):
         password = self.password_var.get()
         user_type = self.user_type.get()
 
-        if not username or not password:
-            messagebox.showerror("错误", "用户名和密码不能为空")
+        try:
+            user = self.service.authenticate(username, password, user_type)
+        except service.ServiceError as e:
+            messagebox.showerror("错误", str(e))
             return
 
-        conn = sqlite3.connect('hotel.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = ? AND password_hash = ?",
-                       (username, self.hash_password(password)))
-        user = cursor.fetchone()
-        conn.close()
-
-        if user:
-            if (user_type == "admin" and user[3] == "admin") or (
-                    user_type == "frontdesk" and user[3] in ["admin", "frontdesk"]):
-                self.login_callback({
-                    'user_id': user[0],
-                    'username': user[1],
-                    'role': user[3]
-                })
-                self.destroy()
-            else:
-                messagebox.showerror("错误", "权限不足，无法登录该系统")
-        else:
-            messagebox.showerror("错误", "用户名或密码错误")
+        self.login_callback({
+            'user_id': user.user_id,
+            'username': user.username,
+            'role': user.role
+        })
+        self.destroy()
 
     def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
+        return service.hash_password(password)
 
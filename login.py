@@ -1,10 +1,9 @@
-import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import hashlib
 from datetime import datetime, timedelta
 from tkinter import *
-from PIL import Image, ImageTk
+
+import service
 
 
 # ==== LoginWindow  ====
@@ -80,30 +79,18 @@ class LoginWindow(tk.Tk):
         password = self.password_var.get()
         user_type = self.user_type.get()
 
-        if not username or not password:
-            messagebox.showerror("错误", "用户名和密码不能为空")
+        try:
+            user = service.HotelService().authenticate(username, password, user_type)
+        except service.ServiceError as e:
+            messagebox.showerror("错误", str(e))
             return
 
-        conn = sqlite3.connect('hotel.db')
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE username = ? AND password_hash = ?",
-                       (username, self.hash_password(password)))
-        user = cursor.fetchone()
-        conn.close()
-
-        if user:
-            if (user_type == "admin" and user[3] == "admin") or (
-                    user_type == "frontdesk" and user[3] in ["admin", "frontdesk"]):
-                self.login_callback({
-                    'user_id': user[0],
-                    'username': user[1],
-                    'role': user[3]
-                })
-                self.destroy()
-            else:
-                messagebox.showerror("错误", "权限不足，无法登录该系统")
-        else:
-            messagebox.showerror("错误", "用户名或密码错误")
+        self.login_callback({
+            'user_id': user.user_id,
+            'username': user.username,
+            'role': user.role
+        })
+        self.destroy()
 
     def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
\ No newline at end of file
+        return service.hash_password(password)
\ No newline at end of file
@@ -0,0 +1,715 @@
+import hashlib
+import sqlite3
+from datetime import datetime
+
+import db
+
+# ==== 数据库版本迁移 ====
+# 每个迁移步骤只执行一次，执行过的版本号记录在 schema_version 表中。
+# 新增表结构或索引时，在 MIGRATIONS 末尾追加新步骤，不要修改已发布的步骤。
+# 已发布的步骤也不能调用其他模块里会继续修改的函数、常量（状态编码、日期解析、库存维护等）：
+# 否则改动那些模块时，还没升级的数据库执行的就不再是发布时的步骤。需要时写成内联 SQL，
+# 或在本文件里保留一份发布时的私有副本（_V5_*、_V6_*、_V7_* 等）。
+
+
+def _create_base_tables(cursor):
+    """基础表结构（兼容已有的 hotel.db，所以保留 IF NOT EXISTS）"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE,
+            password_hash TEXT,
+            role TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rooms (
+            room_number INTEGER PRIMARY KEY,
+            room_type TEXT,
+            price REAL,
+            status TEXT,
+            clean_status TEXT
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS customers (
+            customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT,
+            contact TEXT,
+            id_card TEXT,
+            points INTEGER DEFAULT 0
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS reservations (
+            reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_number INTEGER,
+            customer_id INTEGER,
+            check_in_date TEXT,
+            check_out_date TEXT,
+            status TEXT,
+            FOREIGN KEY (room_number) REFERENCES rooms(room_number),
+            FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+        )
+    ''')
+
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transactions (
+            transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            reservation_id INTEGER,
+            amount REAL,
+            transaction_date TEXT,
+            description TEXT,
+            FOREIGN KEY (reservation_id) REFERENCES reservations(reservation_id)
+        )
+    ''')
+
+    # 默认 admin 账户
+    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
+    if cursor.fetchone()[0] == 0:
+        password_hash = hashlib.sha256("admin123".encode()).hexdigest()
+        cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                       ("admin", password_hash, "admin"))
+
+
+def _create_lookup_indexes(cursor):
+    """热点查询索引（依据各查询的 EXPLAIN QUERY PLAN 选定）"""
+    # 办理入住：WHERE room_number = ? AND customer_id = ? AND status = ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_room_customer_status "
+                   "ON reservations(room_number, customer_id, status)")
+    # 新增预订的日期冲突检查：WHERE room_number = ? AND check_in_date < ? AND check_out_date > ?
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_room_dates "
+                   "ON reservations(room_number, check_in_date, check_out_date)")
+    # 预订列表按状态筛选并按入住日期排序
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_status_check_in "
+                   "ON reservations(status, check_in_date)")
+    # 客户按身份证号查找
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_id_card ON customers(id_card)")
+    # 交易记录按日期范围筛选、按日期倒序排列
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_date ON transactions(transaction_date)")
+    # 财务统计：date(transaction_date) = ... 以及近7天按天汇总
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_day "
+                   "ON transactions(date(transaction_date))")
+    # 财务统计：strftime('%Y-%m', transaction_date) = ...
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_month "
+                   "ON transactions(strftime('%Y-%m', transaction_date))")
+    # 按订单汇总账目
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_reservation ON transactions(reservation_id)")
+
+
+def _create_availability_index(cursor):
+    """可用性检查的覆盖索引：按房间、入住日期倒序取最后一条预订，无需回表
+
+    版本 5 重建 reservations 表时此索引随旧表一起删除，不再重建：版本 4 起可用性检查改查 room_nights，
+    见版本 15 的说明。
+    """
+    cursor.execute("DROP INDEX IF EXISTS idx_reservations_room_dates")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reservations_room_availability "
+                   "ON reservations(room_number, check_in_date, check_out_date, status)")
+
+
+def _create_room_nights(cursor):
+    """房晚库存表，并根据现有的有效预订回填"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS room_nights (
+            room_number INTEGER NOT NULL,
+            night TEXT NOT NULL,
+            reservation_id INTEGER NOT NULL,
+            PRIMARY KEY (room_number, night)
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_room_nights_reservation ON room_nights(reservation_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_rooms_type ON rooms(room_type)")
+
+    # 历史数据里可能有互相重叠的预订，按预订ID先到先得
+    cursor.execute('''
+        WITH RECURSIVE nights(reservation_id, room_number, night, check_out_date) AS (
+            SELECT reservation_id, room_number, date(check_in_date), date(check_out_date)
+            FROM reservations
+            WHERE status NOT IN ('canceled', 'cancelled', 'completed')
+              AND date(check_in_date) < date(check_out_date)
+            UNION ALL
+            SELECT reservation_id, room_number, date(night, '+1 day'), check_out_date
+            FROM nights WHERE date(night, '+1 day') < check_out_date
+        )
+        INSERT OR IGNORE INTO room_nights (room_number, night, reservation_id)
+        SELECT room_number, night, reservation_id FROM nights ORDER BY reservation_id
+    ''')
+
+
+# 历史数据中出现过的字符串状态 -> 编码（RoomStatus / ReservationStatus 在版本 5 发布时的取值）
+_V5_ROOM_STATUS_CASE = (
+    "CASE status WHEN '空闲' THEN 0 WHEN 'available' THEN 0 WHEN '已预订' THEN 1 WHEN 'reserved' THEN 1 "
+    "WHEN '已入住' THEN 2 WHEN 'checked_in' THEN 2 WHEN 'occupied' THEN 2 ELSE 0 END")
+_V5_RESERVATION_STATUS_CASE = (
+    "CASE status WHEN '已预订' THEN 0 WHEN 'reserved' THEN 0 WHEN 'confirmed' THEN 0 "
+    "WHEN '已入住' THEN 1 WHEN 'checked_in' THEN 1 "
+    "WHEN '已取消' THEN 2 WHEN 'canceled' THEN 2 WHEN 'cancelled' THEN 2 "
+    "WHEN '已完成' THEN 3 WHEN '已退房' THEN 3 WHEN 'completed' THEN 3 ELSE 0 END")
+
+
+def _status_codes(cursor):
+    """房间、预订状态由混杂的中英文字符串改为整数编码，并建立按状态的部分索引
+
+    SQLite 不能直接修改列类型，这里按官方推荐的方式重建 rooms、reservations 两张表。
+    """
+    room_case = _V5_ROOM_STATUS_CASE
+    reservation_case = _V5_RESERVATION_STATUS_CASE
+
+    cursor.execute('''
+        CREATE TABLE rooms_new (
+            room_number INTEGER PRIMARY KEY,
+            room_type TEXT,
+            price REAL,
+            status INTEGER NOT NULL DEFAULT 0,
+            clean_status TEXT
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO rooms_new (room_number, room_type, price, status, clean_status)
+        SELECT room_number, room_type, price, {room_case}, clean_status FROM rooms
+    ''')
+    cursor.execute("DROP TABLE rooms")
+    cursor.execute("ALTER TABLE rooms_new RENAME TO rooms")
+    cursor.execute("CREATE INDEX idx_rooms_type ON rooms(room_type)")
+
+    # 保留自增序号，避免重建后复用已删除预订的ID
+    row = cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'reservations'").fetchone()
+    reservation_seq = row[0] if row else 0
+
+    cursor.execute('''
+        CREATE TABLE reservations_new (
+            reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            room_number INTEGER,
+            customer_id INTEGER,
+            check_in_date TEXT,
+            check_out_date TEXT,
+            status INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (room_number) REFERENCES rooms(room_number),
+            FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+        )
+    ''')
+    cursor.execute(f'''
+        INSERT INTO reservations_new (reservation_id, room_number, customer_id, check_in_date, check_out_date, status)
+        SELECT reservation_id, room_number, customer_id, check_in_date, check_out_date, {reservation_case}
+        FROM reservations
+    ''')
+    cursor.execute("DROP TABLE reservations")
+    cursor.execute("ALTER TABLE reservations_new RENAME TO reservations")
+    cursor.execute("UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'reservations'", (reservation_seq,))
+
+    # 旧表上的 idx_reservations_room_availability、idx_reservations_room_customer_status 随旧表删除，
+    # 由下面的部分索引和 room_nights 代替（见版本 15）
+    # 已预订 = 0，已入住 = 1
+    # 预订列表按状态筛选、按入住日期排序；收费项目选择有效订单
+    cursor.execute("CREATE INDEX idx_reservations_status_check_in ON reservations(status, check_in_date)")
+    # 办理入住：只在“已预订”的预订里按房间号 + 客户ID查找
+    cursor.execute("CREATE INDEX idx_reservations_reserved ON reservations(room_number, customer_id) "
+                   "WHERE status = 0")
+    # 办理退房：只在“已入住”的预订里按房间号查找
+    cursor.execute("CREATE INDEX idx_reservations_in_house ON reservations(room_number) "
+                   "WHERE status = 1")
+    # 客户的预订记录
+    cursor.execute("CREATE INDEX idx_reservations_customer ON reservations(customer_id)")
+
+
+# 交易所属的营业日（版本 6 发布时 revenue.DAY_EXPR 的定义）；无法解析的日期归到 '' 这一天
+_V6_DAY_EXPR = "IFNULL(date({row}.transaction_date), '')"
+
+
+def _revenue_add_line(row):
+    """触发器语句：把一笔交易计入汇总"""
+    day = _V6_DAY_EXPR.format(row=row)
+    return f'''
+        INSERT INTO revenue_daily (day, amount, line_count, order_count)
+        VALUES ({day}, IFNULL({row}.amount, 0), 1, 0)
+        ON CONFLICT(day) DO UPDATE SET amount = amount + excluded.amount, line_count = line_count + 1;
+        INSERT INTO revenue_orders (reservation_id, day, line_count)
+        SELECT {row}.reservation_id, {day}, 1 WHERE {row}.reservation_id IS NOT NULL
+        ON CONFLICT(reservation_id, day) DO UPDATE SET line_count = line_count + 1;
+    '''
+
+
+def _revenue_remove_line(row):
+    """触发器语句：把一笔交易从汇总中扣除，计数归零的行直接删除"""
+    day = _V6_DAY_EXPR.format(row=row)
+    return f'''
+        UPDATE revenue_orders SET line_count = line_count - 1
+        WHERE reservation_id = {row}.reservation_id AND day = {day};
+        DELETE FROM revenue_orders
+        WHERE reservation_id = {row}.reservation_id AND day = {day} AND line_count <= 0;
+        UPDATE revenue_daily SET amount = amount - IFNULL({row}.amount, 0), line_count = line_count - 1
+        WHERE day = {day};
+        DELETE FROM revenue_daily WHERE day = {day} AND line_count <= 0;
+    '''
+
+
+def _revenue_rollup(cursor):
+    """营收日汇总表及其维护触发器（财务统计只读汇总表，不再扫描全部交易流水）"""
+    cursor.execute('''
+        CREATE TABLE revenue_daily (
+            day TEXT PRIMARY KEY,
+            amount REAL NOT NULL DEFAULT 0,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            order_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+        CREATE TABLE revenue_orders (
+            reservation_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            line_count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (reservation_id, day)
+        ) WITHOUT ROWID
+    ''')
+
+    # 某天第一次出现某个订单时订单数 +1，最后一笔交易删除时 -1
+    cursor.execute('''
+        CREATE TRIGGER trg_revenue_orders_insert AFTER INSERT ON revenue_orders
+        BEGIN
+            UPDATE revenue_daily SET order_count = order_count + 1 WHERE day = NEW.day;
+        END
+    ''')
+    cursor.execute('''
+        CREATE TRIGGER trg_revenue_orders_delete AFTER DELETE ON revenue_orders
+        BEGIN
+            UPDATE revenue_daily SET order_count = order_count - 1 WHERE day = OLD.day;
+        END
+    ''')
+
+    # 先回填历史数据，再建交易表上的触发器；revenue_orders 上的触发器会顺带累加 revenue_daily.order_count
+    day = _V6_DAY_EXPR.format(row="transactions")
+    cursor.execute(f"""
+        INSERT INTO revenue_daily (day, amount, line_count, order_count)
+        SELECT {day}, SUM(amount), COUNT(*), 0
+        FROM transactions GROUP BY 1
+    """)
+    cursor.execute(f"""
+        INSERT INTO revenue_orders (reservation_id, day, line_count)
+        SELECT reservation_id, {day}, COUNT(*)
+        FROM transactions WHERE reservation_id IS NOT NULL GROUP BY 1, 2
+    """)
+
+    cursor.execute(f"CREATE TRIGGER trg_transactions_revenue_insert AFTER INSERT ON transactions "
+                   f"BEGIN {_revenue_add_line('NEW')} END")
+    cursor.execute(f"CREATE TRIGGER trg_transactions_revenue_delete AFTER DELETE ON transactions "
+                   f"BEGIN {_revenue_remove_line('OLD')} END")
+    cursor.execute(f"CREATE TRIGGER trg_transactions_revenue_update "
+                   f"AFTER UPDATE OF reservation_id, amount, transaction_date ON transactions "
+                   f"BEGIN {_revenue_remove_line('OLD')} {_revenue_add_line('NEW')} END")
+
+
+# 版本 7 发布时 dates.py 能识别的历史写法
+_V7_INPUT_FORMATS = (
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%d",
+    "%Y/%m/%d %H:%M:%S",
+    "%Y/%m/%d",
+    "%Y.%m.%d",
+    "%Y%m%d",
+)
+
+
+def _v7_canonical(text, output_format):
+    """按版本 7 的规则规范化日期（dates.canonical_date / canonical_datetime 当时的实现），无法识别时返回 None"""
+    if text is None:
+        return None
+    text = str(text).strip()
+    for fmt in _V7_INPUT_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).strftime(output_format)
+        except ValueError:
+            continue
+    return None
+
+
+def _canonical_dates(cursor):
+    """日期统一为严格的 ISO 格式（见 dates.py），范围筛选改为直接在索引上做区间扫描"""
+    conn = cursor.connection
+    conn.create_function("canonical_date", 1, lambda text: _v7_canonical(text, "%Y-%m-%d"), deterministic=True)
+    conn.create_function("canonical_datetime", 1, lambda text: _v7_canonical(text, "%Y-%m-%d %H:%M:%S"),
+                         deterministic=True)
+
+    # 预订日期：记录下被改写的预订，之前因为日期无法识别而没有回填房晚库存
+    changed = cursor.execute("""
+        SELECT reservation_id, room_number, canonical_date(check_in_date), canonical_date(check_out_date)
+        FROM reservations
+        WHERE status IN (0, 1)  -- 已预订、已入住
+          AND (check_in_date IS NOT canonical_date(check_in_date)
+               OR check_out_date IS NOT canonical_date(check_out_date))
+    """).fetchall()
+    cursor.execute("""
+        UPDATE reservations SET check_in_date = canonical_date(check_in_date)
+        WHERE canonical_date(check_in_date) IS NOT NULL AND check_in_date IS NOT canonical_date(check_in_date)
+    """)
+    cursor.execute("""
+        UPDATE reservations SET check_out_date = canonical_date(check_out_date)
+        WHERE canonical_date(check_out_date) IS NOT NULL AND check_out_date IS NOT canonical_date(check_out_date)
+    """)
+    for reservation_id, room_number, check_in_date, check_out_date in changed:
+        if not (check_in_date and check_out_date) or check_in_date >= check_out_date:
+            continue
+        if cursor.execute("SELECT 1 FROM room_nights WHERE reservation_id = ? LIMIT 1", (reservation_id,)).fetchone():
+            continue
+        try:
+            cursor.execute("""
+                WITH RECURSIVE nights(night) AS (
+                    SELECT date(?)
+                    UNION ALL
+                    SELECT date(night, '+1 day') FROM nights WHERE date(night, '+1 day') < date(?)
+                )
+                INSERT INTO room_nights (room_number, night, reservation_id)
+                SELECT ?, night, ? FROM nights
+            """, (check_in_date, check_out_date, room_number, reservation_id))
+        except sqlite3.IntegrityError:
+            # 与先到的预订重叠，和 _create_room_nights 一样按先到先得处理
+            pass
+
+    # 交易时间：营收汇总由触发器随之修正
+    cursor.execute("""
+        UPDATE transactions SET transaction_date = canonical_datetime(transaction_date)
+        WHERE canonical_datetime(transaction_date) IS NOT NULL
+          AND transaction_date IS NOT canonical_datetime(transaction_date)
+    """)
+
+    # 今后写入的日期必须已经是规范格式（无法识别的历史数据保持原样，修改时才需要改正）
+    cursor.execute("""
+        CREATE TRIGGER trg_reservations_date_format_insert BEFORE INSERT ON reservations
+        WHEN NEW.check_in_date IS NOT date(NEW.check_in_date) OR NEW.check_out_date IS NOT date(NEW.check_out_date)
+        BEGIN
+            SELECT RAISE(ABORT, '入住/退房日期必须为 YYYY-MM-DD 格式');
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_reservations_date_format_update BEFORE UPDATE OF check_in_date, check_out_date ON reservations
+        WHEN NEW.check_in_date IS NOT date(NEW.check_in_date) OR NEW.check_out_date IS NOT date(NEW.check_out_date)
+        BEGIN
+            SELECT RAISE(ABORT, '入住/退房日期必须为 YYYY-MM-DD 格式');
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_transactions_date_format_insert BEFORE INSERT ON transactions
+        WHEN NEW.transaction_date IS NOT datetime(NEW.transaction_date)
+        BEGIN
+            SELECT RAISE(ABORT, '交易时间必须为 YYYY-MM-DD HH:MM:SS 格式');
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_transactions_date_format_update BEFORE UPDATE OF transaction_date ON transactions
+        WHEN NEW.transaction_date IS NOT datetime(NEW.transaction_date)
+        BEGIN
+            SELECT RAISE(ABORT, '交易时间必须为 YYYY-MM-DD HH:MM:SS 格式');
+        END
+    """)
+
+    # 财务统计已改读营收汇总表，按 date()/strftime() 表达式建的索引不再有查询使用
+    cursor.execute("DROP INDEX IF EXISTS idx_transactions_day")
+    cursor.execute("DROP INDEX IF EXISTS idx_transactions_month")
+
+
+def _full_text_search(cursor):
+    """交易描述和客户信息的 FTS5 全文索引（trigram 分词），关键词搜索不再用前置通配符的 LIKE 全表扫描"""
+    # 外部内容表：索引里不再存一份原文，原文从 transactions / customers 读取
+    cursor.execute("""
+        CREATE VIRTUAL TABLE transactions_fts USING fts5(
+            description, content='transactions', content_rowid='transaction_id', tokenize='trigram'
+        )
+    """)
+    cursor.execute("""
+        CREATE VIRTUAL TABLE customers_fts USING fts5(
+            name, contact, id_card, content='customers', content_rowid='customer_id', tokenize='trigram'
+        )
+    """)
+    # 按现有数据建索引
+    cursor.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')")
+
+    # 外部内容表删除旧内容时必须给出原来的值
+    cursor.execute("""
+        CREATE TRIGGER trg_transactions_fts_insert AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.transaction_id, NEW.description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_transactions_fts_delete AFTER DELETE ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', OLD.transaction_id, OLD.description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_transactions_fts_update AFTER UPDATE OF description ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (transactions_fts, rowid, description)
+            VALUES ('delete', OLD.transaction_id, OLD.description);
+            INSERT INTO transactions_fts (rowid, description) VALUES (NEW.transaction_id, NEW.description);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_customers_fts_insert AFTER INSERT ON customers
+        BEGIN
+            INSERT INTO customers_fts (rowid, name, contact, id_card)
+            VALUES (NEW.customer_id, NEW.name, NEW.contact, NEW.id_card);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_customers_fts_delete AFTER DELETE ON customers
+        BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, contact, id_card)
+            VALUES ('delete', OLD.customer_id, OLD.name, OLD.contact, OLD.id_card);
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_customers_fts_update AFTER UPDATE OF name, contact, id_card ON customers
+        BEGIN
+            INSERT INTO customers_fts (customers_fts, rowid, name, contact, id_card)
+            VALUES ('delete', OLD.customer_id, OLD.name, OLD.contact, OLD.id_card);
+            INSERT INTO customers_fts (rowid, name, contact, id_card)
+            VALUES (NEW.customer_id, NEW.name, NEW.contact, NEW.id_card);
+        END
+    """)
+
+
+def _customer_prefix_indexes(cursor):
+    """客户输入提示按姓名、联系方式前缀做区间查找（身份证号已有 idx_customers_id_card）"""
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_name ON customers(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_customers_contact ON customers(contact)")
+
+
+def _night_audit(cursor):
+    """夜审：营业日记录表，以及房晚房费与交易的对应（同一订单同一晚只能记一次房费）"""
+    cursor.execute("""
+        CREATE TABLE night_audits (
+            business_date TEXT PRIMARY KEY,
+            audited_at TEXT NOT NULL,
+            audited_by TEXT,
+            room_charges INTEGER NOT NULL,
+            charge_total REAL NOT NULL,
+            no_shows INTEGER NOT NULL
+        )
+    """)
+    # 夜审记的房费在 posting_night 上写明是哪一晚，其他交易为 NULL
+    cursor.execute("ALTER TABLE transactions ADD COLUMN posting_night TEXT")
+    cursor.execute("CREATE UNIQUE INDEX idx_transactions_posting ON transactions(reservation_id, posting_night) "
+                   "WHERE posting_night IS NOT NULL")
+
+
+def _room_changes(cursor):
+    """房间变更记录：每个房间最后一次被增删改时的版本号，房间缓存据此只重读变了的房间（见 room_cache.py）"""
+    cursor.execute("""
+        CREATE TABLE room_changes (
+            room_number INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL
+        )
+    """)
+    cursor.execute("CREATE INDEX idx_room_changes_version ON room_changes(version)")
+    # 版本号全库递增：新版本号 = 当前最大版本号 + 1（走 idx_room_changes_version，只读一个索引项）
+    bump = "INSERT OR REPLACE INTO room_changes (room_number, version) " \
+           "VALUES ({room}, (SELECT IFNULL(MAX(version), 0) + 1 FROM room_changes))"
+    cursor.execute(f"""
+        CREATE TRIGGER trg_rooms_change_insert AFTER INSERT ON rooms
+        BEGIN
+            {bump.format(room="NEW.room_number")};
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_rooms_change_update AFTER UPDATE ON rooms
+        BEGIN
+            {bump.format(room="NEW.room_number")};
+            -- 改了房间号时原房间号也算变更（原房间不存在了）
+            INSERT OR REPLACE INTO room_changes (room_number, version)
+            SELECT OLD.room_number, (SELECT IFNULL(MAX(version), 0) + 1 FROM room_changes)
+            WHERE OLD.room_number <> NEW.room_number;
+        END
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER trg_rooms_change_delete AFTER DELETE ON rooms
+        BEGIN
+            {bump.format(room="OLD.room_number")};
+        END
+    """)
+
+
+def _change_log(cursor):
+    """变更日志：房间、预订、交易的每次增删改按顺序记一行 (种类, 主键)，打开的列表窗口据此只刷新变了的行（见 events.py）"""
+    # AUTOINCREMENT：夜审清理旧日志后版本号也不会重复使用
+    cursor.execute("""
+        CREATE TABLE change_log (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            kind TEXT NOT NULL,
+            key INTEGER NOT NULL
+        )
+    """)
+    for table, kind, key in (("rooms", "room", "room_number"),
+                             ("reservations", "reservation", "reservation_id"),
+                             ("transactions", "transaction", "transaction_id")):
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_log_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (kind, key) VALUES ('{kind}', NEW.{key});
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_log_update AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (kind, key) VALUES ('{kind}', NEW.{key});
+                INSERT INTO change_log (kind, key) SELECT '{kind}', OLD.{key} WHERE OLD.{key} <> NEW.{key};
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_{table}_log_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (kind, key) VALUES ('{kind}', OLD.{key});
+            END
+        """)
+
+
+def _revenue_order_total(cursor):
+    """营收订单总数计数行：财务概览的订单数直接读这一行，不再对 revenue_orders 做 COUNT(DISTINCT)"""
+    cursor.execute("""
+        CREATE TABLE revenue_totals (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            order_count INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT INTO revenue_totals (id, order_count) "
+                   "SELECT 1, COUNT(DISTINCT reservation_id) FROM revenue_orders")
+    # 订单在任何一天第一次有交易时 +1，最后一天的交易全部删除时 -1（都只查 revenue_orders 主键的一段）
+    cursor.execute("""
+        CREATE TRIGGER trg_revenue_orders_total_insert AFTER INSERT ON revenue_orders
+        WHEN NOT EXISTS (SELECT 1 FROM revenue_orders
+                         WHERE reservation_id = NEW.reservation_id AND day <> NEW.day)
+        BEGIN
+            UPDATE revenue_totals SET order_count = order_count + 1 WHERE id = 1;
+        END
+    """)
+    cursor.execute("""
+        CREATE TRIGGER trg_revenue_orders_total_delete AFTER DELETE ON revenue_orders
+        WHEN NOT EXISTS (SELECT 1 FROM revenue_orders WHERE reservation_id = OLD.reservation_id)
+        BEGIN
+            UPDATE revenue_totals SET order_count = order_count - 1 WHERE id = 1;
+        END
+    """)
+
+
+def _search_sync_switch(cursor):
+    """客户全文索引的同步开关：批量导入时置位暂停逐行同步（见 search.bulk_customers），不再临时删除、重建触发器"""
+    cursor.execute("""
+        CREATE TABLE search_sync (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            paused INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    cursor.execute("INSERT INTO search_sync (id, paused) VALUES (1, 0)")
+    cursor.execute("DROP TRIGGER trg_customers_fts_insert")
+    cursor.execute("""
+        CREATE TRIGGER trg_customers_fts_insert AFTER INSERT ON customers
+        WHEN (SELECT paused FROM search_sync WHERE id = 1) IS NOT 1
+        BEGIN
+            INSERT INTO customers_fts (rowid, name, contact, id_card)
+            VALUES (NEW.customer_id, NEW.name, NEW.contact, NEW.id_card);
+        END
+    """)
+
+
+def _retire_reservation_indexes(cursor):
+    """明确退役版本 2、3 在 reservations 上建的两个索引
+
+    版本 5 重建 reservations 表时这两个索引已随旧表删除，这一步只是把这个决定记下来，
+    并保证以后不会有人照着版本 3 把它们建回来：
+      - idx_reservations_room_availability：可用性检查自版本 4 起在 room_nights 的
+        (room_number, night) 主键上做范围查找（见 availability.py），不再查 reservations；
+      - idx_reservations_room_customer_status：办理入住改用只含“已预订”的部分索引 idx_reservations_reserved。
+    """
+    cursor.execute("DROP INDEX IF EXISTS idx_reservations_room_availability")
+    cursor.execute("DROP INDEX IF EXISTS idx_reservations_room_customer_status")
+
+
+# (版本号, 说明, 执行函数)，按版本号从小到大执行
+MIGRATIONS = [
+    (1, "基础表结构", _create_base_tables),
+    (2, "热点查询索引", _create_lookup_indexes),
+    (3, "可用性检查覆盖索引", _create_availability_index),
+    (4, "房晚库存表", _create_room_nights),
+    (5, "状态改为整数编码", _status_codes),
+    (6, "营收日汇总表", _revenue_rollup),
+    (7, "日期统一为 ISO 格式", _canonical_dates),
+    (8, "全文检索索引", _full_text_search),
+    (9, "客户前缀查找索引", _customer_prefix_indexes),
+    (10, "夜审", _night_audit),
+    (11, "房间变更记录", _room_changes),
+    (12, "变更日志", _change_log),
+    (13, "营收订单总数", _revenue_order_total),
+    (14, "全文索引同步开关", _search_sync_switch),
+    (15, "退役预订表旧索引", _retire_reservation_indexes),
+]
+
+
+def applied_version(conn):
+    """已执行到的版本号，还没有 schema_version 表时为 0（只读，可以在读连接上调用）"""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'").fetchone()
+    if not exists:
+        return 0
+    return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0] or 0
+
+
+def current_version(conn):
+    """在写连接上取已执行到的版本号，没有 schema_version 表时先建表"""
+    version = applied_version(conn)
+    if version:
+        return version
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TEXT
+        )
+    ''')
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate():
+    """把数据库升级到最新版本，返回本次执行的迁移步骤数"""
+    # 平时启动时数据库早已是最新版本：只在读连接上看一眼版本号，不拿写锁，不用等其他终端的写事务
+    with db.reader() as conn:
+        if applied_version(conn) >= MIGRATIONS[-1][0]:
+            return 0
+    applied = 0
+    with db.writer() as conn:
+        version = current_version(conn)
+        conn.commit()
+        if version >= MIGRATIONS[-1][0]:
+            return 0
+        for step_version, description, step in MIGRATIONS:
+            if step_version <= version:
+                continue
+            # 每个步骤单独一个事务，失败时整步回滚，版本号不会前进
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # 另一台终端可能已先一步完成了这个步骤
+                if conn.execute("SELECT 1 FROM schema_version WHERE version = ?", (step_version,)).fetchone():
+                    conn.rollback()
+                    continue
+                step(conn.cursor())
+                conn.execute("INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                             (step_version, description, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied += 1
+        # 新索引建好后让 SQLite 按需更新统计信息
+        if applied:
+            conn.execute("PRAGMA optimize")
+    return applied
+# ==== 结束 ====
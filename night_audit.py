@@ -0,0 +1,135 @@
+import argparse
+import sys
+from collections import namedtuple
+
+import dates
+import db
+import migrations
+import service
+from statuses import ReservationStatus, RoomStatus
+
+# ==== 夜审 ====
+# 每晚结束一个营业日：
+#   1. 给每个在住的预订（已入住，且这一晚在 [入住日期, 退房日期) 之内）记一晚房费，
+#      金额为房间当前价钱，交易时间为营业日当天 23:59:59，posting_night 写明是哪一晚；
+#      补做落后的夜审时，不会给客人到店之前的日子记房费；
+#   2. 入住日期已到（不晚于该营业日）仍是“已预订”的预订标记为未到店，释放其房晚库存，
+#      没有其他“已预订”预订的房间恢复为空闲；
+#   3. 在 night_audits 中记下该营业日已结束，营业日前进一天；
+#   4. 清理变更日志（change_log，见 events.py），只保留最近 CHANGE_LOG_KEEP 条。
+#
+# 全部用 INSERT … SELECT / UPDATE / DELETE 整批完成，不逐个房间循环，并放在同一个事务里：
+# 中途断电或出错时整体回滚，重新执行即可。同一订单同一晚的房费有唯一索引
+# （idx_transactions_posting）保护，不会重复记账。
+#
+#   python night_audit.py             结束当前营业日
+#   python night_audit.py --status    只显示当前营业日
+
+NightAudit = namedtuple("NightAudit", "business_date room_charges charge_total no_shows")
+
+CHARGE_TIME = "23:59:59"
+CHARGE_DESCRIPTION = "房费"
+CHANGE_LOG_KEEP = 10000
+
+
+def current_business_date():
+    """当前（尚未夜审的）营业日：上次夜审的下一天；从未夜审过时为今天"""
+    with db.reader() as conn:
+        audited = conn.execute("SELECT MAX(business_date) FROM night_audits").fetchone()[0]
+    return dates.next_day(audited) if audited else dates.now()[:10]
+
+
+def run(business_date=None, audited_by=None):
+    """结束一个营业日，返回 NightAudit
+
+    business_date 不给时为当前营业日；从未夜审过时可以指定从哪一天开始，之后只能按顺序逐日夜审。
+    营业日不能晚于今天（还没过完的日子不能结束）。
+    """
+    today = dates.now()[:10]
+    # 写事务以 BEGIN IMMEDIATE 开始：夜审期间其他终端的写操作排队等待，看到的在住、预订情况是一致的
+    with db.writer() as conn:
+        audited = conn.execute("SELECT MAX(business_date) FROM night_audits").fetchone()[0]
+        expected = dates.next_day(audited) if audited else today
+        if business_date is None:
+            business_date = expected
+        else:
+            business_date = dates.canonical_date(business_date)
+            if not business_date:
+                raise service.ValidationError("日期格式不正确，请使用YYYY-MM-DD格式")
+            if audited and business_date != expected:
+                raise service.Conflict(f"营业日 {audited} 已夜审，下一个应夜审的营业日是 {expected}")
+        if business_date > today:
+            raise service.Conflict(f"营业日 {business_date} 还没有结束，不能夜审")
+
+        checked_in = int(ReservationStatus.CHECKED_IN)
+        reserved = int(ReservationStatus.RESERVED)
+
+        # 1. 在住房间记一晚房费
+        cursor = conn.execute(f"""
+            INSERT INTO transactions (reservation_id, amount, transaction_date, description, posting_night)
+            SELECT r.reservation_id, rm.price, :charge_time, :description, :night
+            FROM reservations r
+            JOIN rooms rm ON rm.room_number = r.room_number
+            WHERE r.status = {checked_in}
+              AND r.check_in_date <= :night AND r.check_out_date > :night
+              AND NOT EXISTS (SELECT 1 FROM transactions t
+                              WHERE t.reservation_id = r.reservation_id AND t.posting_night = :night)
+        """, {"charge_time": f"{business_date} {CHARGE_TIME}", "description": CHARGE_DESCRIPTION,
+              "night": business_date})
+        room_charges = cursor.rowcount
+        charge_total = conn.execute("SELECT IFNULL(SUM(amount), 0) FROM transactions WHERE posting_night = ?",
+                                    (business_date,)).fetchone()[0]
+
+        # 2. 未到店：先释放房晚库存，再改预订状态，最后把不再有预订的房间恢复为空闲
+        conn.execute(f"""
+            DELETE FROM room_nights WHERE reservation_id IN (
+                SELECT reservation_id FROM reservations WHERE status = {reserved} AND check_in_date <= ?)
+        """, (business_date,))
+        no_shows = conn.execute(f"""
+            UPDATE reservations SET status = {int(ReservationStatus.NO_SHOW)}
+            WHERE status = {reserved} AND check_in_date <= ?
+        """, (business_date,)).rowcount
+        if no_shows:
+            conn.execute(f"""
+                UPDATE rooms SET status = {int(RoomStatus.AVAILABLE)}
+                WHERE status = {int(RoomStatus.RESERVED)}
+                  AND NOT EXISTS (SELECT 1 FROM reservations r
+                                  WHERE r.room_number = rooms.room_number AND r.status = {reserved})
+            """)
+
+        # 3. 营业日前进
+        conn.execute("INSERT INTO night_audits (business_date, audited_at, audited_by, room_charges, "
+                     "charge_total, no_shows) VALUES (?, ?, ?, ?, ?, ?)",
+                     (business_date, dates.now(), audited_by, room_charges, charge_total, no_shows))
+
+        # 4. 变更日志只供打开着的窗口增量刷新，落后太多的终端会整体重新加载
+        conn.execute("DELETE FROM change_log WHERE version <= (SELECT MAX(version) FROM change_log) - ?",
+                     (CHANGE_LOG_KEEP,))
+    return NightAudit(business_date, room_charges, charge_total, no_shows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="夜审：给在住房间记房费、标记未到店、营业日前进一天")
+    parser.add_argument("--db", default=db.DB_PATH, help="数据库文件")
+    parser.add_argument("--date", help="要结束的营业日（只有第一次夜审时可以指定）")
+    parser.add_argument("--status", action="store_true", help="只显示当前营业日，不夜审")
+    args = parser.parse_args(argv)
+
+    db.configure(args.db)
+    migrations.migrate()
+    if args.status:
+        print(f"当前营业日: {current_business_date()}")
+        return 0
+    try:
+        result = run(args.date, audited_by="night_audit.py")
+    except service.ServiceError as e:
+        print(f"夜审失败: {e}", file=sys.stderr)
+        return 1
+    print(f"营业日 {result.business_date} 夜审完成：记房费 {result.room_charges} 笔，"
+          f"合计 {result.charge_total:.2f}，未到店 {result.no_shows} 个")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# ==== 结束 ====
@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+# ==== 键集分页 ====
+# 大列表（交易、客户、预订）不再一次 fetchall()，而是按页取：
+#   WHERE (排序列, 主键) > (上一页最后一行的排序列, 主键) ORDER BY 排序列, 主键 LIMIT n
+# 翻页代价只与页大小有关，与已经翻过多少行无关（OFFSET 翻到后面会越来越慢）。
+# 主键作为第二排序列保证顺序唯一，排序列有重复值时也不会漏行或重行。
+# 每一行的游标就是 (排序值, 主键)，界面保存它们，向前、向后翻页都从游标继续。
+#
+# 排序列为 NULL 的行无法参与行值比较，又不能用 IFNULL() 包住排序列（那样用不上索引），
+# 所以把它们当作单独的一段：升序时 NULL 段在前，降序时在后（与 SQLite 的 NULL 排序一致），
+# 一页没取满时接着取下一段。
+
+PAGE_SIZE = 200
+# 逐行遍历全部记录时每次从游标取的行数
+FETCH_SIZE = 1000
+
+# rows: 当前页的记录；cursors: 与 rows 一一对应的游标；more: 沿翻页方向是否还有数据
+Page = namedtuple("Page", "rows cursors more")
+
+
+class Listing:
+    """一个可排序、可筛选、可分页的列表查询
+
+    columns    SELECT 的列（返回给调用方的记录）
+    source     FROM ... JOIN ... 部分
+    key        唯一键表达式（不能为 NULL），作为第二排序列
+    sorts      {排序名: SQL 表达式}，界面的列名直接作为排序名
+    """
+
+    def __init__(self, columns, source, key, sorts, default_sort, default_descending=False,
+                 conditions=(), params=()):
+        self.columns = columns
+        self.source = source
+        self.key = key
+        self.sorts = sorts
+        self.default_sort = default_sort
+        self.default_descending = default_descending
+        self.conditions = tuple(conditions)
+        self.params = tuple(params)
+
+    def filter(self, condition, *params):
+        """追加一个 WHERE 条件，返回新的 Listing"""
+        return Listing(self.columns, self.source, self.key, self.sorts, self.default_sort,
+                       self.default_descending, self.conditions + (condition,), self.params + params)
+
+    def _sort_expr(self, sort):
+        return self.sorts.get(sort) or self.sorts[self.default_sort]
+
+    def _segments(self, sort_expr, ascending, cursor):
+        """沿扫描方向依次要取的各段：[(条件, 参数)]"""
+        null_first = ascending
+        null_segment = (f"{sort_expr} IS NULL", [])
+        value_segment = (f"{sort_expr} IS NOT NULL", [])
+        if cursor is not None:
+            value, key = cursor
+            op = '>' if ascending else '<'
+            if value is None:
+                null_segment = (f"{sort_expr} IS NULL AND {self.key} {op} ?", [key])
+                if not null_first:
+                    return [null_segment]
+            else:
+                value_segment = (f"({sort_expr}, {self.key}) {op} (?, ?)", [value, key])
+                if null_first:
+                    return [value_segment]
+        return [null_segment, value_segment] if null_first else [value_segment, null_segment]
+
+    def fetch(self, conn, sort=None, descending=None, after=None, before=None, limit=PAGE_SIZE):
+        """取一页：after 给出时取其后的一页，before 给出时取其前的一页，都不给时取第一页"""
+        if descending is None:
+            descending = self.default_descending
+        sort_expr = self._sort_expr(sort)
+        backward = before is not None
+
+        # 向前翻页时比较方向和排序方向都反过来，取到后再倒序
+        ascending = descending == backward
+        order = "ASC" if ascending else "DESC"
+
+        rows = []
+        for condition, params in self._segments(sort_expr, ascending, before if backward else after):
+            query = f"SELECT {self.columns}, {sort_expr}, {self.key} FROM {self.source} WHERE "
+            query += " AND ".join(self.conditions + (condition,))
+            query += f" ORDER BY {sort_expr} {order}, {self.key} {order} LIMIT ?"
+            rows += conn.execute(query, list(self.params) + params + [limit + 1 - len(rows)]).fetchall()
+            if len(rows) > limit:
+                break
+
+        more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        return Page([row[:-2] for row in rows], [tuple(row[-2:]) for row in rows], more)
+
+    def fetch_keys(self, conn, keys, sort=None):
+        """按唯一键取指定的几条记录（及其游标），不符合筛选条件或已不存在的不返回；用于局部刷新"""
+        keys = list(keys)
+        if not keys:
+            return Page([], [], False)
+        sort_expr = self._sort_expr(sort)
+        placeholders = ", ".join("?" * len(keys))
+        query = f"SELECT {self.columns}, {sort_expr}, {self.key} FROM {self.source} WHERE "
+        query += " AND ".join(self.conditions + (f"{self.key} IN ({placeholders})",))
+        rows = conn.execute(query, list(self.params) + keys).fetchall()
+        return Page([row[:-2] for row in rows], [tuple(row[-2:]) for row in rows], False)
+
+    def rows(self, conn, sort=None, descending=None):
+        """按排序逐行遍历全部记录（导出等）：只执行一次查询，每次 fetchmany 一批，不会一次 fetchall()"""
+        if descending is None:
+            descending = self.default_descending
+        sort_expr = self._sort_expr(sort)
+        order = "DESC" if descending else "ASC"
+        query = f"SELECT {self.columns} FROM {self.source}"
+        if self.conditions:
+            query += " WHERE " + " AND ".join(self.conditions)
+        query += f" ORDER BY {sort_expr} {order}, {self.key} {order}"
+        cursor = conn.execute(query, self.params)
+        while True:
+            batch = cursor.fetchmany(FETCH_SIZE)
+            if not batch:
+                break
+            yield from batch
+
+    def count(self, conn):
+        query = f"SELECT COUNT(*) FROM {self.source}"
+        if self.conditions:
+            query += " WHERE " + " AND ".join(self.conditions)
+        return conn.execute(query, self.params).fetchone()[0]
+# ==== 结束 ====
@@ -0,0 +1,50 @@
+# ==== 营收日汇总 ====
+# revenue_daily 每天一行：当天收入合计、交易笔数、涉及的订单数。
+# revenue_orders 记录 (订单ID, 日期) 的交易笔数，用来维护“订单数”这种不能直接相加的去重计数。
+# revenue_totals 只有一行，记录有过交易的订单总数（见 migrations._revenue_order_total）。
+# 这些表都由 transactions（及 revenue_orders）上的触发器维护（见 migrations._revenue_rollup），
+# 新增、删除、修改交易的任何代码路径都不需要再手动更新汇总。
+
+# 交易所属的营业日；无法解析的日期归到 '' 这一天，保证汇总总额与流水一致
+DAY_EXPR = "IFNULL(date({row}.transaction_date), '')"
+
+
+def summary(conn):
+    """财务概览：(总收入, 今日收入, 本月收入, 订单数)"""
+    total_income, today_income, month_income = conn.execute("""
+        SELECT SUM(amount),
+               SUM(CASE WHEN day = date('now', 'localtime') THEN amount END),
+               SUM(CASE WHEN day >= date('now', 'localtime', 'start of month')
+                         AND day < date('now', 'localtime', 'start of month', '+1 month') THEN amount END)
+        FROM revenue_daily
+    """).fetchone()
+    order_count = conn.execute("SELECT order_count FROM revenue_totals WHERE id = 1").fetchone()[0]
+    return total_income or 0, today_income or 0, month_income or 0, order_count or 0
+
+
+def daily(conn, days=7):
+    """最近 days 天（含今天）每天的收入 [(日期, 收入), ...]，没有收入的日期不返回"""
+    return conn.execute("""
+        SELECT day, amount FROM revenue_daily
+        WHERE day >= date('now', 'localtime', ?) AND day <= date('now', 'localtime')
+        ORDER BY day
+    """, (f"-{days - 1} days",)).fetchall()
+
+
+def rebuild(conn):
+    """按交易流水重新计算汇总表，用于数据修复"""
+    day = DAY_EXPR.format(row="transactions")
+    conn.execute("DELETE FROM revenue_orders")
+    conn.execute("DELETE FROM revenue_daily")
+    conn.execute(f"""
+        INSERT INTO revenue_daily (day, amount, line_count, order_count)
+        SELECT {day}, SUM(amount), COUNT(*), 0
+        FROM transactions GROUP BY 1
+    """)
+    # revenue_orders 上的触发器会顺带累加 revenue_daily.order_count
+    conn.execute(f"""
+        INSERT INTO revenue_orders (reservation_id, day, line_count)
+        SELECT reservation_id, {day}, COUNT(*)
+        FROM transactions WHERE reservation_id IS NOT NULL GROUP BY 1, 2
+    """)
+# ==== 结束 ====
@@ -0,0 +1,124 @@
+import threading
+
+import db
+
+# ==== 房间缓存 ====
+# rooms 表不大，却被频繁地整表或按房间号读取（查询房间、房间列表、房间类型下拉框、房态）。
+# 这里把整张表读进内存，按房间号存放，之后的读取直接查字典：
+#
+#   1. 每次读取前先看 db.data_version()（PRAGMA data_version，不读任何表）：
+#      没有任何连接提交过写事务时缓存一定是最新的，直接返回；
+#   2. 有提交时查 room_changes（由 rooms 上的触发器维护，见 migrations._room_changes）：
+#      版本号没变说明改的是别的表，缓存照用；变了就只重读版本号更大的那几个房间。
+#
+# 界面里的添加、修改房间，预订、入住、退房、夜审引起的房态变化，以及其他终端、批量导入对 rooms 的修改，
+# 都经触发器记进 room_changes，所以不需要在每个写操作里手动通知缓存。
+# 缓存反映的是已提交的数据；写事务里需要看到本事务改动的检查仍然直接查写连接。
+#
+# changes(since) 给房态看板（room_rack.py）用：返回 since 版本之后变了的房间，看板每次只重画这几个房间。
+
+# 一次变了这么多房间（批量导入、夜审）时直接整表重读
+FULL_RELOAD = 500
+
+_COLUMNS = "room_number, room_type, price, status, clean_status"
+
+
+class RoomCache:
+    """按房间号缓存的房间记录，记录由 make_room(row) 生成（不可变，直接返回给调用方）"""
+
+    def __init__(self, make_room):
+        self.make_room = make_room
+        self._lock = threading.Lock()
+        self._manager = None
+        self._rooms = {}
+        self._versions = {}  # 房间号 -> 最后一次变更的版本号（含已删除的房间）
+        self._version = None  # 已读入的 room_changes 版本号，None 表示还没加载
+        self._data_version = None
+
+    def _refresh(self):
+        manager = db.get_manager()
+        if manager is not self._manager:
+            # db.configure() 换了数据库
+            self._manager = manager
+            self._version = None
+        # 先取修改计数再读数据：两者之间有新的提交时，下次会再检查一遍，不会漏掉
+        data_version = manager.data_version()
+        if self._version is not None and data_version == self._data_version:
+            return
+        with manager.reader() as conn:
+            # 版本号和房间记录在同一个读事务（同一个快照）里读
+            conn.execute("BEGIN")
+            version = conn.execute("SELECT IFNULL(MAX(version), 0) FROM room_changes").fetchone()[0]
+            if self._version is None:
+                self._load(conn)
+            elif version != self._version:
+                changed = dict(conn.execute(
+                    "SELECT room_number, version FROM room_changes WHERE version > ? LIMIT ?",
+                    (self._version, FULL_RELOAD + 1)))
+                if len(changed) > FULL_RELOAD:
+                    self._load(conn)
+                else:
+                    self._reload(conn, list(changed))
+                    self._versions.update(changed)
+        self._version = version
+        self._data_version = data_version
+
+    def _load(self, conn):
+        self._rooms = {row[0]: self.make_room(row)
+                       for row in conn.execute(f"SELECT {_COLUMNS} FROM rooms ORDER BY room_number")}
+        self._versions = dict(conn.execute("SELECT room_number, version FROM room_changes"))
+
+    def _reload(self, conn, room_numbers):
+        placeholders = ", ".join("?" * len(room_numbers))
+        rows = conn.execute(f"SELECT {_COLUMNS} FROM rooms WHERE room_number IN ({placeholders})",
+                            room_numbers).fetchall()
+        found = {row[0]: self.make_room(row) for row in rows}
+        for room_number in room_numbers:
+            if room_number not in found:
+                self._rooms.pop(room_number, None)
+        added = any(room_number not in self._rooms for room_number in found)
+        self._rooms.update(found)
+        # 只改了房态等字段时原位替换，顺序不变；有新房间号时重新排序
+        if added:
+            self._rooms = dict(sorted(self._rooms.items()))
+
+    def get(self, room_number):
+        """房间号对应的记录，没有这个房间时返回 None"""
+        with self._lock:
+            self._refresh()
+            return self._rooms.get(room_number)
+
+    def all(self):
+        """全部房间，按房间号排列"""
+        with self._lock:
+            self._refresh()
+            return list(self._rooms.values())
+
+    def room_types(self):
+        """所有房间类型，按名称排列"""
+        with self._lock:
+            self._refresh()
+            return sorted({room.room_type for room in self._rooms.values()})
+
+    def changes(self, since=None):
+        """since 版本之后变了的房间：(当前版本, 变了的房间, 已删除的房间号, 是否整表)
+
+        since 为 None、比当前版本还新（换了数据库）或变了太多房间时返回整表，此时已删除的房间号为空，
+        调用方应丢掉原有的房间只保留返回的这些。
+        """
+        with self._lock:
+            self._refresh()
+            if since is not None and since <= self._version:
+                changed = [room_number for room_number, version in self._versions.items() if version > since]
+                if len(changed) <= FULL_RELOAD:
+                    changed.sort()
+                    rooms = [self._rooms[room_number] for room_number in changed if room_number in self._rooms]
+                    removed = [room_number for room_number in changed if room_number not in self._rooms]
+                    return self._version, rooms, removed, False
+            return self._version, list(self._rooms.values()), [], True
+
+    def invalidate(self):
+        """丢弃缓存，下次读取时整表重读"""
+        with self._lock:
+            self._version = None
+# ==== 结束 ====
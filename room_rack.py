@@ -0,0 +1,227 @@
+import tkinter as tk
+
+import events
+from statuses import RoomStatus
+
+# ==== 房态看板 ====
+# 主界面上的房态架：每个房间一个色块，底色表示房态（空闲、已预订、已入住），底边的色条表示清洁状态，
+# 一眼就能看出全店的情况。上千个房间时不能每次刷新都重建控件，所以全部画在一个 Canvas 上：
+#
+#   - 只画可见范围内的房间：滚动时补画进入视野的色块、删掉离开视野的，
+#     Canvas 上的图形数只与窗口大小有关，与房间总数无关；
+#   - 数据来自 service.room_changes(version)：每次只取上次以来增删改过的房间（由房间缓存按
+#     room_changes 表算出，见 room_cache.py），只改这几个色块的颜色和文字；
+#     房间增删或窗口宽度变化使排布变了时，才把可见的色块挪到新位置；
+#   - 给出 bus（events.ChangeBus）时收到 ROOM 通知就去取，客户端模式没有通知，每 POLL_MS 取一次。
+#
+#   rack = RoomRack(frame, service, worker, bus=bus, on_open=lambda room: ...)
+#
+# 双击房间时调用 on_open(room)。取数失败时下一次再取，给出 on_error 时报告一次，恢复后再失败才再报。
+
+TILE_WIDTH = 84
+TILE_HEIGHT = 52
+GAP = 6
+CLEAN_BAR = 6  # 底边清洁状态色条的高度
+POLL_MS = 3000
+
+STATUS_COLORS = {
+    RoomStatus.AVAILABLE: "#2ecc71",
+    RoomStatus.RESERVED: "#f1c40f",
+    RoomStatus.OCCUPIED: "#e74c3c",
+}
+UNKNOWN_COLOR = "#bdc3c7"
+CLEAN_COLORS = {
+    "已清洁": "#ffffff",
+    "未清洁": "#34495e",
+}
+OTHER_CLEAN_COLOR = "#95a5a6"
+
+_STEP_X = TILE_WIDTH + GAP
+_STEP_Y = TILE_HEIGHT + GAP
+
+
+class RoomRack(tk.Canvas):
+    """按房间号排列的房态色块
+
+    service  HotelService 或 client.RemoteService
+    worker   DbWorker，取数在后台线程中进行
+    bus      可选的 events.ChangeBus，给出时按通知刷新，否则定时刷新
+    on_open  双击房间时调用 on_open(room)
+    on_error 可选，取数失败时调用 on_error(exception)
+    """
+
+    def __init__(self, master, service, worker, bus=None, on_open=None, on_error=None, **kw):
+        kw.setdefault("background", "#ffffff")
+        kw.setdefault("highlightthickness", 0)
+        super().__init__(master, **kw)
+        self.service = service
+        self.worker = worker
+        self.on_open = on_open
+        self.on_error = on_error
+        self._failing = False
+        self._rooms = {}  # 房间号 -> Room
+        self._order = []  # 按房间号排列的房间号
+        self._index = {}  # 房间号 -> 在 _order 中的位置
+        self._tiles = {}  # 可见房间的房间号 -> (色块, 清洁色条, 房间号文字, 房型文字)
+        self._columns = 0
+        self._version = None
+        self._job = None
+        self._again = False  # 取数期间又有变化，回来后再取一次
+
+        self.bind("<Configure>", lambda event: self._layout())
+        self.bind("<Double-Button-1>", self._on_double_click)
+        self.bind("<MouseWheel>", lambda event: self.yview("scroll", -1 if event.delta > 0 else 1, "units"))
+        self.bind("<Button-4>", lambda event: self.yview("scroll", -1, "units"))
+        self.bind("<Button-5>", lambda event: self.yview("scroll", 1, "units"))
+        self.configure(yscrollincrement=_STEP_Y)
+
+        if bus is not None:
+            bus.subscribe(events.ROOM, lambda keys: self.refresh(), owner=self)
+        else:
+            self.after(POLL_MS, self._poll)
+        self.refresh()
+
+    def yview(self, *args):
+        result = super().yview(*args)
+        if args:
+            self._cull()
+        return result
+
+    # ---- 取数 ----
+
+    def refresh(self):
+        """取上次以来变了的房间并重画这些色块；正在取时等这次回来后再取一次"""
+        if self._job is not None:
+            self._again = True
+            return
+        self._job = self.worker.submit(self.service.room_changes, self._version,
+                                       on_done=self._apply, on_error=self._failed, owner=self)
+
+    def _poll(self):
+        if not self.winfo_exists():
+            return
+        self.refresh()
+        self.after(POLL_MS, self._poll)
+
+    def _failed(self, error):
+        # 数据库或服务器暂时不可用：下一次再取，恢复之前不重复报告
+        self._job = None
+        if not self._failing:
+            self._failing = True
+            if self.on_error:
+                self.on_error(error)
+
+    def _apply(self, changes):
+        self._job = None
+        self._failing = False
+        moved = False
+        if changes.full:
+            rooms = {room.room_number: room for room in changes.rooms}
+            moved = list(rooms) != self._order
+            for room_number in [n for n in self._rooms if n not in rooms]:
+                self._forget(room_number)
+            changed = [room for room in changes.rooms if self._rooms.get(room.room_number) != room]
+        else:
+            for room_number in changes.removed:
+                if room_number in self._rooms:
+                    self._forget(room_number)
+                    moved = True
+            changed = [room for room in changes.rooms if self._rooms.get(room.room_number) != room]
+            moved = moved or any(room.room_number not in self._rooms for room in changed)
+
+        for room in changed:
+            self._rooms[room.room_number] = room
+            if room.room_number in self._tiles:
+                self._paint(room)
+        self._version = changes.version
+        if moved:
+            self._order = sorted(self._rooms)
+            self._index = {room_number: index for index, room_number in enumerate(self._order)}
+            self._layout(force=True)
+
+        if self._again:
+            self._again = False
+            self.refresh()
+
+    def _forget(self, room_number):
+        del self._rooms[room_number]
+        for item in self._tiles.pop(room_number, ()):
+            self.delete(item)
+
+    # ---- 排布和绘制 ----
+
+    def _layout(self, force=False):
+        """按窗口宽度排布：列数变了（或房间有增删）时把可见色块挪到新位置，再补画、删除"""
+        columns = max(1, (self.winfo_width() - GAP) // _STEP_X)
+        if columns != self._columns or force:
+            self._columns = columns
+            rows = -(-len(self._order) // columns)
+            self.configure(scrollregion=(0, 0, GAP + columns * _STEP_X, GAP + rows * _STEP_Y))
+            for room_number in self._tiles:
+                self._place(room_number)
+        self._cull()
+
+    def _visible(self):
+        """可见范围内的房间在 _order 中的下标范围"""
+        top = self.canvasy(0)
+        first_row = max(0, int((top - GAP) // _STEP_Y))
+        last_row = int((top + self.winfo_height()) // _STEP_Y)
+        return range(min(first_row * self._columns, len(self._order)),
+                     min((last_row + 1) * self._columns, len(self._order)))
+
+    def _cull(self):
+        if not self._columns:
+            return
+        visible = self._visible()
+        shown = {self._order[index] for index in visible}
+        for room_number in [n for n in self._tiles if n not in shown]:
+            for item in self._tiles.pop(room_number):
+                self.delete(item)
+        for index in visible:
+            room_number = self._order[index]
+            if room_number not in self._tiles:
+                self._draw(self._rooms[room_number])
+
+    def _origin(self, room_number):
+        row, column = divmod(self._index[room_number], self._columns)
+        return GAP + column * _STEP_X, GAP + row * _STEP_Y
+
+    def _draw(self, room):
+        self._tiles[room.room_number] = (
+            self.create_rectangle(0, 0, 0, 0, outline="#7f8c8d"),
+            self.create_rectangle(0, 0, 0, 0, outline=""),
+            self.create_text(0, 0, font=("Arial", 12, "bold")),
+            self.create_text(0, 0, font=("Arial", 9)),
+        )
+        self._place(room.room_number)
+        self._paint(room)
+
+    def _place(self, room_number):
+        tile, bar, number, room_type = self._tiles[room_number]
+        x, y = self._origin(room_number)
+        self.coords(tile, x, y, x + TILE_WIDTH, y + TILE_HEIGHT)
+        self.coords(bar, x + 1, y + TILE_HEIGHT - CLEAN_BAR, x + TILE_WIDTH, y + TILE_HEIGHT)
+        self.coords(number, x + TILE_WIDTH / 2, y + 16)
+        self.coords(room_type, x + TILE_WIDTH / 2, y + 34)
+
+    def _paint(self, room):
+        tile, bar, number, room_type = self._tiles[room.room_number]
+        self.itemconfigure(tile, fill=STATUS_COLORS.get(room.status, UNKNOWN_COLOR))
+        self.itemconfigure(bar, fill=CLEAN_COLORS.get(room.clean_status, OTHER_CLEAN_COLOR))
+        self.itemconfigure(number, text=str(room.room_number))
+        self.itemconfigure(room_type, text=room.room_type)
+
+    def room_at(self, x, y):
+        """窗口坐标 (x, y) 处的房间，不在色块上时返回 None"""
+        x, y = self.canvasx(x) - GAP, self.canvasy(y) - GAP
+        column, row = int(x // _STEP_X), int(y // _STEP_Y)
+        if x < 0 or y < 0 or column >= self._columns or x % _STEP_X > TILE_WIDTH or y % _STEP_Y > TILE_HEIGHT:
+            return None
+        index = row * self._columns + column
+        return self._rooms[self._order[index]] if index < len(self._order) else None
+
+    def _on_double_click(self, event):
+        room = self.room_at(event.x, event.y)
+        if room is not None and self.on_open:
+            self.on_open(room)
+# ==== 结束 ====
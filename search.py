@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+
+# ==== 全文检索 ====
+# 交易描述、客户姓名/联系方式/身份证号建有 FTS5 全文索引（trigram 分词，中文按任意连续三个字符建索引），
+# 由触发器与 transactions、customers 表保持同步（见 migrations._full_text_search）。
+# 关键词按子串匹配，效果与原来的 LIKE '%关键词%' 相同，但不再全表扫描。
+#
+# trigram 索引只能查找至少三个字符的子串；更短的关键词（例如两个字的姓名）仍然退回 LIKE 扫描。
+#
+# 输入提示（边输入边列出客户）只按前缀匹配，用姓名、联系方式、身份证号上的普通索引做区间查找：
+#   name >= 前缀 AND name < 前缀最后一个字符加一
+# 每敲一个键只读索引上的几行，与客户总数无关；新增、修改客户后索引由 SQLite 自动维护。
+
+MIN_LENGTH = 3
+
+
+def _phrase(keyword):
+    """把关键词转成 FTS5 短语（双引号内的双引号写两次），不会被当成查询语法"""
+    return '"' + keyword.replace('"', '""') + '"'
+
+
+def _like(keyword):
+    return f"%{keyword}%"
+
+
+def transaction_condition(keyword):
+    """筛选交易 t 的条件：描述或客户姓名包含 keyword，返回 (条件, 参数)
+
+    条件中用到 c.name，查询需要 LEFT JOIN reservations r 和 customers c。
+    """
+    if len(keyword) < MIN_LENGTH:
+        return "(t.description LIKE ? OR c.name LIKE ?)", [_like(keyword), _like(keyword)]
+    condition = """t.transaction_id IN (
+        SELECT rowid FROM transactions_fts WHERE transactions_fts MATCH ?
+        UNION
+        SELECT kt.transaction_id
+        FROM customers_fts
+        JOIN reservations kr ON kr.customer_id = customers_fts.rowid
+        JOIN transactions kt ON kt.reservation_id = kr.reservation_id
+        WHERE customers_fts MATCH ?
+    )"""
+    return condition, [_phrase(keyword), "name : " + _phrase(keyword)]
+
+
+def customer_condition(keyword, alias="customers"):
+    """筛选客户的条件：姓名、联系方式或身份证号包含 keyword，返回 (条件, 参数)"""
+    if len(keyword) < MIN_LENGTH:
+        condition = f"({alias}.name LIKE ? OR {alias}.contact LIKE ? OR {alias}.id_card LIKE ?)"
+        return condition, [_like(keyword)] * 3
+    condition = (f"{alias}.customer_id IN "
+                 f"(SELECT rowid FROM customers_fts WHERE customers_fts MATCH ?)")
+    return condition, [_phrase(keyword)]
+
+
+def prefix_range(prefix):
+    """以 prefix 开头的字符串所在的区间 [low, high)（按 SQLite 默认的 BINARY 排序）"""
+    return prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def suggest_customers(conn, prefix, limit=10):
+    """姓名、联系方式或身份证号以 prefix 开头的客户 (customer_id, name, contact, id_card, points)
+
+    prefix 为纯数字时，客户ID等于它的客户排在最前；其余按姓名、联系方式、身份证号的顺序，各自按该列排序。
+    """
+    low, high = prefix_range(prefix)
+    rows = []
+    if prefix.isdigit() and len(prefix) < 10:
+        rows += conn.execute("SELECT customer_id, name, contact, id_card, points FROM customers "
+                             "WHERE customer_id = ?", (int(prefix),)).fetchall()
+    for column in ("name", "contact", "id_card"):
+        if len(rows) >= limit:
+            break
+        rows += conn.execute(f"SELECT customer_id, name, contact, id_card, points FROM customers "
+                             f"WHERE {column} >= ? AND {column} < ? ORDER BY {column} LIMIT ?",
+                             (low, high, limit)).fetchall()
+
+    seen = set()
+    unique = []
+    for row in rows:
+        if row[0] not in seen:
+            seen.add(row[0])
+            unique.append(row)
+    return unique[:limit]
+
+
+@contextmanager
+def bulk_customers(conn):
+    """批量插入客户时暂停逐行同步全文索引，结束时用一条语句补上新客户的索引
+
+    逐行触发器在大批量导入时占了大部分时间；整批一次写入全文索引快好几倍。
+    暂停靠 search_sync 表里的开关（触发器的 WHEN 条件，见 migrations._search_sync_switch），不改表结构，
+    其他连接已编译的语句不会失效。必须在写事务中使用（BEGIN IMMEDIATE 之后）：开关在事务提交前已复位，
+    出错回滚时也随事务一起撤销，其他连接看不到暂停的状态。
+    """
+    last_id = conn.execute("SELECT IFNULL(MAX(customer_id), 0) FROM customers").fetchone()[0]
+    conn.execute("UPDATE search_sync SET paused = 1 WHERE id = 1")
+    try:
+        yield
+        conn.execute("INSERT INTO customers_fts (rowid, name, contact, id_card) "
+                     "SELECT customer_id, name, contact, id_card FROM customers WHERE customer_id > ?",
+                     (last_id,))
+    finally:
+        conn.execute("UPDATE search_sync SET paused = 0 WHERE id = 1")
+
+
+def rebuild(cursor):
+    """按 transactions、customers 表的现有数据重建全文索引"""
+    cursor.execute("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+    cursor.execute("INSERT INTO customers_fts(customers_fts) VALUES ('rebuild')")
+# ==== 结束 ====
@@ -0,0 +1,256 @@
+import argparse
+import asyncio
+import json
+import secrets
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import api
+import db
+import migrations
+import service
+
+# ==== 服务器模式 ====
+# 多台前台终端通过网络盘共用一个 hotel.db 既慢又容易损坏数据库。服务器模式下由一个进程独占数据库，
+# 各终端以客户端模式连接它（python zhuti1.0.py --server http://主机:8765，见 client.py）：
+#
+#   python server.py                          在 127.0.0.1:8765 上提供服务
+#   python server.py --db /data/hotel.db --port 9000
+#
+# 接口和编码见 api.py。只用标准库：asyncio 负责网络收发（HTTP/1.1，支持 keep-alive），
+# 数据库操作放到线程里执行，不阻塞事件循环：
+#   - 读操作交给读线程池，线程数与 db 的读连接数相同，可以同时执行；
+#   - 写操作（带 @_retry_busy 标记的方法）全部交给唯一的写线程，按到达顺序逐个执行。
+#
+# 终端先调用 authenticate 登录，之后每个请求都带上会话号（见 api.py）；用户管理和夜审只有管理员的会话能调用。
+# 会话只存在服务器内存里：服务器重启、空闲超过 SESSION_IDLE 秒，或用户被修改、删除后需要重新登录。
+# 默认只监听本机；会话号和密码都是明文传输，--host 改成对外地址前请确认网络是可信的内网。
+
+MAX_BODY = 1 << 20
+READ_TIMEOUT = 300  # 空闲连接保持的秒数
+SESSION_IDLE = 8 * 3600  # 会话空闲多少秒后失效
+
+_REASONS = {200: "OK", 400: "Bad Request", 403: "Forbidden", 404: "Not Found", 405: "Method Not Allowed",
+            409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class BadRequest(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class HotelServer:
+    def __init__(self, readers=4):
+        self.service = service.HotelService()
+        self.reads = ThreadPoolExecutor(readers, thread_name_prefix="hotel-read")
+        self.writes = ThreadPoolExecutor(1, thread_name_prefix="hotel-write")
+        self.sessions = {}  # 会话号 -> [User, 最近一次使用的时刻]；只在事件循环里读写，不用加锁
+
+    def close(self):
+        self.reads.shutdown()
+        self.writes.shutdown()
+
+    # ---- 会话 ----
+
+    def _open_session(self, user):
+        token = secrets.token_urlsafe(32)
+        self.sessions[token] = [user, time.monotonic()]
+        return token
+
+    def _session_user(self, headers):
+        """请求头里的会话对应的 User，没有或已失效时抛出 PermissionDenied"""
+        session = self.sessions.get(headers.get(api.SESSION_HEADER.lower(), ""))
+        now = time.monotonic()
+        if session is None or now - session[1] > SESSION_IDLE:
+            raise service.PermissionDenied("未登录或登录已过期，请重新登录")
+        session[1] = now
+        return session[0]
+
+    def _close_sessions(self, user_id):
+        """用户被修改或删除后，他已登录的会话全部失效"""
+        for token in [token for token, (user, _) in self.sessions.items() if user.user_id == user_id]:
+            del self.sessions[token]
+
+    # ---- 调用 ----
+
+    def _resolve(self, path):
+        """/api/<方法名>[/fetch|/count] -> (方法名, 操作)"""
+        parts = path.strip("/").split("/")
+        if len(parts) not in (2, 3) or parts[0] != "api" or parts[1] not in api.METHODS:
+            raise BadRequest(404, f"没有这个接口: {path}")
+        action = parts[2] if len(parts) == 3 else None
+        if action not in (None, "fetch", "count"):
+            raise BadRequest(404, f"没有这个接口: {path}")
+        return parts[1], action
+
+    def _call(self, name, action, args, kwargs, paging_options):
+        result = getattr(self.service, name)(*args, **kwargs)
+        if action is None:
+            return result
+        if not isinstance(result, service.PagedList):
+            raise BadRequest(404, f"{name} 不是分页列表")
+        if action == "count":
+            return result.count()
+        return result.fetch(**paging_options)
+
+    async def dispatch(self, method, target, body, headers=None):
+        """处理一个请求，返回 (HTTP 状态码, 响应内容)；headers 为小写的请求头名 -> 值"""
+        url = urlsplit(target)
+        if url.path == "/health":
+            return 200, {"ok": True, "version": migrations.MIGRATIONS[-1][0]}
+
+        name, action = self._resolve(url.path)
+        writes = getattr(getattr(service.HotelService, name), "writes", False)
+        if method == "GET":
+            if writes:
+                raise BadRequest(405, f"{name} 会修改数据，请用 POST")
+            request = {"kwargs": dict(parse_qsl(url.query))}
+        elif method == "POST":
+            try:
+                request = json.loads(body or b"{}")
+            except ValueError:
+                raise BadRequest(400, "请求内容不是合法的 JSON")
+            if not isinstance(request, dict):
+                raise BadRequest(400, "请求内容必须是 JSON 对象")
+        else:
+            raise BadRequest(405, f"不支持 {method} 请求")
+
+        args = request.get("args") or []
+        kwargs = request.get("kwargs") or {}
+        if not (isinstance(args, list) and isinstance(kwargs, dict)):
+            raise BadRequest(400, "args 必须是数组，kwargs 必须是对象")
+        paging_options = {key: request[key] for key in ("sort", "descending", "after", "before", "limit")
+                          if key in request}
+
+        if name != "authenticate":
+            try:
+                user = self._session_user(headers or {})
+                if name in api.ADMIN_METHODS and user.role != "admin":
+                    raise service.PermissionDenied("权限不足，只有管理员可以执行此操作")
+            except service.PermissionDenied as e:
+                return api.error_body(e)
+            if name in api.SESSION_ARGUMENTS:
+                keyword, position, field = api.SESSION_ARGUMENTS[name]
+                args = args[:position]
+                kwargs = dict(kwargs, **{keyword: getattr(user, field)})
+
+        executor = self.writes if writes else self.reads
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(executor, self._call, name, action, args, kwargs, paging_options)
+        except service.ServiceError as e:
+            return api.error_body(e)
+        except TypeError as e:
+            # 参数个数、名称不对
+            raise BadRequest(400, f"{name} 参数不正确: {e}")
+        if name == "authenticate":
+            return 200, {"result": result, "session": self._open_session(result)}
+        if name in ("update_user", "delete_user"):
+            self._close_sessions(_int_or_none((args or [kwargs.get("user_id")])[0]))
+        return 200, {"result": result}
+
+    # ---- HTTP ----
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), READ_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": {"type": "BadRequest", "message": "请求行无效"}},
+                                        False)
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode("latin-1").partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                keep_alive = (headers.get("connection", "").lower() != "close"
+                              and version.upper() == "HTTP/1.1")
+
+                length = int(headers.get("content-length") or 0)
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": {"type": "BadRequest", "message": "请求内容太大"}},
+                                        False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                try:
+                    status, content = await self.dispatch(method.upper(), target, body, headers)
+                except BadRequest as e:
+                    status, content = e.status, {"error": {"type": "BadRequest", "message": str(e)}}
+                except Exception as e:
+                    print(f"处理 {method} {target} 出错: {e!r}", file=sys.stderr)
+                    status, content = api.error_body(e)
+                await self._respond(writer, status, content, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, content, keep_alive):
+        body = api.encode(content)
+        head = (f"HTTP/1.1 {status} {_REASONS.get(status, 'Error')}\r\n"
+                f"Content-Type: application/json; charset=utf-8\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+async def serve(host="127.0.0.1", port=api.DEFAULT_PORT, readers=4, ready=None):
+    """运行服务器直到被取消；ready(port) 在开始监听后调用（port 为 0 时可以得到实际端口）"""
+    hotel = HotelServer(readers)
+    server = await asyncio.start_server(hotel.handle, host, port)
+    try:
+        if ready:
+            ready(server.sockets[0].getsockname()[1])
+        async with server:
+            await server.serve_forever()
+    finally:
+        hotel.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="酒店管理系统服务器：独占数据库，为各终端提供 JSON 接口")
+    parser.add_argument("--db", default=db.DB_PATH, help="数据库文件")
+    parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认只允许本机连接）")
+    parser.add_argument("--port", type=int, default=api.DEFAULT_PORT, help="监听端口")
+    parser.add_argument("--readers", type=int, default=4, help="同时执行读操作的线程数")
+    args = parser.parse_args(argv)
+
+    db.configure(args.db, args.readers)
+    migrations.migrate()
+    try:
+        asyncio.run(serve(args.host, args.port, args.readers,
+                          ready=lambda port: print(f"服务器已启动: http://{args.host}:{port}（数据库 {args.db}）",
+                                                   flush=True)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+# ==== 结束 ====
@@ -0,0 +1,865 @@
+import functools
+import hashlib
+import re
+import sqlite3
+from collections import namedtuple
+
+import availability
+import billing
+import dates
+import db
+import inventory
+import paging
+import revenue
+import room_cache
+import search
+import statuses
+from statuses import ReservationStatus, RoomStatus
+
+# ==== 业务服务层 ====
+# 房间、客户、预订、入住/退房、交易、用户的全部业务规则都在这里，不依赖 Tk。
+# 界面（zhuti1.0.py、lo.py）只负责收集输入和展示结果：调用 HotelService 的方法，
+# 捕获 ServiceError 后把 str(e) 显示给用户。脚本、批量导入和性能测试可以直接使用本模块。
+#
+# 每个方法自己取读/写连接（db.reader / db.writer），可以在多个线程中同时调用；
+# 写操作由 db 的写连接串行化。需要把多次写操作合并成一个事务时，用 HotelService.batch()。
+# 写操作都是以 BEGIN IMMEDIATE 开始的短事务，先检查后写入，多台终端同时预订同一房间也不会重复；
+# 其他终端占着写锁时整体重试（@_retry_busy），仍不成功时抛出 Busy。
+#
+# 列表窗口用 *_list() 返回的 PagedList 按页取数（见 paging.py），不会一次把整张表读进内存。
+# 按房间号查房间、全部房间、房间类型读进程内的房间缓存（room_cache.py），其他终端的修改也能及时看到。
+
+
+class ServiceError(Exception):
+    """业务错误的基类，消息可直接展示给用户"""
+
+
+class ValidationError(ServiceError):
+    """输入不合法"""
+
+
+class NotFound(ServiceError):
+    """要操作的记录不存在"""
+
+
+class Conflict(ServiceError):
+    """与现有数据冲突（房间已被预订、记录已存在、状态不允许等）"""
+
+
+class PermissionDenied(ServiceError):
+    """登录失败或权限不足"""
+
+
+class Busy(ServiceError):
+    """其他终端一直占着写锁，重试几次后仍无法保存"""
+
+
+# ---- 结果类型（都是 namedtuple，可以像原来的查询结果一样按下标访问） ----
+
+class Room(namedtuple("Room", "room_number room_type price status clean_status")):
+    __slots__ = ()
+
+    @property
+    def status_label(self):
+        return statuses.room_label(self.status)
+
+
+# 房态看板的增量数据：version 之前的变化都已包含在内，full 为真时 rooms 是全部房间
+RoomChanges = namedtuple("RoomChanges", "version rooms removed full")
+
+Customer = namedtuple("Customer", "customer_id name contact id_card points")
+
+
+class Reservation(namedtuple("Reservation",
+                             "reservation_id room_number customer_id customer_name "
+                             "check_in_date check_out_date status")):
+    __slots__ = ()
+
+    @property
+    def status_label(self):
+        return statuses.reservation_label(self.status)
+
+
+Transaction = namedtuple("Transaction",
+                         "transaction_id reservation_id room_number customer_name amount "
+                         "transaction_date description")
+
+TransactionDetail = namedtuple("TransactionDetail",
+                               "transaction_id reservation_id room_number customer_name contact id_card "
+                               "amount transaction_date description check_in_date check_out_date")
+
+FinanceSummary = namedtuple("FinanceSummary",
+                            "total_income today_income month_income order_count avg_income_per_order daily")
+
+User = namedtuple("User", "user_id username role create_time")
+
+USER_ROLES = ("frontdesk", "admin")
+
+_ID_CARD_PATTERN = re.compile(
+    r'^[1-9]\d{5}(18|19|([23]\d))\d{2}((0[1-9])|(10|11|12))(([0-2][1-9])|10|20|30|31)\d{3}[0-9Xx]$')
+
+_RESERVATION_COLUMNS = """
+    r.reservation_id, r.room_number, r.customer_id, c.name,
+    r.check_in_date, r.check_out_date, r.status
+"""
+
+_TRANSACTION_COLUMNS = """
+    t.transaction_id, t.reservation_id, r.room_number, c.name, t.amount,
+    t.transaction_date, t.description
+"""
+
+
+class PagedList:
+    """分页列表：fetch() 取一页（记录已转换为结果类型），count() 取总数，all() 按排序遍历全部记录
+
+    排序名就是列表窗口的列名，见 sorts。
+    """
+
+    def __init__(self, listing, make_row):
+        self.listing = listing
+        self.make_row = make_row
+
+    @property
+    def sorts(self):
+        return tuple(self.listing.sorts)
+
+    @property
+    def default_sort(self):
+        return self.listing.default_sort
+
+    @property
+    def default_descending(self):
+        return self.listing.default_descending
+
+    def fetch(self, sort=None, descending=None, after=None, before=None, limit=paging.PAGE_SIZE):
+        with db.reader() as conn:
+            page = self.listing.fetch(conn, sort, descending, after, before, limit)
+        return page._replace(rows=[self.make_row(row) for row in page.rows])
+
+    def fetch_keys(self, keys, sort=None):
+        """按唯一键（列表窗口的第一列）取指定的几条记录，见 paging.Listing.fetch_keys"""
+        with db.reader() as conn:
+            page = self.listing.fetch_keys(conn, keys, sort)
+        return page._replace(rows=[self.make_row(row) for row in page.rows])
+
+    def count(self):
+        with db.reader() as conn:
+            return self.listing.count(conn)
+
+    def all(self, sort=None, descending=None):
+        # 遍历期间一直占用一个读连接
+        with db.reader() as conn:
+            for row in self.listing.rows(conn, sort, descending):
+                yield self.make_row(row)
+
+
+def _retry_busy(method):
+    """写操作拿不到写锁时整体重试（见 db.retry_busy），重试用完后抛出 Busy"""
+    retrying = db.retry_busy(method)
+
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        try:
+            return retrying(*args, **kwargs)
+        except sqlite3.OperationalError as e:
+            if db.is_busy(e):
+                raise Busy("其他终端正在保存数据，请稍后重试") from e
+            raise
+    # 服务器模式据此把写操作交给唯一的写线程（见 server.py）
+    wrapper.writes = True
+    return wrapper
+
+
+def hash_password(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def check_id(sid):
+    """身份证号格式校验（18位，含出生日期和校验位的格式）"""
+    return bool(_ID_CARD_PATTERN.match(sid or ""))
+
+
+def validate_room(room_number, room_type, price, clean_status):
+    """校验新房间的各项，返回规范化后的 (room_number, room_type, price, clean_status)"""
+    if not (str(room_number).strip() and room_type and str(price).strip() and clean_status):
+        raise ValidationError("房间号、房间类型、价钱、清洁状态均为必填项")
+    return _int(room_number, "房间号必须为整数"), room_type, _price(price), clean_status
+
+
+def validate_customer(name, contact, id_card):
+    """校验新客户的各项，返回 (name, contact, id_card)"""
+    if not (name and contact and id_card):
+        raise ValidationError("姓名、联系方式、身份证号均为必填项")
+    if not check_id(id_card):
+        raise ValidationError("请正确输入身份证号！")
+    return name, contact, id_card
+
+
+def _int(value, message):
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        raise ValidationError(message)
+
+
+def _price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValidationError("价钱必须为有效数字（如：300.0）")
+
+
+def _stay_dates(check_in_date, check_out_date):
+    """校验并规范化入住/退房日期"""
+    if not (check_in_date and check_out_date):
+        raise ValidationError("日期不能为空")
+    check_in_date = dates.canonical_date(check_in_date)
+    check_out_date = dates.canonical_date(check_out_date)
+    if not (check_in_date and check_out_date):
+        raise ValidationError("日期格式不正确，请使用YYYY-MM-DD格式")
+    if check_out_date <= check_in_date:
+        raise ValidationError("退房日期必须晚于入住日期")
+    return check_in_date, check_out_date
+
+
+def _room(row):
+    return Room(row[0], row[1], row[2], _room_status(row[3]), row[4])
+
+
+def _room_status(code):
+    try:
+        return RoomStatus(code)
+    except ValueError:
+        return code
+
+
+def _transaction_filters(start_date, end_date, keyword):
+    """交易查询的日期范围（含首尾两天）和关键词条件：(conditions, params)"""
+    conditions = []
+    params = []
+
+    # 交易时间带时分秒，截止日期按“小于下一天”比较，当天的交易不会被漏掉
+    if start_date:
+        start = dates.canonical_date(start_date)
+        if not start:
+            raise ValidationError("日期格式不正确，请使用YYYY-MM-DD格式")
+        conditions.append("t.transaction_date >= ?")
+        params.append(start)
+    if end_date:
+        end = dates.canonical_date(end_date)
+        if not end:
+            raise ValidationError("日期格式不正确，请使用YYYY-MM-DD格式")
+        conditions.append("t.transaction_date < ?")
+        params.append(dates.next_day(end))
+    keyword = (keyword or "").strip()
+    if keyword:
+        # 描述或客户姓名包含关键词，走全文索引（见 search.py）
+        condition, keyword_params = search.transaction_condition(keyword)
+        conditions.append(condition)
+        params.extend(keyword_params)
+    return conditions, params
+
+
+def _reservation(row):
+    try:
+        status = ReservationStatus(row[6])
+    except ValueError:
+        status = row[6]
+    return Reservation(*row[:6], status)
+
+
+def _sync_room_status(conn, room_number):
+    """按房间现有的预订重新计算房态：有已入住的预订为已入住，否则有“已预订”的为已预订，否则空闲
+
+    一个房间可以同时有多个不重叠的未来预订，取消或挪走其中一个时不能直接把房间改成空闲；
+    在住的预订被改成已完成、已取消或挪到别的房间时，房间也要从已入住里放出来。
+    """
+    conn.execute(f"""
+        UPDATE rooms
+        SET status = CASE
+            WHEN EXISTS (SELECT 1 FROM reservations r WHERE r.room_number = rooms.room_number
+                                                        AND r.status = {int(ReservationStatus.CHECKED_IN)})
+                THEN {int(RoomStatus.OCCUPIED)}
+            WHEN EXISTS (SELECT 1 FROM reservations r WHERE r.room_number = rooms.room_number
+                                                        AND r.status = {int(ReservationStatus.RESERVED)})
+                THEN {int(RoomStatus.RESERVED)}
+            ELSE {int(RoomStatus.AVAILABLE)} END
+        WHERE room_number = ?
+    """, (room_number,))
+
+
+# 房间表的进程内缓存（见 room_cache.py），所有 HotelService 实例共用
+_rooms = room_cache.RoomCache(_room)
+
+
+class HotelService:
+    # ---- 事务 ----
+
+    def batch(self):
+        """把多次写操作放进同一个事务：with service.batch(): ...，任一步失败全部回滚"""
+        return db.writer()
+
+    # ---- 房间 ----
+
+    @_retry_busy
+    def add_room(self, room_number, room_type, price, clean_status):
+        room_number, room_type, price, clean_status = validate_room(room_number, room_type, price, clean_status)
+
+        with db.writer() as conn:
+            if conn.execute("SELECT 1 FROM rooms WHERE room_number = ?", (room_number,)).fetchone():
+                raise Conflict("该房间号已存在")
+            conn.execute("INSERT INTO rooms (room_number, room_type, price, status, clean_status) "
+                         "VALUES (?, ?, ?, ?, ?)",
+                         (room_number, room_type, price, RoomStatus.AVAILABLE, clean_status))
+        return Room(room_number, room_type, price, RoomStatus.AVAILABLE, clean_status)
+
+    @_retry_busy
+    def update_room(self, room_number, room_type, price, clean_status):
+        room_number = _int(room_number, "请输入有效的房间号（整数）")
+        if not (room_type and str(price).strip() and clean_status):
+            raise ValidationError("房间类型、价钱和清洁状态均为必填项")
+        price = _price(price)
+
+        with db.writer() as conn:
+            cursor = conn.execute("UPDATE rooms SET room_type = ?, price = ?, clean_status = ? WHERE room_number = ?",
+                                  (room_type, price, clean_status, room_number))
+            if cursor.rowcount == 0:
+                raise NotFound("未找到该房间号对应的房间，修改失败")
+            return self._get_room(conn, room_number)
+
+    def get_room(self, room_number):
+        room_number = _int(room_number, "请输入有效的房间号（整数）")
+        room = _rooms.get(room_number)
+        if room is None:
+            raise NotFound("未找到该房间号对应的房间")
+        return room
+
+    def _get_room(self, conn, room_number):
+        row = conn.execute("SELECT room_number, room_type, price, status, clean_status FROM rooms "
+                           "WHERE room_number = ?", (room_number,)).fetchone()
+        if not row:
+            raise NotFound("未找到该房间号对应的房间")
+        return _room(row)
+
+    def list_rooms(self):
+        return _rooms.all()
+
+    def room_changes(self, since=None):
+        """房态看板用：since 版本之后增删改过的房间（RoomChanges），since 为 None 时返回全部房间"""
+        if since is not None:
+            since = _int(since, "版本号必须为整数")
+        return RoomChanges(*_rooms.changes(since))
+
+    def room_list(self):
+        """房间列表窗口的分页数据，默认按房间号排序"""
+        listing = paging.Listing(
+            "room_number, room_type, price, status, clean_status", "rooms", "room_number",
+            {"房间号": "room_number", "房间类型": "room_type", "价钱": "price", "状态": "status",
+             "清洁状态": "clean_status"},
+            "房间号")
+        return PagedList(listing, _room)
+
+    def find_free_rooms(self, check_in_date, check_out_date, room_type=None):
+        """[check_in_date, check_out_date) 内全部空闲的房间"""
+        check_in_date, check_out_date = _stay_dates(check_in_date, check_out_date)
+        with db.reader() as conn:
+            rows = inventory.find_free_rooms(conn, check_in_date, check_out_date, room_type or None)
+        return [_room(row) for row in rows]
+
+    def room_types(self):
+        return _rooms.room_types()
+
+    # ---- 客户 ----
+
+    @_retry_busy
+    def add_customer(self, name, contact, id_card):
+        name, contact, id_card = validate_customer(name, contact, id_card)
+
+        with db.writer() as conn:
+            if conn.execute("SELECT 1 FROM customers WHERE id_card = ?", (id_card,)).fetchone():
+                raise Conflict("该身份证号已存在")
+            cursor = conn.execute("INSERT INTO customers (name, contact, id_card) VALUES (?, ?, ?)",
+                                  (name, contact, id_card))
+        return Customer(cursor.lastrowid, name, contact, id_card, 0)
+
+    @_retry_busy
+    def update_customer(self, customer_id, name, contact, id_card):
+        customer_id = _int(customer_id, "请输入有效的客户ID")
+        name, contact, id_card = validate_customer(name, contact, id_card)
+
+        with db.writer() as conn:
+            if conn.execute("SELECT 1 FROM customers WHERE id_card = ? AND customer_id != ?",
+                            (id_card, customer_id)).fetchone():
+                raise Conflict("该身份证号已存在")
+            cursor = conn.execute("UPDATE customers SET name = ?, contact = ?, id_card = ? WHERE customer_id = ?",
+                                  (name, contact, id_card, customer_id))
+            if cursor.rowcount == 0:
+                raise NotFound("未找到该客户ID对应的客户，修改失败")
+            return self._get_customer(conn, customer_id)
+
+    def get_customer(self, customer_id):
+        customer_id = _int(customer_id, "请输入有效的客户ID")
+        with db.reader() as conn:
+            return self._get_customer(conn, customer_id)
+
+    def _get_customer(self, conn, customer_id):
+        row = conn.execute("SELECT customer_id, name, contact, id_card, points FROM customers "
+                           "WHERE customer_id = ?", (customer_id,)).fetchone()
+        if not row:
+            raise NotFound("未找到该客户ID对应的客户")
+        return Customer(*row)
+
+    def list_customers(self):
+        with db.reader() as conn:
+            rows = conn.execute("SELECT customer_id, name, contact, id_card, points FROM customers").fetchall()
+        return [Customer(*row) for row in rows]
+
+    def search_customers(self, keyword, limit=20):
+        """按客户ID、姓名、联系方式或身份证号查找客户
+
+        keyword 为纯数字且恰好是某个客户ID时只返回该客户；否则按姓名、联系方式、身份证号做子串匹配
+        （全文索引，见 search.py），最多返回 limit 个。
+        """
+        keyword = (keyword or "").strip()
+        if not keyword:
+            raise ValidationError("请输入客户ID、姓名、联系方式或身份证号")
+        condition, params = search.customer_condition(keyword)
+        with db.reader() as conn:
+            # 手机号、身份证号不会被当成客户ID
+            if keyword.isdigit() and len(keyword) < 10:
+                try:
+                    return [self._get_customer(conn, int(keyword))]
+                except NotFound:
+                    pass
+            rows = conn.execute(f"SELECT customer_id, name, contact, id_card, points FROM customers "
+                                f"WHERE {condition} ORDER BY customer_id LIMIT ?", params + [limit]).fetchall()
+        return [Customer(*row) for row in rows]
+
+    def suggest_customers(self, prefix, limit=10):
+        """输入提示：客户ID等于 prefix，或姓名、联系方式、身份证号以 prefix 开头的客户"""
+        prefix = (prefix or "").strip()
+        if not prefix:
+            return []
+        with db.reader() as conn:
+            rows = search.suggest_customers(conn, prefix, limit)
+        return [Customer(*row) for row in rows]
+
+    def customer_list(self):
+        """客户列表窗口的分页数据，默认按客户ID排序"""
+        listing = paging.Listing(
+            "customer_id, name, contact, id_card, points", "customers", "customer_id",
+            {"客户ID": "customer_id", "姓名": "name", "联系方式": "contact", "身份证号": "id_card",
+             "积分": "points"},
+            "客户ID")
+        return PagedList(listing, lambda row: Customer(*row))
+
+    # ---- 预订 ----
+
+    @_retry_busy
+    def create_reservation(self, room_number, customer_id, check_in_date, check_out_date):
+        customer_id = _int(customer_id, "客户ID和房间号必须为数字")
+        room_number = _int(room_number, "客户ID和房间号必须为数字")
+        check_in_date, check_out_date = _stay_dates(check_in_date, check_out_date)
+
+        with db.writer() as conn:
+            if not conn.execute("SELECT 1 FROM rooms WHERE room_number = ?", (room_number,)).fetchone():
+                raise NotFound("该房间不存在")
+            if not conn.execute("SELECT 1 FROM customers WHERE customer_id = ?", (customer_id,)).fetchone():
+                raise NotFound("未找到该客户ID对应的客户")
+
+            # 房间能否预订只看所选日期是否空闲（房间当前状态只反映今天的情况）
+            conflict = availability.find_conflict(conn, room_number, check_in_date, check_out_date)
+            if conflict:
+                raise Conflict(f"该房间在 {conflict[1]} 至 {conflict[2]} 已有预订，无法重复预订")
+
+            cursor = conn.execute("""
+                INSERT INTO reservations (room_number, customer_id, check_in_date, check_out_date, status)
+                VALUES (?, ?, ?, ?, ?)
+            """, (room_number, customer_id, check_in_date, check_out_date, ReservationStatus.RESERVED))
+            reservation_id = cursor.lastrowid
+
+            # 占用房晚库存，与预订在同一事务中
+            try:
+                inventory.book_nights(conn, reservation_id, room_number, check_in_date, check_out_date)
+            except inventory.RoomUnavailable as e:
+                raise Conflict(str(e))
+
+            # 更新房间状态为已预订（已入住的房间保持原状态）
+            conn.execute("UPDATE rooms SET status = ? WHERE room_number = ? AND status = ?",
+                         (RoomStatus.RESERVED, room_number, RoomStatus.AVAILABLE))
+            return self._get_reservation(conn, reservation_id)
+
+    @_retry_busy
+    def update_reservation(self, reservation_id, room_number, customer_id, check_in_date, check_out_date, status):
+        reservation_id = _int(reservation_id, "ID和房间号必须为数字")
+        room_number = _int(room_number, "ID和房间号必须为数字")
+        customer_id = _int(customer_id, "ID和房间号必须为数字")
+        check_in_date, check_out_date = _stay_dates(check_in_date, check_out_date)
+        try:
+            status = ReservationStatus(status)
+        except ValueError:
+            raise ValidationError("请选择有效的预订状态")
+
+        with db.writer() as conn:
+            row = conn.execute("SELECT room_number FROM reservations WHERE reservation_id = ?",
+                               (reservation_id,)).fetchone()
+            if not row:
+                raise NotFound("未找到该预订")
+            original_room_number = row[0]
+
+            # 检查修改后的日期是否与该房间的其他预订冲突
+            if status in statuses.ACTIVE_RESERVATION_STATUSES:
+                conflict = availability.find_conflict(conn, room_number, check_in_date, check_out_date,
+                                                      exclude_reservation_id=reservation_id)
+                if conflict:
+                    raise Conflict(f"该房间在 {conflict[1]} 至 {conflict[2]} 已有预订（预订ID: {conflict[0]}）")
+
+            # 日期冲突已由上面的可用性检查保证
+            if original_room_number != room_number:
+                if not conn.execute("SELECT 1 FROM rooms WHERE room_number = ?", (room_number,)).fetchone():
+                    raise NotFound("新房间不存在")
+
+            conn.execute("""
+                UPDATE reservations
+                SET room_number = ?, customer_id = ?, check_in_date = ?, check_out_date = ?, status = ?
+                WHERE reservation_id = ?
+            """, (room_number, customer_id, check_in_date, check_out_date, status, reservation_id))
+            # 原房间和新房间的房态按修改后的预订重新计算
+            _sync_room_status(conn, original_room_number)
+            if original_room_number != room_number:
+                _sync_room_status(conn, room_number)
+
+            # 同步房晚库存
+            try:
+                if status in statuses.ACTIVE_RESERVATION_STATUSES:
+                    inventory.rebook_nights(conn, reservation_id, room_number, check_in_date, check_out_date)
+                else:
+                    inventory.release_nights(conn, reservation_id)
+            except inventory.RoomUnavailable as e:
+                raise Conflict(str(e))
+            return self._get_reservation(conn, reservation_id)
+
+    @_retry_busy
+    def cancel_reservation(self, reservation_id):
+        reservation_id = _int(reservation_id, "请输入有效的预订ID")
+        with db.writer() as conn:
+            row = conn.execute("SELECT room_number FROM reservations WHERE reservation_id = ? AND status = ?",
+                               (reservation_id, ReservationStatus.RESERVED)).fetchone()
+            if not row:
+                raise NotFound("未找到可取消的预订（可能已入住或已完成）")
+            room_number = row[0]
+
+            conn.execute("UPDATE reservations SET status = ? WHERE reservation_id = ?",
+                         (ReservationStatus.CANCELED, reservation_id))
+            inventory.release_nights(conn, reservation_id)
+            _sync_room_status(conn, room_number)
+            return self._get_reservation(conn, reservation_id)
+
+    def get_reservation(self, reservation_id):
+        reservation_id = _int(reservation_id, "请输入有效的预订ID")
+        with db.reader() as conn:
+            return self._get_reservation(conn, reservation_id)
+
+    def _get_reservation(self, conn, reservation_id):
+        row = conn.execute(f"""
+            SELECT {_RESERVATION_COLUMNS}
+            FROM reservations r
+            JOIN customers c ON r.customer_id = c.customer_id
+            WHERE r.reservation_id = ?
+        """, (reservation_id,)).fetchone()
+        if not row:
+            raise NotFound("未找到该预订ID对应的预订")
+        return _reservation(row)
+
+    def list_reservations(self, status=None):
+        """预订列表，status 为 None 时返回全部"""
+        query = f"""
+            SELECT {_RESERVATION_COLUMNS}
+            FROM reservations r
+            JOIN customers c ON r.customer_id = c.customer_id
+        """
+        if status is not None:
+            # 状态编码直接写进 SQL，才能命中按状态建立的部分索引
+            query += f" WHERE r.status = {int(ReservationStatus(status))}"
+        query += " ORDER BY r.check_in_date"
+        with db.reader() as conn:
+            rows = conn.execute(query).fetchall()
+        return [_reservation(row) for row in rows]
+
+    def reservation_list(self, status=None):
+        """预订列表窗口的分页数据，默认按入住日期排序；status 为 None 时包含全部预订"""
+        listing = paging.Listing(
+            _RESERVATION_COLUMNS, "reservations r JOIN customers c ON r.customer_id = c.customer_id",
+            "r.reservation_id",
+            {"预订ID": "r.reservation_id", "房间号": "r.room_number", "客户ID": "r.customer_id",
+             "客户姓名": "c.name", "入住日期": "r.check_in_date", "退房日期": "r.check_out_date",
+             "状态": "r.status"},
+            "入住日期")
+        if status is not None:
+            # 与 list_reservations 一样把状态编码直接写进 SQL
+            listing = listing.filter(f"r.status = {int(ReservationStatus(status))}")
+        return PagedList(listing, _reservation)
+
+    def active_reservations(self):
+        """仍占用房间的预订（已预订、已入住），最近入住的在前"""
+        with db.reader() as conn:
+            rows = conn.execute(f"""
+                SELECT {_RESERVATION_COLUMNS}
+                FROM reservations r
+                JOIN customers c ON r.customer_id = c.customer_id
+                WHERE r.status IN {statuses.sql_in(statuses.ACTIVE_RESERVATION_STATUSES)}
+                ORDER BY r.check_in_date DESC
+            """).fetchall()
+        return [_reservation(row) for row in rows]
+
+    # ---- 入住 / 退房 ----
+
+    def find_check_in_reservation(self, room_number, customer_id):
+        """查找可办理入住的预订（房间号、客户ID匹配且状态为已预订）"""
+        if not (str(room_number).strip() and str(customer_id).strip()):
+            raise ValidationError("房间号和客户ID不能为空")
+        room_number = _int(room_number, "房间号和客户ID必须为数字")
+        customer_id = _int(customer_id, "房间号和客户ID必须为数字")
+        with db.reader() as conn:
+            return self._find_check_in_reservation(conn, room_number, customer_id)
+
+    def _find_check_in_reservation(self, conn, room_number, customer_id):
+        row = conn.execute(f"""
+            SELECT {_RESERVATION_COLUMNS}
+            FROM reservations r
+            JOIN customers c ON r.customer_id = c.customer_id
+            WHERE r.room_number = ? AND r.customer_id = ? AND r.status = {int(ReservationStatus.RESERVED)}
+        """, (room_number, customer_id)).fetchone()
+        if not row:
+            raise NotFound("未找到匹配的预订记录\n请确认房间号和客户ID是否正确")
+        return _reservation(row)
+
+    @_retry_busy
+    def check_in(self, room_number, customer_id):
+        if not (str(room_number).strip() and str(customer_id).strip()):
+            raise ValidationError("房间号和客户ID不能为空")
+        room_number = _int(room_number, "房间号和客户ID必须为数字")
+        customer_id = _int(customer_id, "房间号和客户ID必须为数字")
+
+        with db.writer() as conn:
+            reservation = self._find_check_in_reservation(conn, room_number, customer_id)
+
+            row = conn.execute("SELECT status FROM rooms WHERE room_number = ?", (room_number,)).fetchone()
+            if not row or row[0] != RoomStatus.RESERVED:
+                raise Conflict(f"房间{room_number}状态异常，无法办理入住")
+
+            conn.execute("UPDATE rooms SET status = ? WHERE room_number = ?", (RoomStatus.OCCUPIED, room_number))
+            conn.execute("UPDATE reservations SET status = ? WHERE reservation_id = ?",
+                         (ReservationStatus.CHECKED_IN, reservation.reservation_id))
+        return reservation._replace(status=ReservationStatus.CHECKED_IN)
+
+    @_retry_busy
+    def check_out(self, room_number):
+        """结账退房：补记未记的房费、关闭预订、释放房间，返回 billing.Bill（含全部账目）"""
+        if not str(room_number).strip():
+            raise ValidationError("请填写房间号")
+        room_number = _int(room_number, "请输入有效的房间号（整数）")
+
+        with db.writer() as conn:
+            if not conn.execute("SELECT 1 FROM rooms WHERE room_number = ?", (room_number,)).fetchone():
+                raise NotFound("未找到该房间号对应的房间")
+            try:
+                return billing.check_out(conn, room_number)
+            except billing.NoGuestInRoom as e:
+                raise NotFound(str(e))
+            except billing.Overstay as e:
+                raise Conflict(str(e))
+
+    # ---- 交易 / 财务 ----
+
+    @_retry_busy
+    def add_transaction(self, reservation_id, amount, transaction_date=None, description=""):
+        """新增收费项目，transaction_date 可以只给日期（按当前时刻补齐），返回交易ID"""
+        reservation_id = _int(reservation_id, "请选择关联订单")
+        try:
+            amount = float(amount)
+        except (TypeError, ValueError):
+            raise ValidationError("请输入有效的金额")
+        if amount <= 0:
+            raise ValidationError("金额必须大于零")
+
+        if transaction_date:
+            value = dates.canonical_datetime(transaction_date)
+            if not value:
+                raise ValidationError("日期格式不正确，请使用YYYY-MM-DD格式")
+            # 只给了日期时，用当前时刻补齐
+            if len(str(transaction_date).strip()) <= 10:
+                value = value[:10] + dates.now()[10:]
+            transaction_date = value
+        else:
+            transaction_date = dates.now()
+
+        with db.writer() as conn:
+            cursor = conn.execute("""
+                INSERT INTO transactions (reservation_id, amount, transaction_date, description)
+                VALUES (?, ?, ?, ?)
+            """, (reservation_id, amount, transaction_date, description))
+        return cursor.lastrowid
+
+    @_retry_busy
+    def delete_transaction(self, transaction_id):
+        transaction_id = _int(transaction_id, "交易ID无效")
+        with db.writer() as conn:
+            cursor = conn.execute("DELETE FROM transactions WHERE transaction_id = ?", (transaction_id,))
+            if cursor.rowcount == 0:
+                raise NotFound("找不到交易记录")
+
+    def get_transaction(self, transaction_id):
+        transaction_id = _int(transaction_id, "交易ID无效")
+        with db.reader() as conn:
+            row = conn.execute("""
+                SELECT t.transaction_id, t.reservation_id, r.room_number, c.name, c.contact, c.id_card,
+                       t.amount, t.transaction_date, t.description, r.check_in_date, r.check_out_date
+                FROM transactions t
+                LEFT JOIN reservations r ON t.reservation_id = r.reservation_id
+                LEFT JOIN customers c ON r.customer_id = c.customer_id
+                WHERE t.transaction_id = ?
+            """, (transaction_id,)).fetchone()
+        if not row:
+            raise NotFound("找不到交易记录")
+        return TransactionDetail(*row)
+
+    def search_transactions(self, start_date=None, end_date=None, keyword=None):
+        """按日期范围（含首尾两天）和关键词（描述或客户姓名）查询交易，最新的在前"""
+        conditions, params = _transaction_filters(start_date, end_date, keyword)
+        query = f"""
+            SELECT {_TRANSACTION_COLUMNS}
+            FROM transactions t
+            LEFT JOIN reservations r ON t.reservation_id = r.reservation_id
+            LEFT JOIN customers c ON r.customer_id = c.customer_id
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY t.transaction_date DESC"
+
+        with db.reader() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [Transaction(*row) for row in rows]
+
+    def transaction_list(self, start_date=None, end_date=None, keyword=None):
+        """交易记录窗口的分页数据，筛选条件同 search_transactions，默认最新的在前"""
+        conditions, params = _transaction_filters(start_date, end_date, keyword)
+        listing = paging.Listing(
+            _TRANSACTION_COLUMNS,
+            "transactions t LEFT JOIN reservations r ON t.reservation_id = r.reservation_id "
+            "LEFT JOIN customers c ON r.customer_id = c.customer_id",
+            "t.transaction_id",
+            {"交易ID": "t.transaction_id", "订单ID": "t.reservation_id", "房间号": "r.room_number",
+             "客户姓名": "c.name", "金额": "t.amount", "交易日期": "t.transaction_date",
+             "描述": "t.description"},
+            "交易日期", default_descending=True, conditions=conditions, params=params)
+        return PagedList(listing, lambda row: Transaction(*row))
+
+    def finance_summary(self, days=7):
+        """财务概览与最近 days 天的每日收入（读营收日汇总表）"""
+        with db.reader() as conn:
+            total_income, today_income, month_income, order_count = revenue.summary(conn)
+            daily = revenue.daily(conn, days)
+        avg_income_per_order = total_income / order_count if order_count > 0 else 0
+        return FinanceSummary(total_income, today_income, month_income, order_count, avg_income_per_order, daily)
+
+    # ---- 夜审 ----
+
+    def current_business_date(self):
+        """当前（尚未夜审的）营业日，见 night_audit.py"""
+        import night_audit  # night_audit 引用了本模块，用到时才导入
+        return night_audit.current_business_date()
+
+    @_retry_busy
+    def night_audit(self, business_date=None, audited_by=None):
+        """结束一个营业日，返回 night_audit.NightAudit"""
+        import night_audit
+        return night_audit.run(business_date, audited_by)
+
+    # ---- 用户 ----
+
+    def authenticate(self, username, password, user_type="frontdesk"):
+        """登录校验：管理员入口只允许 admin，前台入口允许 admin 和 frontdesk"""
+        if not username or not password:
+            raise ValidationError("用户名和密码不能为空")
+        with db.reader() as conn:
+            row = conn.execute("SELECT user_id, username, role FROM users WHERE username = ? AND password_hash = ?",
+                               (username, hash_password(password))).fetchone()
+        if not row:
+            raise PermissionDenied("用户名或密码错误")
+        user_id, username, role = row
+        if not ((user_type == "admin" and role == "admin") or
+                (user_type == "frontdesk" and role in ("admin", "frontdesk"))):
+            raise PermissionDenied("权限不足，无法登录该系统")
+        return User(user_id, username, role, None)
+
+    @_retry_busy
+    def add_user(self, username, password, role="frontdesk"):
+        username = (username or "").strip()
+        if not username:
+            raise ValidationError("用户名不能为空")
+        if not password:
+            raise ValidationError("密码不能为空")
+        if role not in USER_ROLES:
+            raise ValidationError("用户角色无效")
+
+        with db.writer() as conn:
+            if conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone():
+                raise Conflict(f"用户名 '{username}' 已存在")
+            cursor = conn.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
+                                  (username, hash_password(password), role))
+        return User(cursor.lastrowid, username, role, None)
+
+    @_retry_busy
+    def update_user(self, user_id, role, password=None):
+        """修改角色；password 不为空时同时重置密码"""
+        user_id = _int(user_id, "请先选择一个用户")
+        if role not in USER_ROLES:
+            raise ValidationError("用户角色无效")
+        with db.writer() as conn:
+            cursor = conn.execute("UPDATE users SET role = ? WHERE user_id = ?", (role, user_id))
+            if cursor.rowcount == 0:
+                raise NotFound("用户不存在")
+            if password:
+                conn.execute("UPDATE users SET password_hash = ? WHERE user_id = ?",
+                             (hash_password(password), user_id))
+
+    @_retry_busy
+    def delete_user(self, user_id, current_user_id=None):
+        user_id = _int(user_id, "请先选择一个用户")
+        if current_user_id is not None and user_id == int(current_user_id):
+            raise PermissionDenied("不能删除当前登录的用户")
+        with db.writer() as conn:
+            cursor = conn.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
+            if cursor.rowcount == 0:
+                raise NotFound("用户不存在")
+
+    def get_user(self, user_id):
+        user_id = _int(user_id, "请先选择一个用户")
+        with db.reader() as conn:
+            row = conn.execute("SELECT user_id, username, role FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            raise NotFound("用户不存在")
+        return User(*row, None)
+
+    def list_users(self, order_by="user_id"):
+        """全部用户；表中没有 create_time 列时 create_time 为 None"""
+        order = "username" if order_by == "username" else "user_id"
+        with db.reader() as conn:
+            has_create_time = any(col[1] == 'create_time' for col in conn.execute("PRAGMA table_info(users)"))
+            create_time = "create_time" if has_create_time else "NULL"
+            rows = conn.execute(f"SELECT user_id, username, role, {create_time} FROM users "
+                                f"ORDER BY {order}").fetchall()
+        return [User(*row) for row in rows]
+
+    def user_list(self):
+        """用户列表窗口的分页数据，默认按用户ID排序"""
+        sorts = {"ID": "user_id", "用户名": "username", "角色": "role"}
+        with db.reader() as conn:
+            has_create_time = any(col[1] == 'create_time' for col in conn.execute("PRAGMA table_info(users)"))
+        if has_create_time:
+            sorts["创建时间"] = "create_time"
+        listing = paging.Listing(f"user_id, username, role, {'create_time' if has_create_time else 'NULL'}",
+                                 "users", "user_id", sorts, "ID")
+        return PagedList(listing, lambda row: User(*row))
+# ==== 结束 ====
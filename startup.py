@@ -0,0 +1,57 @@
+import sys
+import time
+import unicodedata
+
+# ==== 启动计时 ====
+# python zhuti1.0.py --profile-startup 启动时，在终端打印各阶段耗时：
+#
+#   启动计时（到登录界面可用）
+#     导入模块                  38.2 ms
+#     数据库迁移                 3.1 ms
+#     ...
+#     合计                      95.4 ms
+#
+# 从主程序第一行 import startup 开始计时（Python 解释器自身的启动时间不在内）。
+# 没有这个参数时 mark / report 什么都不做。
+# 想看具体是哪个模块导入慢，用 python -X importtime zhuti1.0.py。
+
+FLAG = "--profile-startup"
+ENABLED = FLAG in sys.argv
+
+_last = time.perf_counter()
+_phases = []
+
+
+def mark(name):
+    """记录从上一次 mark 到现在这一阶段的耗时"""
+    global _last
+    now = time.perf_counter()
+    if ENABLED:
+        _phases.append((name, now - _last))
+    _last = now
+
+
+def restart():
+    """从现在重新计时（例如跳过等待用户输入登录信息的时间）"""
+    global _last
+    _last = time.perf_counter()
+
+
+def _pad(text, width):
+    """按终端显示宽度补空格（中文字符占两格）"""
+    shown = sum(2 if unicodedata.east_asian_width(ch) in "WF" else 1 for ch in text)
+    return text + " " * (width - shown)
+
+
+def report(title):
+    """打印上一次 report 之后记录的各阶段耗时"""
+    if not ENABLED or not _phases:
+        return
+    width = max(len(name) * 2 for name, _ in _phases) + 4
+    lines = [f"启动计时（{title}）"]
+    for name, seconds in _phases:
+        lines.append(f"  {_pad(name, width)}{seconds * 1000:8.1f} ms")
+    lines.append(f"  {_pad('合计', width)}{sum(seconds for _, seconds in _phases) * 1000:8.1f} ms")
+    print("\n".join(lines), file=sys.stderr, flush=True)
+    _phases.clear()
+# ==== 结束 ====
@@ -0,0 +1,78 @@
+from enum import IntEnum
+
+# ==== 房间 / 预订状态 ====
+# 数据库中 rooms.status 和 reservations.status 存储的是这里的整数编码，
+# 界面显示时再通过 label() 转成中文。查询请使用编码（可以命中部分索引），不要再比较字符串。
+
+
+class RoomStatus(IntEnum):
+    AVAILABLE = 0  # 空闲
+    RESERVED = 1  # 已预订
+    OCCUPIED = 2  # 已入住
+
+    @property
+    def label(self):
+        return _ROOM_LABELS[self]
+
+
+class ReservationStatus(IntEnum):
+    RESERVED = 0  # 已预订
+    CHECKED_IN = 1  # 已入住
+    CANCELED = 2  # 已取消
+    COMPLETED = 3  # 已完成（已退房）
+    NO_SHOW = 4  # 未到店（夜审时入住日期已过仍未入住，见 night_audit.py）
+
+    @property
+    def label(self):
+        return _RESERVATION_LABELS[self]
+
+
+_ROOM_LABELS = {
+    RoomStatus.AVAILABLE: "空闲",
+    RoomStatus.RESERVED: "已预订",
+    RoomStatus.OCCUPIED: "已入住",
+}
+
+_RESERVATION_LABELS = {
+    ReservationStatus.RESERVED: "已预订",
+    ReservationStatus.CHECKED_IN: "已入住",
+    ReservationStatus.CANCELED: "已取消",
+    ReservationStatus.COMPLETED: "已完成",
+    ReservationStatus.NO_SHOW: "未到店",
+}
+
+# 仍然占用房间的预订状态
+ACTIVE_RESERVATION_STATUSES = (ReservationStatus.RESERVED, ReservationStatus.CHECKED_IN)
+
+
+def room_label(code):
+    """房间状态编码 -> 中文显示"""
+    try:
+        return RoomStatus(code).label
+    except ValueError:
+        return str(code)
+
+
+def reservation_label(code):
+    """预订状态编码 -> 中文显示"""
+    try:
+        return ReservationStatus(code).label
+    except ValueError:
+        return str(code)
+
+
+def reservation_from_label(label):
+    """中文显示 -> 预订状态编码（用于下拉框），无法识别时返回 None"""
+    for status, text in _RESERVATION_LABELS.items():
+        if text == label:
+            return status
+    return None
+
+
+def sql_in(statuses):
+    """把一组状态编码拼成 SQL 的 IN 列表，例如 "(0, 1)"
+
+    编码是常量整数，直接写进 SQL 才能让查询规划器使用按状态建立的部分索引。
+    """
+    return "(" + ", ".join(str(int(s)) for s in statuses) + ")"
+# ==== 结束 ====
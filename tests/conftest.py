@@ -0,0 +1,36 @@
+from datetime import date, timedelta
+
+import pytest
+
+import db
+import migrations
+import service
+
+
+def day(offset):
+    """今天之后 offset 天，YYYY-MM-DD"""
+    return (date.today() + timedelta(days=offset)).isoformat()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """每个测试一个新建并升级到最新版本的临时数据库"""
+    path = str(tmp_path / "hotel.db")
+    db.configure(path)
+    migrations.migrate()
+    yield path
+    db.get_manager().close()
+
+
+@pytest.fixture
+def hotel(db_path):
+    return service.HotelService()
+
+
+@pytest.fixture
+def guests(hotel):
+    """房间 101、102 和两位客户，返回两位客户的ID"""
+    hotel.add_room(101, "标准间", 200, "已清洁")
+    hotel.add_room(102, "大床房", 300, "已清洁")
+    return (hotel.add_customer("张三", "13800000001", "110101199001010011").customer_id,
+            hotel.add_customer("李四", "13800000002", "110101199001010022").customer_id)
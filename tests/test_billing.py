@@ -0,0 +1,91 @@
+import pytest
+
+import billing
+import db
+import night_audit
+import service
+from conftest import day
+from statuses import ReservationStatus, RoomStatus
+
+
+def test_folio_checkout(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(-3), day(1))
+    hotel.check_in(101, guests[0])
+    hotel.add_transaction(reservation.reservation_id, 50, day(-1), "早餐")
+
+    bill = hotel.check_out(101)
+
+    # 提前一天走：按实际住的三晚计费
+    assert (bill.check_in_date, bill.check_out_date, bill.nights, bill.rate) == (day(-3), day(0), 3, 200)
+    assert bill.room_charge == 600
+    assert sorted((line.description, line.amount) for line in bill.lines) == [("房费（3晚）", 600), ("早餐", 50)]
+    assert bill.total == 650
+    assert hotel.get_reservation(reservation.reservation_id).status == ReservationStatus.COMPLETED
+    assert hotel.get_reservation(reservation.reservation_id).check_out_date == day(0)
+    room = hotel.get_room(101)
+    assert (room.status, room.clean_status) == (RoomStatus.AVAILABLE, "未清洁")
+    # 空出来的那一晚可以再预订
+    hotel.create_reservation(101, guests[1], day(0), day(1))
+
+
+def test_audited_nights_not_charged_again(hotel, guests):
+    hotel.create_reservation(101, guests[0], day(-2), day(1))
+    hotel.check_in(101, guests[0])
+    night_audit.run(day(-2))
+    night_audit.run(day(-1))
+
+    bill = hotel.check_out(101)
+
+    assert (bill.nights, bill.room_charge) == (2, 400)
+    assert [(line.description, line.amount) for line in bill.lines] == [("房费", 200), ("房费", 200)]
+
+
+def test_same_day_checkout_is_one_night(hotel, guests):
+    hotel.create_reservation(101, guests[0], day(0), day(3))
+    hotel.check_in(101, guests[0])
+    bill = hotel.check_out(101)
+    assert (bill.nights, bill.room_charge, bill.total) == (1, 200, 200)
+    hotel.create_reservation(101, guests[1], day(1), day(3))
+
+
+def test_check_out_needs_guest_in_house(hotel, guests):
+    hotel.create_reservation(101, guests[0], day(0), day(2))
+    with db.writer() as conn:
+        with pytest.raises(billing.NoGuestInRoom):
+            billing.check_out(conn, 101)
+
+
+def test_charges_outside_stay_voided(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(-2), day(1))
+    hotel.check_in(101, guests[0])
+    with db.writer() as conn:
+        # 落后补做的夜审给客人到店前的日子记过房费
+        conn.executemany("INSERT INTO transactions (reservation_id, amount, transaction_date, description, "
+                         "posting_night) VALUES (?, 200, ?, '房费', ?)",
+                         [(reservation.reservation_id, f"{night} 23:59:59", night) for night in (day(-4), day(-3))])
+    night_audit.run(day(-2))
+
+    bill = hotel.check_out(101)
+
+    assert (bill.nights, bill.room_charge, bill.total) == (2, 400, 400)
+    assert sorted(line.description for line in bill.lines) == ["房费", "房费（1晚）"]
+
+
+def test_overstay_needs_extension(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(-3), day(-1))
+    hotel.check_in(101, guests[0])
+    with pytest.raises(service.Conflict):
+        hotel.check_out(101)
+    assert hotel.get_reservation(reservation.reservation_id).status == ReservationStatus.CHECKED_IN
+
+    # 多住的那一晚已经卖给了别人：续住时发现冲突
+    other = hotel.create_reservation(101, guests[1], day(-1), day(0))
+    with pytest.raises(service.Conflict):
+        hotel.update_reservation(reservation.reservation_id, 101, guests[0], day(-3), day(0),
+                                 ReservationStatus.CHECKED_IN)
+    hotel.cancel_reservation(other.reservation_id)
+
+    hotel.update_reservation(reservation.reservation_id, 101, guests[0], day(-3), day(0),
+                             ReservationStatus.CHECKED_IN)
+    bill = hotel.check_out(101)
+    assert (bill.nights, bill.room_charge) == (3, 600)
@@ -0,0 +1,143 @@
+import csv
+
+import pytest
+
+import bulk_import
+import db
+import export
+import search
+import service
+
+
+def write_csv(path, lines, encoding="utf-8"):
+    path.write_text("\n".join(lines) + "\n", encoding=encoding)
+    return str(path)
+
+
+def read_rejects(path):
+    with open(path, newline="", encoding=export.CSV_ENCODING) as f:
+        return [(row[0], row[1]) for row in list(csv.reader(f))[1:]]
+
+
+def schema_cookie():
+    with db.reader() as conn:
+        return conn.execute("PRAGMA schema_version").fetchone()[0]
+
+
+def test_import_rooms_with_rejects(hotel, tmp_path):
+    hotel.add_room(101, "标准间", 200, "已清洁")
+    path = write_csv(tmp_path / "rooms.csv", [
+        "备注,clean_status,price,room_type,room_number",  # 列名中英文都可以，顺序不限，多余的列忽略
+        "临街,已清洁,200,标准间,102",
+        ",未清洁,300,大床房,103",
+        ",已清洁,abc,标准间,104",
+        ",已清洁,200,标准间,101",
+        ",已清洁,260,标准间,102",
+        "",
+        ",已清洁,200,,105",
+    ])
+
+    result = bulk_import.import_csv("rooms", path)
+
+    assert (result.imported, result.rejected) == (2, 4)
+    assert result.rejected_path == str(tmp_path / "rooms_rejected.csv")
+    # 校验不合格的行读到时就写入，重复的行整批写入时才发现
+    assert sorted(read_rejects(result.rejected_path)) == [
+        ("4", "价钱必须为有效数字（如：300.0）"),
+        ("5", "该房间号已存在"),
+        ("6", "与第 2 行重复"),
+        ("8", "房间号、房间类型、价钱、清洁状态均为必填项"),
+    ]
+    assert [(room.room_number, room.price) for room in hotel.list_rooms()] == [(101, 200), (102, 200), (103, 300)]
+
+
+def test_import_customers_searchable(hotel, tmp_path):
+    path = write_csv(tmp_path / "customers.csv", [
+        "姓名,联系方式,身份证号,积分",
+        "欧阳明月,13900000003,110101199001010033,12",
+        "王五,13900000004,12345,0",
+        "赵六,13900000005,110101199001010055,",
+    ], encoding="gbk")
+
+    result = bulk_import.import_csv("customers", path, encoding="gbk")
+
+    assert (result.imported, result.rejected) == (2, 1)
+    assert [(c.name, c.points) for c in hotel.search_customers("欧阳明")] == [("欧阳明月", 12)]
+    assert [c.name for c in hotel.search_customers("110101199001010055")] == ["赵六"]
+
+    # 修正拒绝文件后再导入一次，已导入的行按重复拒绝
+    again = bulk_import.import_csv("customers", path, encoding="gbk")
+    assert (again.imported, again.rejected) == (0, 3)
+
+
+def test_no_rejects_no_file(hotel, tmp_path):
+    path = write_csv(tmp_path / "rooms.csv", ["room_number,room_type,price,clean_status", "101,标准间,200,已清洁"])
+    stale = tmp_path / "rooms_rejected.csv"
+    stale.write_text("上次导入的拒绝文件", encoding="utf-8")
+    assert bulk_import.import_csv("rooms", path) == bulk_import.ImportResult(1, 0, None)
+    assert not stale.exists()
+
+
+@pytest.mark.parametrize("lines, encoding", [
+    ([], "utf-8"),
+    (["房间号,房间类型", "101,标准间"], "utf-8"),
+    (["房间号,房间类型,价钱,清洁状态", "101,标准间,200,已清洁"], "gbk"),
+])
+def test_unreadable_file(hotel, tmp_path, lines, encoding):
+    path = tmp_path / "rooms.csv"
+    path.write_text("\n".join(lines), encoding=encoding)
+    with pytest.raises(service.ValidationError):
+        bulk_import.import_csv("rooms", str(path))
+
+
+def test_cancel_keeps_committed_batches(hotel, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BATCH_SIZE", 2)
+    path = write_csv(tmp_path / "rooms.csv", ["房间号,房间类型,价钱,清洁状态"]
+                     + [f"{100 + i},标准间,200,已清洁" for i in range(5)])
+    progress = []
+    with pytest.raises(bulk_import.ImportCancelled):
+        bulk_import.import_csv("rooms", path, progress=progress.append, cancelled=lambda: bool(progress))
+    assert [room.room_number for room in hotel.list_rooms()] == [100, 101]
+
+    result = bulk_import.import_csv("rooms", path)
+    assert (result.imported, result.rejected) == (3, 2)
+
+
+def test_cancelled_task_is_not_an_error(hotel, tmp_path, monkeypatch):
+    monkeypatch.setattr(bulk_import, "BATCH_SIZE", 2)
+    path = write_csv(tmp_path / "rooms.csv", ["房间号,房间类型,价钱,清洁状态"]
+                     + [f"{100 + i},标准间,200,已清洁" for i in range(5)])
+    task = bulk_import.ImportTask("rooms", path)
+    task.cancel()
+    task.run()
+    assert (task.done, task.error, task.result, task.total) == (True, None, None, 5)
+    assert hotel.list_rooms() == []
+
+
+def test_import_customers_indexes_without_ddl(hotel, tmp_path):
+    path = tmp_path / "customers.csv"
+    lines = ["姓名,联系方式,身份证号"] + [f"客户{i},139{i:08d},11010119900101{i:04d}" for i in range(50)]
+    lines.append("客户0,13900000000,110101199001010000")  # 与第一行重复
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    cookie = schema_cookie()
+
+    result = bulk_import.import_csv("customers", str(path))
+
+    assert (result.imported, result.rejected) == (50, 1)
+    assert schema_cookie() == cookie  # 没有删除、重建触发器
+    assert [c.name for c in hotel.search_customers("客户42")] == ["客户42"]
+    # 导入结束后逐行同步照常进行
+    hotel.add_customer("王五", "13700000000", "110101198001010099")
+    assert [c.name for c in hotel.search_customers("王五")] == ["王五"]
+
+
+def test_failed_bulk_insert_leaves_sync_on(hotel):
+    with pytest.raises(RuntimeError):
+        with db.writer() as conn:
+            with search.bulk_customers(conn):
+                conn.execute("INSERT INTO customers (name, contact, id_card) VALUES ('赵六', '1', '2')")
+                raise RuntimeError
+    with db.reader() as conn:
+        assert conn.execute("SELECT paused FROM search_sync").fetchone()[0] == 0
+    hotel.add_customer("钱七", "13600000000", "110101198001010088")
+    assert [c.name for c in hotel.search_customers("钱七")] == ["钱七"]
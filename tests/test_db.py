@@ -0,0 +1,114 @@
+import sqlite3
+import threading
+
+import pytest
+
+import db
+
+
+def test_writer_commits_and_rolls_back(db_path):
+    with db.writer() as conn:
+        conn.execute("INSERT INTO rooms (room_number, room_type, price, status, clean_status) "
+                     "VALUES (1, '标准间', 100, 0, '已清洁')")
+    with pytest.raises(RuntimeError):
+        with db.writer() as conn:
+            conn.execute("INSERT INTO rooms (room_number, room_type, price, status, clean_status) "
+                         "VALUES (2, '标准间', 100, 0, '已清洁')")
+            raise RuntimeError
+    with db.reader() as conn:
+        assert [row[0] for row in conn.execute("SELECT room_number FROM rooms")] == [1]
+
+
+def test_nested_writer_joins_outer_transaction(db_path):
+    commits = []
+    db.get_manager().add_commit_listener(lambda: commits.append(1))
+    with pytest.raises(RuntimeError):
+        with db.writer() as outer:
+            with db.writer() as inner:
+                assert inner is outer
+                inner.execute("INSERT INTO rooms (room_number) VALUES (1)")
+            assert db.get_manager().in_writer()
+            raise RuntimeError
+    with db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0] == 0
+    assert commits == []
+
+    with db.writer() as outer:
+        with db.writer():
+            outer.execute("INSERT INTO rooms (room_number) VALUES (1)")
+    assert commits == [1]
+
+
+def test_readers_are_read_only(db_path):
+    with db.reader() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("INSERT INTO rooms (room_number) VALUES (1)")
+
+
+def test_retry_busy_waits_for_other_writer(db_path, monkeypatch):
+    # busy_timeout 设短一点，不用每次等 5 秒
+    monkeypatch.setattr(db, "PRAGMAS", tuple(p for p in db.PRAGMAS if "busy_timeout" not in p)
+                        + ("PRAGMA busy_timeout=10",))
+    monkeypatch.setattr(db, "RETRY_BACKOFF", 0.01)
+    db.configure(db_path)
+    other = sqlite3.connect(db_path, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    calls = []
+
+    @db.retry_busy
+    def insert():
+        calls.append(1)
+        if len(calls) == 2:
+            other.rollback()  # 另一台终端的事务结束了，第二次就能拿到写锁
+        with db.writer() as conn:
+            conn.execute("INSERT INTO rooms (room_number) VALUES (1)")
+
+    insert()
+    other.close()
+    assert len(calls) == 2
+    with db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM rooms").fetchone()[0] == 1
+
+
+def test_retry_busy_gives_up(db_path, monkeypatch):
+    monkeypatch.setattr(db, "RETRY_BACKOFF", 0.001)
+    monkeypatch.setattr(db, "WRITE_RETRIES", 2)
+    calls = []
+
+    @db.retry_busy
+    def locked():
+        calls.append(1)
+        raise sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(sqlite3.OperationalError):
+        locked()
+    assert len(calls) == 3
+
+
+def test_retry_busy_not_inside_outer_transaction(db_path):
+    calls = []
+
+    @db.retry_busy
+    def locked():
+        calls.append(1)
+        raise sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(sqlite3.OperationalError):
+        with db.writer():
+            locked()
+    assert len(calls) == 1
+
+
+def test_data_version_sees_other_connections(db_path):
+    manager = db.get_manager()
+    before = manager.data_version()
+    with db.writer() as conn:
+        conn.execute("INSERT INTO rooms (room_number) VALUES (1)")
+    assert manager.data_version() != before
+
+    before = manager.data_version()
+    thread = threading.Thread(target=lambda: sqlite3.connect(db_path).execute(
+        "UPDATE rooms SET price = 1").connection.commit())
+    thread.start()
+    thread.join()
+    assert manager.data_version() != before
@@ -0,0 +1,93 @@
+import pytest
+
+import db
+import events
+
+
+class FakeRoot:
+    """代替 Tk 根窗口：after() 什么都不做，测试里手动调用 bus.check()"""
+
+    def after(self, ms, callback):
+        pass
+
+
+@pytest.fixture
+def bus(db_path):
+    return events.ChangeBus(FakeRoot())
+
+
+def collect(bus, kind):
+    received = []
+    bus.subscribe(kind, received.append)
+    return received
+
+
+def test_publishes_changed_keys(bus, hotel, guests):
+    rooms = collect(bus, events.ROOM)
+    reservations = collect(bus, events.RESERVATION)
+    bus.check()
+    assert rooms == [{101, 102}]
+    assert reservations == []
+
+    reservation = hotel.create_reservation(101, guests[0], "2030-01-01", "2030-01-03")
+    bus.check()
+    assert reservations == [{reservation.reservation_id}]
+    assert rooms[-1] == {101}
+
+
+def test_nothing_committed_nothing_published(bus, hotel):
+    rooms = collect(bus, events.ROOM)
+    bus.check()
+    bus.check()
+    assert rooms == []
+
+
+def test_too_many_changes_reload_everything(bus, hotel, monkeypatch):
+    monkeypatch.setattr(events, "MAX_BATCH", 2)
+    rooms = collect(bus, events.ROOM)
+    transactions = collect(bus, events.TRANSACTION)
+    for room_number in (101, 102, 103):
+        hotel.add_room(room_number, "标准间", 200, "已清洁")
+    bus.check()
+    assert rooms == [None]
+    assert transactions == [None]
+
+
+def test_pruned_log_reloads_everything(bus, hotel):
+    rooms = collect(bus, events.ROOM)
+    hotel.add_room(101, "标准间", 200, "已清洁")
+    hotel.add_room(102, "标准间", 200, "已清洁")
+    with db.writer() as conn:
+        # 夜审清理日志时删掉了还没读到的一段
+        conn.execute("DELETE FROM change_log WHERE version = (SELECT MIN(version) FROM change_log)")
+    bus.check()
+    assert rooms == [None]
+
+
+def test_unsubscribe(bus, hotel):
+    received = []
+    unsubscribe = bus.subscribe(events.ROOM, received.append)
+    unsubscribe()
+    hotel.add_room(101, "标准间", 200, "已清洁")
+    bus.check()
+    assert received == []
+
+
+def test_failures_reported_once_until_recovered(db_path, monkeypatch):
+    errors = []
+    bus = events.ChangeBus(FakeRoot(), on_error=errors.append)
+    check = bus.check
+
+    def tick():
+        bus._woken.set()
+        bus._tick()
+
+    monkeypatch.setattr(bus, "check", lambda: 1 / 0)
+    tick()
+    tick()
+    assert len(errors) == 1
+    monkeypatch.setattr(bus, "check", check)
+    tick()
+    monkeypatch.setattr(bus, "check", lambda: 1 / 0)
+    tick()
+    assert len(errors) == 2
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+import export
+import ledger
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+@pytest.fixture
+def stay(hotel, guests):
+    return hotel.create_reservation(101, guests[0], "2030-01-30", "2030-02-02").reservation_id
+
+
+def read(directory):
+    table = pq.read_table(directory)
+    return sorted(zip(table.column("transaction_id").to_pylist(), table.column("amount").to_pylist()))
+
+
+def parts(directory):
+    return sorted(os.path.relpath(os.path.join(path, name), directory)
+                  for path, _, names in os.walk(directory) for name in names if name.startswith("part-"))
+
+
+def test_incremental_export_by_month(hotel, stay, tmp_path):
+    directory = str(tmp_path / "ledger")
+    first = hotel.add_transaction(stay, 100, "2030-01-31", "房费")
+    second = hotel.add_transaction(stay, 30, "2030-02-01", "早餐")
+
+    assert ledger.pending_count(directory) == 2
+    assert ledger.export_ledger(directory) == 2
+    assert parts(directory) == [
+        os.path.join("month=2030-01", f"part-{first:010d}-{first:010d}.parquet"),
+        os.path.join("month=2030-02", f"part-{second:010d}-{second:010d}.parquet"),
+    ]
+    assert ledger.read_state(directory)["last_transaction_id"] == second
+
+    # 再导出一次只追加新的交易，已有文件不动
+    assert ledger.export_ledger(directory) == 0
+    third = hotel.add_transaction(stay, 50, "2030-02-01", "洗衣")
+    assert ledger.pending_count(directory) == 1
+    assert ledger.export_ledger(directory) == 1
+    assert len(parts(directory)) == 3
+    assert read(directory) == [(first, 100), (second, 30), (third, 50)]
+
+
+def test_cancelled_export_leaves_no_files(hotel, stay, tmp_path):
+    directory = str(tmp_path / "ledger")
+    hotel.add_transaction(stay, 100, "2030-01-31", "房费")
+    with pytest.raises(export.ExportCancelled):
+        ledger.export_ledger(directory, cancelled=lambda: True)
+    assert parts(directory) == []
+    assert ledger.read_state(directory) is None
+    assert ledger.export_ledger(directory) == 1
+
+
+def test_orphaned_parts_removed(hotel, stay, tmp_path):
+    # 上次导出写完文件、没来得及更新状态文件就中断了
+    directory = str(tmp_path / "ledger")
+    transaction_id = hotel.add_transaction(stay, 100, "2030-01-31", "房费")
+    ledger.export_ledger(directory)
+    os.remove(os.path.join(directory, ledger.STATE_FILE))
+    assert ledger.export_ledger(directory) == 1
+    assert read(directory) == [(transaction_id, 100)]
+
+
+def test_one_format_per_directory(hotel, stay, tmp_path):
+    directory = str(tmp_path / "ledger")
+    ledger.export_ledger(directory)
+    with pytest.raises(ValueError):
+        ledger.export_ledger(directory, fmt="arrow")
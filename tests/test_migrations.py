@@ -0,0 +1,87 @@
+import shutil
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+import db
+import migrations
+import service
+from statuses import ReservationStatus, RoomStatus
+
+SHIPPED_DB = Path(__file__).resolve().parent.parent / "hotel.db"
+
+
+def schema_version(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT MAX(version) FROM schema_version").fetchone()[0]
+
+
+def test_fresh_database(tmp_path):
+    path = str(tmp_path / "hotel.db")
+    db.configure(path)
+    assert migrations.migrate() == len(migrations.MIGRATIONS)
+    assert migrations.migrate() == 0
+    assert schema_version(path) == migrations.MIGRATIONS[-1][0]
+    assert service.HotelService().authenticate("admin", "admin123", "admin").role == "admin"
+    with sqlite3.connect(path) as conn:
+        indexes = {row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'reservations' AND sql IS NOT NULL")}
+        # 可用性检查查的是 room_nights 的主键，不是 reservations
+        plan = " ".join(row[3] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT 1 FROM room_nights WHERE room_number = 1 AND night >= '2030-01-01' "
+            "AND night < '2030-01-03'"))
+    assert indexes == {"idx_reservations_status_check_in", "idx_reservations_reserved",
+                       "idx_reservations_in_house", "idx_reservations_customer"}
+    assert "PRIMARY KEY" in plan
+    db.get_manager().close()
+
+
+@pytest.fixture
+def shipped(tmp_path):
+    path = str(tmp_path / "hotel.db")
+    shutil.copy(SHIPPED_DB, path)
+    db.configure(path)
+    yield path
+    db.get_manager().close()
+
+
+def test_shipped_database(shipped):
+    with sqlite3.connect(shipped) as conn:
+        transaction_total = conn.execute("SELECT SUM(amount) FROM transactions").fetchone()[0]
+        counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                  for table in ("rooms", "customers", "reservations", "transactions", "users")}
+
+    assert migrations.migrate() == len(migrations.MIGRATIONS)
+    assert schema_version(shipped) == migrations.MIGRATIONS[-1][0]
+
+    with sqlite3.connect(shipped) as conn:
+        # 数据一条不少
+        for table, count in counts.items():
+            assert conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] == count
+        # 状态都换成了编码
+        assert {row[0] for row in conn.execute("SELECT DISTINCT status FROM rooms")} <= set(map(int, RoomStatus))
+        assert ({row[0] for row in conn.execute("SELECT DISTINCT status FROM reservations")}
+                <= set(map(int, ReservationStatus)))
+        # 营收汇总与流水一致
+        assert conn.execute("SELECT SUM(amount) FROM revenue_daily").fetchone()[0] == pytest.approx(transaction_total)
+        # 有效预订都有房晚库存（重叠的历史预订按先到先得，只有一个能占到）
+        assert conn.execute("SELECT COUNT(*) FROM room_nights").fetchone()[0] > 0
+        assert conn.execute("PRAGMA integrity_check").fetchone()[0] == "ok"
+
+    hotel = service.HotelService()
+    assert hotel.get_room(201).status == RoomStatus.OCCUPIED
+    assert hotel.get_room(300).status == RoomStatus.AVAILABLE
+    assert [row.description for row in hotel.search_transactions(keyword="房费")]
+
+
+def test_current_database_does_not_take_write_lock(db_path):
+    # 另一台终端正在写：已是最新版本的库启动时不用等它
+    other = sqlite3.connect(db_path, timeout=0)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert migrations.migrate() == 0
+        assert not db.get_manager().in_writer()
+    finally:
+        other.rollback()
+        other.close()
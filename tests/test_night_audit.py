@@ -0,0 +1,81 @@
+import pytest
+
+import db
+import night_audit
+import service
+from conftest import day
+from statuses import ReservationStatus, RoomStatus
+
+
+def test_posts_room_charges_and_flags_no_shows(hotel, guests):
+    in_house = hotel.create_reservation(101, guests[0], day(-1), day(2))
+    hotel.check_in(101, guests[0])
+    no_show = hotel.create_reservation(102, guests[1], day(-1), day(1))
+
+    result = night_audit.run(day(-1))
+
+    assert result == night_audit.NightAudit(day(-1), 1, 200, 1)
+    assert hotel.get_reservation(no_show.reservation_id).status == ReservationStatus.NO_SHOW
+    assert hotel.get_room(102).status == RoomStatus.AVAILABLE
+    assert hotel.get_room(101).status == RoomStatus.OCCUPIED
+    with db.reader() as conn:
+        charges = conn.execute("SELECT amount, posting_night FROM transactions WHERE reservation_id = ?",
+                               (in_house.reservation_id,)).fetchall()
+        # 未到店的房晚已释放，房间可以再预订
+        assert not conn.execute("SELECT 1 FROM room_nights WHERE reservation_id = ?",
+                                (no_show.reservation_id,)).fetchone()
+    assert charges == [(200, day(-1))]
+    assert night_audit.current_business_date() == day(0)
+
+    # 下一个营业日接着记，同一晚不会重复记
+    night_audit.run()
+    with db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*), SUM(amount) FROM transactions WHERE reservation_id = ?",
+                            (in_house.reservation_id,)).fetchone() == (2, 400)
+
+
+def test_business_dates_in_order(hotel, guests):
+    night_audit.run(day(-2))
+    with pytest.raises(service.Conflict):
+        night_audit.run(day(-2))
+    with pytest.raises(service.Conflict):
+        night_audit.run(day(0))
+    night_audit.run()
+    assert night_audit.current_business_date() == day(0)
+
+
+def test_cannot_close_future_day(hotel):
+    with pytest.raises(service.Conflict):
+        night_audit.run(day(1))
+    with pytest.raises(service.ValidationError):
+        night_audit.run("not a date")
+
+
+def test_keeps_only_recent_change_log(hotel, guests, monkeypatch):
+    monkeypatch.setattr(night_audit, "CHANGE_LOG_KEEP", 1)
+    hotel.create_reservation(101, guests[0], day(0), day(1))
+    night_audit.run(day(-1))
+    with db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM change_log").fetchone()[0] == 1
+
+
+def test_no_show_keeps_room_reserved_for_later_booking(hotel, guests):
+    # 同一房间后面还有预订时，前一个预订未到店不会把房间改成空闲
+    hotel.create_reservation(101, guests[0], day(-1), day(0))
+    hotel.create_reservation(101, guests[1], day(3), day(4))
+    assert night_audit.run(day(-1)).no_shows == 1
+    assert hotel.get_room(101).status == RoomStatus.RESERVED
+
+
+def test_catch_up_does_not_bill_nights_before_arrival(hotel, guests):
+    # 夜审落后了几天，期间客人才到店入住：补做的夜审只记他住下的那一晚
+    reservation = hotel.create_reservation(101, guests[0], day(-1), day(1))
+    hotel.check_in(101, guests[0])
+    for offset in (-4, -3, -2, -1):
+        night_audit.run(day(offset))
+
+    with db.reader() as conn:
+        assert conn.execute("SELECT posting_night, amount FROM transactions WHERE reservation_id = ?",
+                            (reservation.reservation_id,)).fetchall() == [(day(-1), 200)]
+    bill = hotel.check_out(101)
+    assert (bill.nights, bill.room_charge, bill.total) == (1, 200, 200)
@@ -0,0 +1,114 @@
+import pytest
+
+import service
+from conftest import day
+from statuses import ReservationStatus, RoomStatus
+
+
+def test_cancel_keeps_room_reserved_for_other_booking(hotel, guests):
+    first, second = guests
+    r1 = hotel.create_reservation(101, first, day(0), day(2))
+    r2 = hotel.create_reservation(101, second, day(5), day(7))
+
+    hotel.cancel_reservation(r2.reservation_id)
+
+    assert hotel.get_room(101).status == RoomStatus.RESERVED
+    checked_in = hotel.check_in(101, first)
+    assert checked_in.reservation_id == r1.reservation_id
+    assert hotel.get_room(101).status == RoomStatus.OCCUPIED
+
+
+def test_cancel_last_booking_frees_room(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(0), day(2))
+    hotel.cancel_reservation(reservation.reservation_id)
+    assert hotel.get_room(101).status == RoomStatus.AVAILABLE
+    assert hotel.get_reservation(reservation.reservation_id).status == ReservationStatus.CANCELED
+
+
+def test_move_booking_keeps_old_room_reserved_for_other_booking(hotel, guests):
+    first, second = guests
+    hotel.create_reservation(101, first, day(0), day(2))
+    moved = hotel.create_reservation(101, second, day(5), day(7))
+
+    hotel.update_reservation(moved.reservation_id, 102, second, day(5), day(7), ReservationStatus.RESERVED)
+
+    assert hotel.get_room(101).status == RoomStatus.RESERVED
+    assert hotel.get_room(102).status == RoomStatus.RESERVED
+    hotel.check_in(101, first)
+
+
+def test_move_only_booking_frees_old_room(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(0), day(2))
+    hotel.update_reservation(reservation.reservation_id, 102, guests[0], day(0), day(2),
+                             ReservationStatus.RESERVED)
+    assert hotel.get_room(101).status == RoomStatus.AVAILABLE
+    assert hotel.get_room(102).status == RoomStatus.RESERVED
+
+
+def test_overlapping_booking_rejected(hotel, guests):
+    hotel.create_reservation(101, guests[0], day(0), day(3))
+    with pytest.raises(service.Conflict):
+        hotel.create_reservation(101, guests[1], day(2), day(4))
+    # 退房日当天可以再入住
+    hotel.create_reservation(101, guests[1], day(3), day(4))
+
+
+def test_check_in_and_check_out(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(0), day(2))
+    hotel.check_in(101, guests[0])
+    assert hotel.get_room(101).status == RoomStatus.OCCUPIED
+
+    hotel.add_transaction(reservation.reservation_id, 50, description="早餐")
+    bill = hotel.check_out(101)
+
+    assert bill.reservation_id == reservation.reservation_id
+    assert bill.total == pytest.approx(sum(line.amount for line in bill.lines))
+    assert any(line.amount == 50 for line in bill.lines)
+    room = hotel.get_room(101)
+    assert room.status == RoomStatus.AVAILABLE
+    assert room.clean_status == "未清洁"
+    assert hotel.get_reservation(reservation.reservation_id).status == ReservationStatus.COMPLETED
+    # 离开当天起房间可以再预订
+    hotel.create_reservation(101, guests[1], day(0), day(1))
+
+
+def test_check_out_empty_room(hotel, guests):
+    with pytest.raises(service.NotFound):
+        hotel.check_out(101)
+
+
+def test_check_in_without_reservation(hotel, guests):
+    with pytest.raises(service.NotFound):
+        hotel.check_in(101, guests[0])
+
+
+def test_ending_in_house_booking_releases_room(hotel, guests):
+    first, second = guests
+    in_house = hotel.create_reservation(101, first, day(0), day(2))
+    hotel.check_in(101, first)
+    hotel.create_reservation(101, second, day(5), day(7))
+
+    hotel.update_reservation(in_house.reservation_id, 101, first, day(0), day(2), ReservationStatus.COMPLETED)
+    assert hotel.get_room(101).status == RoomStatus.RESERVED
+
+    hotel.update_reservation(in_house.reservation_id, 101, first, day(0), day(2), ReservationStatus.CHECKED_IN)
+    assert hotel.get_room(101).status == RoomStatus.OCCUPIED
+
+
+def test_move_in_house_booking(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], day(0), day(2))
+    hotel.check_in(101, guests[0])
+    hotel.update_reservation(reservation.reservation_id, 102, guests[0], day(0), day(2),
+                             ReservationStatus.CHECKED_IN)
+    assert hotel.get_room(101).status == RoomStatus.AVAILABLE
+    assert hotel.get_room(102).status == RoomStatus.OCCUPIED
+    hotel.check_out(102)
+
+
+def test_update_customer_validates_like_add(hotel, guests):
+    first, second = guests
+    with pytest.raises(service.ValidationError):
+        hotel.update_customer(first, "张三", "13800000001", "12345")
+    with pytest.raises(service.Conflict):
+        hotel.update_customer(first, "张三", "13800000001", "110101199001010022")
+    assert hotel.update_customer(first, "张三丰", "13800000001", "110101199001010011").name == "张三丰"
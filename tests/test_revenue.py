@@ -0,0 +1,38 @@
+import pytest
+
+import db
+import revenue
+from conftest import day
+
+
+def order_counts(conn):
+    counted = conn.execute("SELECT COUNT(DISTINCT reservation_id) FROM revenue_orders").fetchone()[0]
+    return revenue.summary(conn)[3], counted
+
+
+def test_order_total_follows_transactions(hotel, guests):
+    first = hotel.create_reservation(101, guests[0], day(0), day(2)).reservation_id
+    second = hotel.create_reservation(102, guests[1], day(0), day(2)).reservation_id
+
+    lines = [hotel.add_transaction(first, 100, day(0)), hotel.add_transaction(first, 30, day(1)),
+             hotel.add_transaction(second, 50, day(0))]
+    with db.reader() as conn:
+        assert order_counts(conn) == (2, 2)
+
+    # 同一订单另一天的交易删掉，订单仍然有交易
+    hotel.delete_transaction(lines[1])
+    with db.reader() as conn:
+        assert order_counts(conn) == (2, 2)
+
+    # 交易改挂到另一个订单
+    with db.writer() as conn:
+        conn.execute("UPDATE transactions SET reservation_id = ? WHERE transaction_id = ?", (first, lines[2]))
+    with db.reader() as conn:
+        assert order_counts(conn) == (1, 1)
+
+    with db.writer() as conn:
+        revenue.rebuild(conn)
+    with db.reader() as conn:
+        assert order_counts(conn) == (1, 1)
+        total, today, month, orders = revenue.summary(conn)
+    assert total == pytest.approx(150)
@@ -0,0 +1,54 @@
+import sqlite3
+
+import room_cache
+from statuses import RoomStatus
+
+
+def test_sees_commits_from_other_terminals(hotel, db_path):
+    hotel.add_room(101, "标准间", 200, "已清洁")
+    hotel.add_room(102, "大床房", 300, "已清洁")
+    assert [room.room_number for room in hotel.list_rooms()] == [101, 102]
+
+    with sqlite3.connect(db_path) as other:
+        other.execute("UPDATE rooms SET price = 260 WHERE room_number = 101")
+        other.execute("UPDATE rooms SET room_number = 100 WHERE room_number = 102")
+        other.execute("INSERT INTO rooms (room_number, room_type, price, status, clean_status) "
+                      "VALUES (103, '套房', 500, 0, '已清洁')")
+
+    assert [(room.room_number, room.price) for room in hotel.list_rooms()] == [(100, 300), (101, 260), (103, 500)]
+    assert hotel.get_room(103).room_type == "套房"
+    assert hotel.room_types() == ["大床房", "套房", "标准间"]
+
+
+def test_status_changes_from_bookings(hotel, guests):
+    hotel.list_rooms()
+    reservation = hotel.create_reservation(101, guests[0], "2030-01-01", "2030-01-03")
+    assert hotel.get_room(101).status == RoomStatus.RESERVED
+    hotel.cancel_reservation(reservation.reservation_id)
+    assert hotel.get_room(101).status == RoomStatus.AVAILABLE
+
+
+def test_only_changed_rooms_reread(hotel, guests, monkeypatch):
+    hotel.list_rooms()
+    reads = []
+    monkeypatch.setattr(room_cache.RoomCache, "_load", lambda self, conn: reads.append("all"))
+    original = room_cache.RoomCache._reload
+    monkeypatch.setattr(room_cache.RoomCache, "_reload",
+                        lambda self, conn, numbers: (reads.append(sorted(numbers)), original(self, conn, numbers)))
+
+    hotel.list_rooms()
+    assert reads == []  # 没有提交，直接用缓存
+    hotel.add_customer("王五", "13700000000", "110101198001010099")
+    hotel.list_rooms()
+    assert reads == []  # 改的是别的表
+    hotel.update_room(102, "大床房", 350, "未清洁")
+    assert hotel.get_room(102).price == 350
+    assert reads == [[102]]
+
+
+def test_many_changes_reload_whole_table(hotel, guests, monkeypatch):
+    hotel.list_rooms()
+    monkeypatch.setattr(room_cache, "FULL_RELOAD", 1)
+    hotel.update_room(101, "标准间", 210, "已清洁")
+    hotel.update_room(102, "大床房", 310, "已清洁")
+    assert [room.price for room in hotel.list_rooms()] == [210, 310]
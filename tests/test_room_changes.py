@@ -0,0 +1,12 @@
+def test_room_changes_returns_only_changed_rooms(hotel, guests):
+    full = hotel.room_changes()
+    assert full.full
+    assert [room.room_number for room in full.rooms] == [101, 102]
+
+    hotel.update_room(102, "大床房", 350, "未清洁")
+    changes = hotel.room_changes(full.version)
+    assert not changes.full
+    assert [(room.room_number, room.price) for room in changes.rooms] == [(102, 350)]
+    assert changes.removed == []
+
+    assert hotel.room_changes(changes.version).rooms == []
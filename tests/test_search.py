@@ -0,0 +1,28 @@
+def test_search_customers_by_substring(hotel, guests):
+    hotel.add_customer("欧阳明月", "13900000003", "110101199001010033")
+    # 三个字以上走全文索引，更短的关键词退回 LIKE
+    assert [c.name for c in hotel.search_customers("阳明月")] == ["欧阳明月"]
+    assert [c.name for c in hotel.search_customers("李四")] == ["李四"]
+    assert [c.name for c in hotel.search_customers("0000000")] == ["张三", "李四", "欧阳明月"]
+    assert hotel.search_customers("不存在的人") == []
+
+
+def test_search_customers_by_id(hotel, guests):
+    assert [c.customer_id for c in hotel.search_customers(str(guests[1]))] == [guests[1]]
+
+
+def test_search_customers_follows_updates(hotel, guests):
+    hotel.update_customer(guests[0], "张三丰", "13800000001", "110101199001010011")
+    assert [c.customer_id for c in hotel.search_customers("张三丰")] == [guests[0]]
+
+
+def test_search_transactions_by_description_and_guest(hotel, guests):
+    reservation = hotel.create_reservation(101, guests[0], "2030-01-01", "2030-01-03")
+    hotel.add_transaction(reservation.reservation_id, 50, "2030-01-01", "迷你吧饮料")
+    hotel.add_transaction(reservation.reservation_id, 80, "2030-01-02", "洗衣服务")
+
+    assert [t.amount for t in hotel.search_transactions(keyword="迷你吧")] == [50]
+    assert [t.amount for t in hotel.search_transactions(keyword="张三")] == [80, 50]
+    assert [t.amount for t in hotel.search_transactions("2030-01-02", "2030-01-02")] == [80]
+    # FTS 查询语法不会被解释
+    assert hotel.search_transactions(keyword='"迷你" OR') == []
@@ -0,0 +1,198 @@
+import asyncio
+import socket
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import client
+import server
+import service
+from conftest import day
+from statuses import RoomStatus
+
+
+@pytest.fixture
+def server_url(db_path):
+    """在后台线程里运行 server.py，返回它的地址"""
+    started = threading.Event()
+    state = {}
+
+    def run():
+        async def main():
+            state["task"] = asyncio.current_task()
+            state["loop"] = asyncio.get_running_loop()
+            await server.serve("127.0.0.1", 0, readers=2, ready=lambda port: (state.update(port=port),
+                                                                             started.set()))
+        try:
+            asyncio.run(main())
+        except asyncio.CancelledError:
+            pass
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    assert started.wait(5)
+    yield f"http://127.0.0.1:{state['port']}"
+    state["loop"].call_soon_threadsafe(state["task"].cancel)
+    thread.join(5)
+
+
+@pytest.fixture
+def remote(server_url):
+    """以管理员身份登录的 RemoteService"""
+    remote = client.RemoteService(server_url)
+    remote.authenticate("admin", "admin123", "admin")
+    return remote
+
+
+@pytest.fixture
+def frontdesk(server_url, remote):
+    remote.add_user("front", "front123", "frontdesk")
+    frontdesk = client.RemoteService(server_url)
+    frontdesk.authenticate("front", "front123")
+    return frontdesk
+
+
+def test_round_trip(remote):
+    room = remote.add_room(101, "标准间", 200, "已清洁")
+    assert isinstance(room, service.Room)
+    customer = remote.add_customer("张三", "13800000001", "110101199001010011")
+    reservation = remote.create_reservation(101, customer.customer_id, day(0), day(2))
+    assert isinstance(reservation, service.Reservation)
+    assert remote.get_room(101).status == RoomStatus.RESERVED
+
+    rooms = remote.room_list()
+    assert rooms.count() == 1
+    assert [r.room_number for r in rooms.all()] == [101]
+
+
+@pytest.mark.parametrize("call, error", [
+    (lambda remote: remote.get_room(999), service.NotFound),
+    (lambda remote: remote.add_room("abc", "标准间", 200, "已清洁"), service.ValidationError),
+    (lambda remote: remote.delete_user(1, current_user_id=1), service.PermissionDenied),
+])
+def test_errors_map_to_service_exceptions(remote, call, error):
+    with pytest.raises(error) as info:
+        call(remote)
+    assert str(info.value)
+
+
+def test_conflict(remote):
+    remote.add_room(101, "标准间", 200, "已清洁")
+    customer = remote.add_customer("张三", "13800000001", "110101199001010011")
+    remote.create_reservation(101, customer.customer_id, day(0), day(2))
+    with pytest.raises(service.Conflict):
+        remote.create_reservation(101, customer.customer_id, day(1), day(3))
+
+
+def test_write_after_idle_connection_closed(remote, monkeypatch):
+    monkeypatch.setattr(server, "READ_TIMEOUT", 0.2)
+    remote.list_rooms()
+    time.sleep(0.5)  # 服务器关掉了这条空闲连接
+    assert remote.add_room(101, "标准间", 200, "已清洁").room_number == 101
+
+
+def test_requires_login(server_url):
+    anonymous = client.RemoteService(server_url)
+    with pytest.raises(service.PermissionDenied):
+        anonymous.list_rooms()
+    with pytest.raises(service.PermissionDenied):
+        anonymous.add_user("intruder", "secret", "admin")
+    with pytest.raises(service.PermissionDenied):
+        anonymous.authenticate("admin", "wrong", "admin")
+    with pytest.raises(service.PermissionDenied):
+        anonymous.list_rooms()
+
+    # 伪造的会话号也不行
+    anonymous._session = "forged"
+    with pytest.raises(service.PermissionDenied):
+        anonymous.list_rooms()
+
+
+@pytest.mark.parametrize("call", [
+    lambda remote: remote.add_user("intruder", "secret", "admin"),
+    lambda remote: remote.update_user(1, "frontdesk"),
+    lambda remote: remote.delete_user(1, current_user_id=2),
+    lambda remote: remote.list_users(),
+    lambda remote: remote.night_audit(),
+])
+def test_admin_only(frontdesk, call):
+    with pytest.raises(service.PermissionDenied):
+        call(frontdesk)
+
+
+def test_frontdesk_can_work(frontdesk):
+    assert frontdesk.add_room(101, "标准间", 200, "已清洁").room_number == 101
+    assert [room.room_number for room in frontdesk.list_rooms()] == [101]
+
+
+def test_session_arguments_come_from_server(remote, db_path):
+    # 客户端声称自己是别的用户也删不掉当前登录的管理员
+    with pytest.raises(service.PermissionDenied):
+        remote.delete_user(1, current_user_id=999)
+    audit = remote.night_audit(day(-1), "someone else")
+    with sqlite3.connect(db_path) as conn:
+        assert conn.execute("SELECT audited_by FROM night_audits WHERE business_date = ?",
+                            (audit.business_date,)).fetchone() == ("admin",)
+
+
+def test_changed_user_logged_out(remote, frontdesk):
+    user = next(user for user in remote.list_users() if user.username == "front")
+    remote.update_user(user.user_id, "frontdesk", password="changed123")
+    with pytest.raises(service.PermissionDenied):
+        frontdesk.list_rooms()
+    frontdesk.authenticate("front", "changed123")
+    assert frontdesk.list_rooms() == []
+
+
+def test_deleted_user_logged_out(remote, frontdesk):
+    user = next(user for user in remote.list_users() if user.username == "front")
+    remote.delete_user(user.user_id)
+    with pytest.raises(service.PermissionDenied):
+        frontdesk.list_rooms()
+
+
+def test_unreachable_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    with pytest.raises(client.Unavailable):
+        client.RemoteService(f"http://127.0.0.1:{port}").list_rooms()
+
+
+@pytest.fixture
+def dropping_server():
+    """读完请求就断开连接、不回应的服务器，返回 (地址, 收到的请求数)"""
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    received = []
+
+    def run():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            with conn:
+                if conn.recv(65536):
+                    received.append(1)
+
+    threading.Thread(target=run, daemon=True).start()
+    yield f"http://127.0.0.1:{listener.getsockname()[1]}", received
+    listener.close()
+
+
+def test_write_not_resent_after_disconnect(dropping_server):
+    url, received = dropping_server
+    with pytest.raises(client.Unavailable):
+        client.RemoteService(url).create_reservation(101, 1, day(0), day(2))
+    assert len(received) == 1
+
+
+def test_read_resent_after_disconnect(dropping_server):
+    url, received = dropping_server
+    with pytest.raises(client.Unavailable):
+        client.RemoteService(url).list_rooms()
+    assert len(received) == 2
@@ -0,0 +1,253 @@
+import tkinter as tk
+from tkinter import ttk
+
+import paging
+
+# ==== 虚拟列表 ====
+# 列表窗口不再把整张表 fetchall() 后逐行 insert：VirtualTreeview 只保留当前位置附近的几页记录，
+# 滚动接近已加载部分的首尾时，从首行或末行的游标继续按键集分页取下一页，并丢掉另一头多出的行。
+# 点击列标题按该列在数据库端重新排序（再点一次倒序），排序后从第一页重新加载。
+#
+# 数据来源是 service 的 PagedList（或任何提供 fetch/all/sorts/default_sort/default_descending 的对象）。
+# 其余用法与 ttk.Treeview 相同：selection()、item()、bind()、delete() 都可以照常使用。
+# 给出 worker（dbworker.DbWorker）时取数在后台线程中进行，界面不会因为查询卡住；
+# 重新加载时还没返回的旧请求会被取消，结果也会被丢弃。
+#
+# 数据变了以后调用 refresh(keys) 只重读这几条记录（按唯一键，见 PagedList.fetch_keys）：
+# 已显示的行就地更新，排序位置变了的挪到新位置，不再符合筛选条件的删掉，
+# 新记录落在已加载的范围内时插到对应位置（在范围外的等滚动到那里时自然会取到）。
+
+SORT_ARROWS = {False: " ▲", True: " ▼"}
+
+
+class VirtualTreeview(ttk.Treeview):
+    """按需分页加载的 Treeview
+
+    source      PagedList，可以之后再用 load() 指定
+    format_row  把一条记录转换为显示的 values，默认原样显示
+    max_pages   最多同时保留的页数
+    worker      可选的 DbWorker，给出时在后台取数
+    on_loaded   每次 load() 的第一页显示出来后调用
+    """
+
+    def __init__(self, master, columns, source=None, format_row=tuple, page_size=paging.PAGE_SIZE,
+                 max_pages=3, worker=None, on_loaded=None, **kw):
+        self._yscrollcommand = kw.pop("yscrollcommand", None)
+        kw.setdefault("show", "headings")
+        super().__init__(master, columns=columns, yscrollcommand=self._on_yscroll, **kw)
+        self.format_row = format_row
+        self.page_size = page_size
+        self.max_rows = page_size * max_pages
+        self.worker = worker
+        self.on_loaded = on_loaded
+        self.source = None
+        self.sort = None
+        self.descending = False
+        self._cursors = {}  # 行ID -> 游标
+        self._more_before = False
+        self._more_after = False
+        self._check_pending = None
+        self._job = None  # 进行中的取数任务
+        self._titles = {}
+        if source is not None:
+            self.load(source)
+
+    def configure(self, cnf=None, **kw):
+        # 滚动条的 set 由 _on_yscroll 转发，Treeview 自己的回调保持不变
+        if cnf and "yscrollcommand" in cnf:
+            cnf = dict(cnf)
+            self._yscrollcommand = cnf.pop("yscrollcommand")
+        if "yscrollcommand" in kw:
+            self._yscrollcommand = kw.pop("yscrollcommand")
+        return super().configure(cnf, **kw)
+
+    config = configure
+
+    def delete(self, *items):
+        for item in items:
+            self._cursors.pop(item, None)
+        super().delete(*items)
+
+    # ---- 加载 ----
+
+    def load(self, source=None):
+        """切换数据来源（例如筛选条件改变后）并从第一页重新加载；不给 source 时刷新当前数据"""
+        if source is not None:
+            if self.source is None or self.sort not in source.sorts:
+                self.sort = source.default_sort
+                self.descending = source.default_descending
+            self.source = source
+        self._update_headings()
+
+        super().delete(*self.get_children())
+        self._cursors.clear()
+        self._more_before = False
+        self._more_after = False
+        self._request(self._fetch, self._show_first)
+
+    def _show_first(self, page):
+        self._insert(page, tk.END)
+        self._more_after = page.more
+        self.yview_moveto(0)
+        if self.on_loaded:
+            self.on_loaded()
+
+    def refresh(self, keys=None):
+        """局部刷新 keys（唯一键的集合）对应的行；keys 为 None 时整体重新加载"""
+        if self.source is None:
+            return
+        if keys is None:
+            self.load()
+            return
+        if self._job is not None:
+            # 正在翻页或重新加载，等取完再刷新，免得刚取到的旧页盖掉刷新结果
+            self.after(100, lambda: self.refresh(keys))
+            return
+        keys = list(keys)
+        fetch = lambda: self.source.fetch_keys(keys, self.sort)
+        if self.worker is None:
+            self._patch(keys, fetch())
+            return
+        self.worker.submit(fetch, on_done=lambda page: self._patch(keys, page), owner=self)
+
+    def _order(self, cursor):
+        """游标的排序键，与 paging 的排序一致：升序时排序值为 NULL 的在前"""
+        value, key = cursor
+        return (value is not None, value if value is not None else 0, key)
+
+    def _patch(self, keys, page):
+        items = {cursor[1]: item for item, cursor in self._cursors.items()}
+        fresh = {cursor[1]: (row, cursor) for row, cursor in zip(page.rows, page.cursors)}
+        children = self.get_children()
+        top = round(self.yview()[0] * len(children)) if children else 0
+
+        for key in keys:
+            item = items.get(key)
+            if item is None:
+                continue
+            if key in fresh and fresh[key][1] == self._cursors[item]:
+                # 排序位置不变：原地更新，选中状态保持
+                self.item(item, values=self.format_row(fresh.pop(key)[0]))
+            else:
+                if self.index(item) < top:
+                    top -= 1
+                self.delete(item)
+
+        # 剩下的是新记录或排序位置变了的记录
+        orders = [self._order(self._cursors[child]) for child in self.get_children()]
+        for row, cursor in fresh.values():
+            order = self._order(cursor)
+            position = next((i for i, other in enumerate(orders)
+                             if (other < order if self.descending else other > order)), len(orders))
+            if (position == 0 and self._more_before) or (position == len(orders) and self._more_after):
+                continue
+            item = self.insert("", position, values=self.format_row(row))
+            self._cursors[item] = cursor
+            orders.insert(position, order)
+            if position < top:
+                top += 1
+        if orders:
+            self.yview_moveto(top / len(orders))
+
+    def sort_by(self, column):
+        """按列排序，再次点击同一列时切换升序/降序"""
+        if column == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort = column
+            self.descending = False
+        self.load()
+
+    def all_rows(self):
+        """按当前排序遍历全部记录（不只是已加载的部分）"""
+        return self.source.all(self.sort, self.descending)
+
+    def _request(self, fetch, on_done):
+        """取一页：有 worker 时在后台执行，结果回到界面线程后调用 on_done(page)"""
+        if self._job is not None:
+            self._job.cancel()
+            self._job = None
+        if self.worker is None:
+            on_done(fetch())
+            return
+
+        def done(page):
+            self._job = None
+            on_done(page)
+
+        def failed(error):
+            self._job = None
+            if self.worker.on_error is None:
+                raise error
+            self.worker.on_error(error)
+
+        self._job = self.worker.submit(fetch, on_done=done, on_error=failed, owner=self, busy=self)
+
+    def _fetch(self, after=None, before=None):
+        return self.source.fetch(self.sort, self.descending, after=after, before=before, limit=self.page_size)
+
+    def _insert(self, page, index):
+        for offset, (row, cursor) in enumerate(zip(page.rows, page.cursors)):
+            position = index if index == tk.END else index + offset
+            item = self.insert("", position, values=self.format_row(row))
+            self._cursors[item] = cursor
+
+    def _update_headings(self):
+        for column in self["columns"]:
+            title = self._titles.setdefault(column, self.heading(column, "text"))
+            if column in self.source.sorts:
+                arrow = SORT_ARROWS[self.descending] if column == self.sort else ""
+                self.heading(column, text=title + arrow, command=lambda c=column: self.sort_by(c))
+
+    # ---- 滚动 ----
+
+    def _on_yscroll(self, first, last):
+        if self._yscrollcommand:
+            self._yscrollcommand(first, last)
+        if self._check_pending is None:
+            self._check_pending = self.after_idle(self._check_edges)
+
+    def _check_edges(self):
+        """可见区域离已加载部分的首尾不足半页时，向该方向再加载一页"""
+        self._check_pending = None
+        children = self.get_children()
+        if not children or self._job is not None:
+            return
+        first, last = self.yview()
+        margin = self.page_size // 2
+        if self._more_after and last * len(children) >= len(children) - margin:
+            self._extend(children, forward=True)
+        elif self._more_before and first * len(children) <= margin:
+            self._extend(children, forward=False)
+
+    def _extend(self, children, forward):
+        if forward:
+            fetch = lambda cursor=self._cursors[children[-1]]: self._fetch(after=cursor)
+        else:
+            fetch = lambda cursor=self._cursors[children[0]]: self._fetch(before=cursor)
+        self._request(fetch, lambda page: self._append(page, forward))
+
+    def _append(self, page, forward):
+        children = self.get_children()
+        top = round(self.yview()[0] * len(children))
+        if forward:
+            self._more_after = page.more
+            self._insert(page, tk.END)
+        else:
+            self._more_before = page.more
+            self._insert(page, 0)
+            top += len(page.rows)
+
+        # 丢掉另一头超出 max_rows 的行，并保持可见区域的内容不动
+        children = self.get_children()
+        excess = len(children) - self.max_rows
+        if excess > 0:
+            if forward:
+                self.delete(*children[:excess])
+                self._more_before = True
+                top -= excess
+            else:
+                self.delete(*children[-excess:])
+                self._more_after = True
+        self.yview_moveto(top / max(len(self.get_children()), 1))
+# ==== 结束 ====
@@ -1,101 +1,56 @@
+import startup  # 最先导入，从这里开始计时（--profile-startup）
+
 import sqlite3
 import tkinter as tk
 from tkinter import ttk, messagebox, simpledialog
-import hashlib
 from datetime import datetime, timedelta
 
-import ai4,lo
+# ai4（连带 requests 和 SSL）、PIL、matplotlib 都在第一次用到时才导入，不拖慢启动
+import lo
+import bulk_import
+import dates
+import dbworker
+import events
+import export
+import ledger
+import migrations
+import room_rack
+import service
+import statuses
+from autocomplete import Autocomplete
+from virtual_tree import VirtualTreeview
+from statuses import ReservationStatus
 
 
 # ==== 数据库====
 def init_db():
-    conn = sqlite3.connect('hotel.db')
-    cursor = conn.cursor()
-    # 创建 users 表
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT UNIQUE,
-            password_hash TEXT,
-            role TEXT
-        )
-    ''')
-    # 默认 admin 账户
-    cursor.execute("SELECT COUNT(*) FROM users WHERE role = 'admin'")
-    count = cursor.fetchone()[0]
-    if count == 0:
-        password_hash = hashlib.sha256("admin123".encode()).hexdigest()
-        cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                       ("admin", password_hash, "admin"))
-        conn.commit()
-    conn.close()
+    # 建表、建索引统一由 migrations 按版本执行，已是最新版本时不做任何事
+    migrations.migrate()
 # ==== 结束 ====
 
 # ==== HotelManagementSystem ====
 class HotelManagementSystem:
-    def __init__(self, root, user):
+    def __init__(self, root, user, hotel_service=None):
         self.root = root
         self.root.title("酒店住房管理系统")
         self.root.geometry("1000x600")
         self.current_user = user
-        self.conn = sqlite3.connect('hotel.db')
-        self.create_tables()
+        # 客户端模式（--server）下传入 client.RemoteService，所有业务操作由服务器执行
+        self.local = hotel_service is None
+        self.service = hotel_service or service.HotelService()
+        # 列表、统计、导出等耗时的查询交给后台线程，界面不会卡住
+        self.worker = dbworker.DbWorker(root, on_error=self.show_error)
+        # 数据变更通知：打开着的列表窗口只刷新变了的行（客户端模式下没有本地数据库，不启用）
+        self.bus = events.ChangeBus(root, on_error=self.show_error) if self.local else None
+        self.room_states = {}
         self.setup_ui()
-        self.update_status(f"欢迎，{user['username']} ({user['role']})")
+        self.load_room_summary()
+        self.watch(events.ROOM, self.load_room_summary)
+        self.update_status(f"欢迎，{user['username']} ({user['role']})"
+                           + ("" if self.local else f"，已连接服务器 {self.service.url}"))
 
     def hash_password(self, password):
-        return hashlib.sha256(password.encode()).hexdigest()
-
-    def create_tables(self):
-        conn = sqlite3.connect('hotel.db')
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS rooms (
-                room_number INTEGER PRIMARY KEY,
-                room_type TEXT,
-                price REAL,
-                status TEXT,
-                clean_status TEXT
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS customers (
-                customer_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT,
-                contact TEXT,
-                id_card TEXT,
-                points INTEGER DEFAULT 0
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reservations (
-                reservation_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                room_number INTEGER,
-                customer_id INTEGER,
-                check_in_date TEXT,
-                check_out_date TEXT,
-                status TEXT,
-                FOREIGN KEY (room_number) REFERENCES rooms(room_number),
-                FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
-            )
-        ''')
-
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                transaction_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                reservation_id INTEGER,
-                amount REAL,
-                transaction_date TEXT,
-                description TEXT,
-                FOREIGN KEY (reservation_id) REFERENCES reservations(reservation_id)
-            )
-        ''')
-
-        conn.commit()
-        conn.close()
+        return service.hash_password(password)
 
     def setup_ui(self):
         # 设置窗口风格和主题色
@@ -141,9 +96,13 @@ class HotelManagementSystem:
         ttk.Label(user_info_frame, text=f"用户角色: {role_text}",
                   font=("Arial", 12)).pack(pady=5)
 
+        # 房态概览，房间有变化时只重读变了的房间
+        self.room_summary_label = ttk.Label(user_info_frame, text="房态: 加载中...", font=("Arial", 11))
+        self.room_summary_label.pack(pady=5)
+
         # 功能按钮区域（直接放在欢迎界面下方）
         modules_container = ttk.Frame(main_container, padding=10)
-        modules_container.pack(fill=tk.BOTH, expand=True, pady=10)
+        modules_container.pack(fill=tk.X, pady=10)
 
         # 按钮样式
         button_style = {
@@ -195,6 +154,8 @@ class HotelManagementSystem:
                                                                                                             pady=3)
         tk.Button(reservation_frame, text="查看预订列表", command=self.view_reservations, **button_style).pack(
             fill=tk.X, pady=3)
+        tk.Button(reservation_frame, text="空房查询", command=self.search_available_rooms, **button_style).pack(
+            fill=tk.X, pady=3)
 
         # 4. 入住退房模块
         check_frame = ttk.Frame(modules_container, padding=10, borderwidth=1, relief=tk.GROOVE)
@@ -219,6 +180,7 @@ class HotelManagementSystem:
                                                                                                              pady=3)
             tk.Button(finance_frame, text="查看交易记录", command=self.view_transactions, **button_style).pack(
                 fill=tk.X, pady=3)
+            tk.Button(finance_frame, text="夜审", command=self.night_audit, **button_style).pack(fill=tk.X, pady=3)
 
             # 6. 系统管理模块
             system_frame = ttk.Frame(modules_container, padding=10, borderwidth=1, relief=tk.GROOVE)
@@ -231,6 +193,7 @@ class HotelManagementSystem:
                                                                                                         pady=3)
             tk.Button(system_frame, text="查看用户列表", command=self.view_users, **button_style).pack(fill=tk.X,
                                                                                                        pady=3)
+            tk.Button(system_frame, text="批量导入", command=self.bulk_import, **button_style).pack(fill=tk.X, pady=3)
         else:
             # 非管理员可以看到的其他功能（保持界面平衡）
             file_frame = ttk.Frame(modules_container, padding=10, borderwidth=1, relief=tk.GROOVE)
@@ -250,6 +213,24 @@ class HotelManagementSystem:
                       bg="#e74c3c", fg="white",
                       activebackground="#c0392b", activeforeground="white").pack(pady=3)
 
+        # 房态看板：按房间号排列的色块，只重画变了的房间；双击房间新增该房间的预订
+        rack_frame = ttk.Frame(main_container, padding=(10, 0, 10, 10))
+        rack_frame.pack(fill=tk.BOTH, expand=True)
+        legend = ttk.Frame(rack_frame)
+        legend.pack(fill=tk.X, pady=(0, 5))
+        ttk.Label(legend, text="房态看板", font=("Arial", 12, "bold")).pack(side=tk.LEFT, padx=(0, 15))
+        for status, color in room_rack.STATUS_COLORS.items():
+            tk.Label(legend, text="  ", bg=color, relief=tk.SOLID, borderwidth=1).pack(side=tk.LEFT)
+            ttk.Label(legend, text=status.label).pack(side=tk.LEFT, padx=(3, 12))
+        ttk.Label(legend, text="底边深色：未清洁").pack(side=tk.LEFT)
+        self.room_rack = room_rack.RoomRack(rack_frame, self.service, self.worker, bus=self.bus, height=200,
+                                            on_open=lambda room: self.add_reservation(room_number=room.room_number),
+                                            on_error=self.show_error)
+        rack_scrollbar = ttk.Scrollbar(rack_frame, orient='vertical', command=self.room_rack.yview)
+        rack_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.room_rack.configure(yscrollcommand=rack_scrollbar.set)
+        self.room_rack.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
         # 状态栏，使用灰色背景和细边框
         status_frame = ttk.Frame(self.root, relief=tk.GROOVE, borderwidth=1)
         status_frame.pack(side=tk.BOTTOM, fill=tk.X)
@@ -274,6 +255,7 @@ class HotelManagementSystem:
     def call_ai_function(self):
         # 导入py文件中的m函数
         try:
+            import ai4
             # 调用函数并获取结果
             result = ai4.start()
             # 可以在这里处理结果，例如显示在状态栏或弹窗中
@@ -286,10 +268,46 @@ class HotelManagementSystem:
             self.status_bar.config(text=f"AI调用错误: {str(e)}")
             print(f"AI调用错误: {str(e)}")
 
+    def show_error(self, error):
+        """后台任务出错时的默认提示"""
+        if isinstance(error, service.ServiceError):
+            messagebox.showerror("错误", str(error))
+        elif isinstance(error, sqlite3.Error):
+            messagebox.showerror("数据库错误", f"读取数据失败: {str(error)}")
+        else:
+            messagebox.showerror("错误", f"操作失败: {str(error)}")
+
     def update_status(self, message):
         self.status_bar.config(text=message)
         self.root.update_idletasks()
 
+    def watch(self, kind, callback, owner=None):
+        """订阅 kind（events.ROOM 等）的变更：callback(keys)，keys 为 None 时表示需要整体重新加载"""
+        if self.bus is not None:
+            self.bus.subscribe(kind, callback, owner)
+
+    def load_room_summary(self, keys=None):
+        """主界面的房态概览：keys 给出时只重读这几个房间（读房间缓存），否则在后台读全部房间"""
+        if keys is None:
+            def loaded(rooms):
+                self.room_states = {room.room_number: room.status for room in rooms}
+                self.show_room_summary()
+            self.worker.submit(self.service.list_rooms, on_done=loaded)
+            return
+        for room_number in keys:
+            try:
+                self.room_states[room_number] = self.service.get_room(room_number).status
+            except service.NotFound:
+                self.room_states.pop(room_number, None)
+        self.show_room_summary()
+
+    def show_room_summary(self):
+        counts = {status: 0 for status in statuses.RoomStatus}
+        for status in self.room_states.values():
+            counts[status] = counts.get(status, 0) + 1
+        parts = " · ".join(f"{status.label} {counts[status]}" for status in statuses.RoomStatus)
+        self.room_summary_label.config(text=f"房态: {parts}（共 {len(self.room_states)} 间）")
+
     # 功能方法
     def add_room(self):
         # 创建添加房间的顶层窗口
@@ -318,52 +336,17 @@ class HotelManagementSystem:
         clean_status_entry.grid(row=3, column=1, padx=5, pady=5)
 
         def save_room():
-            room_number = room_number_entry.get()
-            room_type = room_type_entry.get()
-            price = price_entry.get()
-            clean_status = clean_status_entry.get()
-
-            # 校验必填项
-            if not (room_number and room_type and price and clean_status):
-                messagebox.showerror("错误", "房间号、房间类型、价钱、清洁状态均为必填项")
-                return
-
-            # 校验房间号为整数
-            if not room_number.isdigit():
-                messagebox.showerror("错误", "房间号必须为整数")
-                return
-
-            # 校验价钱为数字
             try:
-                float(price)
-            except ValueError:
-                messagebox.showerror("错误", "价钱必须为有效数字（如：300.0）")
+                self.service.add_room(room_number_entry.get(), room_type_entry.get(), price_entry.get(),
+                                      clean_status_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
                 return
-
-            try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-
-                # 检查房间号是否已存在
-                cursor.execute("SELECT * FROM rooms WHERE room_number = ?", (room_number,))
-                if cursor.fetchone():
-                    messagebox.showerror("错误", "该房间号已存在")
-                    return
-
-                # 插入房间数据，使用用户输入的清洁状态
-                cursor.execute(
-                    "INSERT INTO rooms (room_number, room_type, price, status, clean_status) "
-                    "VALUES (?, ?, ?, '空闲', ?)",
-                    (room_number, room_type, price, clean_status)
-                )
-                conn.commit()
-                messagebox.showinfo("成功", "房间添加成功")
-                add_room_win.destroy()
             except Exception as e:
                 messagebox.showerror("错误", f"添加失败：{str(e)}")
-            finally:
-                if 'conn' in locals():
-                    conn.close()
+                return
+            messagebox.showinfo("成功", "房间添加成功")
+            add_room_win.destroy()
 
         ttk.Button(add_room_win, text="保存", command=save_room).grid(row=4, column=0, columnspan=2, pady=10)
 
@@ -379,34 +362,19 @@ class HotelManagementSystem:
         room_number_entry.grid(row=0, column=1, padx=5, pady=5)
 
         def query_room():
-            room_number = room_number_entry.get()
-            if not room_number.isdigit():
-                messagebox.showerror("错误", "请输入有效的房间号（整数）")
+            try:
+                room = self.service.get_room(room_number_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
                 return
 
-            try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute(
-                    "SELECT room_type, price, status, clean_status FROM rooms WHERE room_number = ?",
-                    (room_number,)
-                )
-                result = cursor.fetchone()
-
-                if result:
-                    # 填充现有数据到输入框
-                    room_type_entry.delete(0, tk.END)
-                    room_type_entry.insert(0, result[0])
-                    price_entry.delete(0, tk.END)
-                    price_entry.insert(0, result[1])
-                    # 修复：添加清洁状态的填充
-                    clean_status_entry.delete(0, tk.END)
-                    clean_status_entry.insert(0, result[3])
-                else:
-                    messagebox.showerror("错误", "未找到该房间号对应的房间")
-            finally:
-                if 'conn' in locals():
-                    conn.close()
+            # 填充现有数据到输入框
+            room_type_entry.delete(0, tk.END)
+            room_type_entry.insert(0, room.room_type)
+            price_entry.delete(0, tk.END)
+            price_entry.insert(0, room.price)
+            clean_status_entry.delete(0, tk.END)
+            clean_status_entry.insert(0, room.clean_status)
 
         ttk.Button(modify_room_win, text="查询", command=query_room).grid(row=0, column=2, padx=5, pady=5)
 
@@ -426,45 +394,17 @@ class HotelManagementSystem:
         clean_status_entry.grid(row=3, column=1, padx=5, pady=5)
 
         def save_modification():
-            room_number = room_number_entry.get()
-            if not room_number.isdigit():
-                messagebox.showerror("错误", "请输入有效的房间号（整数）")
-                return
-
-            room_type = room_type_entry.get()
-            price = price_entry.get()
-            clean_status = clean_status_entry.get()  # 获取清洁状态
-
-            # 校验所有必填项
-            if not (room_type and price and clean_status):
-                messagebox.showerror("错误", "房间类型、价钱和清洁状态均为必填项")
-                return
-
             try:
-                float(price)  # 校验价钱格式
-            except ValueError:
-                messagebox.showerror("错误", "价钱必须为有效数字（如：300.0）")
+                self.service.update_room(room_number_entry.get(), room_type_entry.get(), price_entry.get(),
+                                         clean_status_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
                 return
-
-            try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                # 更新房间信息，包括清洁状态
-                cursor.execute(
-                    "UPDATE rooms SET room_type = ?, price = ?, clean_status = ? WHERE room_number = ?",
-                    (room_type, price, clean_status, room_number)
-                )
-                if cursor.rowcount == 0:
-                    messagebox.showerror("错误", "未找到该房间号对应的房间，修改失败")
-                else:
-                    conn.commit()
-                    messagebox.showinfo("成功", "房间信息修改成功")
-                    modify_room_win.destroy()
             except Exception as e:
                 messagebox.showerror("错误", f"修改失败：{str(e)}")
-            finally:
-                if 'conn' in locals():
-                    conn.close()
+                return
+            messagebox.showinfo("成功", "房间信息修改成功")
+            modify_room_win.destroy()
 
         ttk.Button(modify_room_win, text="保存修改", command=save_modification).grid(row=4, column=0, columnspan=2,
                                                                                      pady=10)
@@ -475,9 +415,11 @@ class HotelManagementSystem:
         view_rooms_win.title("房间列表")
         view_rooms_win.geometry("1000x600")
 
-        # 创建树状视图展示房间数据
-        tree = ttk.Treeview(view_rooms_win, columns=("房间号", "房间类型", "价钱", "状态", "清洁状态"),
-                            show='headings', selectmode='browse')
+        # 创建树状视图展示房间数据（按需分页加载，点击列标题排序）
+        tree = VirtualTreeview(view_rooms_win, columns=("房间号", "房间类型", "价钱", "状态", "清洁状态"),
+                               format_row=lambda room: (room.room_number, room.room_type, room.price,
+                                                        room.status_label, room.clean_status),
+                               selectmode='browse', worker=self.worker)
         tree.heading("房间号", text="房间号")
         tree.heading("房间类型", text="房间类型")
         tree.heading("价钱", text="价钱(元)")
@@ -490,17 +432,9 @@ class HotelManagementSystem:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         tree.configure(yscrollcommand=scrollbar.set)
 
-        try:
-            conn = sqlite3.connect('hotel.db')
-            cursor = conn.cursor()
-            # 查询房间表的所有字段
-            cursor.execute("SELECT room_number, room_type, price, status, clean_status FROM rooms")
-            results = cursor.fetchall()
-            for row in results:
-                tree.insert('', tk.END, values=row)
-        finally:
-            if 'conn' in locals():
-                conn.close()
+        tree.load(self.service.room_list())
+        # 房间有变化（包括其他终端）时只刷新变了的行
+        self.watch(events.ROOM, tree.refresh, owner=tree)
 
 
     # 客户管理相关实现
@@ -525,40 +459,23 @@ class HotelManagementSystem:
         id_card_entry = ttk.Entry(add_customer_win)
         id_card_entry.grid(row=2, column=1, padx=5, pady=5)
 
-        def check_id(sid):
-            import re
-            pattern = r'^[1-9]\d{5}(18|19|([23]\d))\d{2}((0[1-9])|(10|11|12))(([0-2][1-9])|10|20|30|31)\d{3}[0-9Xx]$'
-            if re.match(pattern, sid):
-                return True
-            else:
-                return False
-
         def save_customer():
             name = name_entry.get()
             contact = contact_entry.get()
             id_card = id_card_entry.get()
 
-            if not (name and contact and id_card):
-                messagebox.showerror("错误", "姓名、联系方式、身份证号均为必填项")
-                return
-
-            if not check_id(id_card):
+            if name and contact and id_card and not service.check_id(id_card):
                 messagebox.showwarning("警告", "请正确输入身份证号！")
                 id_card_entry.delete(0, tk.END)
                 return
 
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute("INSERT INTO customers (name, contact, id_card) VALUES (?, ?, ?)",
-                               (name, contact, id_card))
-                conn.commit()
-                messagebox.showinfo("成功", "客户添加成功")
-                add_customer_win.destroy()
-            except sqlite3.IntegrityError:
-                messagebox.showerror("错误", "该身份证号已存在")
-            finally:
-                conn.close()
+                self.service.add_customer(name, contact, id_card)
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
+            messagebox.showinfo("成功", "客户添加成功")
+            add_customer_win.destroy()
 
         ttk.Button(add_customer_win, text="保存", command=save_customer).grid(row=3, column=0, columnspan=2, pady=10)
 
@@ -568,35 +485,26 @@ class HotelManagementSystem:
         modify_customer_win.title("修改客户信息")
         modify_customer_win.geometry("400x250")
 
-        # 客户ID标签与输入框，用于查询要修改的客户
+        # 客户ID标签与输入框，用于查询要修改的客户（也可以输入姓名、联系方式或身份证号查找）
         ttk.Label(modify_customer_win, text="客户ID:").grid(row=0, column=0, padx=5, pady=5, sticky=tk.W)
         customer_id_entry = ttk.Entry(modify_customer_win)
         customer_id_entry.grid(row=0, column=1, padx=5, pady=5)
 
         def query_customer():
-            customer_id = customer_id_entry.get()
-            if not customer_id.isdigit():
-                messagebox.showerror("错误", "请输入有效的客户ID")
-                return
-            try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT name, contact, id_card FROM customers WHERE customer_id = ?",
-                               (customer_id,))
-                result = cursor.fetchone()
-                if result:
-                    name_entry.delete(0, tk.END)
-                    name_entry.insert(0, result[0])
-                    contact_entry.delete(0, tk.END)
-                    contact_entry.insert(0, result[1])
-                    id_card_entry.delete(0, tk.END)
-                    id_card_entry.insert(0, result[2])
-                else:
-                    messagebox.showerror("错误", "未找到该客户ID对应的客户")
-            finally:
-                conn.close()
+            self.choose_customer(modify_customer_win, customer_id_entry.get(), show_customer)
+
+        def show_customer(customer):
+            customer_id_entry.delete(0, tk.END)
+            customer_id_entry.insert(0, customer.customer_id)
+            name_entry.delete(0, tk.END)
+            name_entry.insert(0, customer.name)
+            contact_entry.delete(0, tk.END)
+            contact_entry.insert(0, customer.contact)
+            id_card_entry.delete(0, tk.END)
+            id_card_entry.insert(0, customer.id_card)
 
         ttk.Button(modify_customer_win, text="查询", command=query_customer).grid(row=0, column=2, padx=5, pady=5)
+        self.suggest_customers(customer_id_entry, show_customer)
 
         # 姓名标签与输入框（查询后展示并可修改）
         ttk.Label(modify_customer_win, text="姓名:").grid(row=1, column=0, padx=5, pady=5, sticky=tk.W)
@@ -614,29 +522,14 @@ class HotelManagementSystem:
         id_card_entry.grid(row=3, column=1, padx=5, pady=5)
 
         def save_modification():
-            customer_id = customer_id_entry.get()
-            if not customer_id.isdigit():
-                messagebox.showerror("错误", "请输入有效的客户ID")
-                return
-            name = name_entry.get()
-            contact = contact_entry.get()
-            id_card = id_card_entry.get()
-            if not (name and contact and id_card):
-                messagebox.showerror("错误", "姓名、联系方式、身份证号均为必填项")
-                return
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute("UPDATE customers SET name = ?, contact = ?, id_card = ? WHERE customer_id = ?",
-                               (name, contact, id_card, customer_id))
-                if cursor.rowcount == 0:
-                    messagebox.showerror("错误", "未找到该客户ID对应的客户，修改失败")
-                else:
-                    conn.commit()
-                    messagebox.showinfo("成功", "客户信息修改成功")
-                    modify_customer_win.destroy()
-            finally:
-                conn.close()
+                self.service.update_customer(customer_id_entry.get(), name_entry.get(), contact_entry.get(),
+                                             id_card_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
+            messagebox.showinfo("成功", "客户信息修改成功")
+            modify_customer_win.destroy()
 
         ttk.Button(modify_customer_win, text="保存修改", command=save_modification).grid(row=4, column=0, columnspan=2,
                                                                                          pady=10)
@@ -647,9 +540,9 @@ class HotelManagementSystem:
         view_customers_win.title("客户列表")
         view_customers_win.geometry("1000x400")
 
-        # 创建树状视图展示客户数据
-        tree = ttk.Treeview(view_customers_win, columns=("客户ID", "姓名", "联系方式", "身份证号", "积分"),
-                            show='headings', selectmode='browse')
+        # 创建树状视图展示客户数据（按需分页加载，点击列标题排序）
+        tree = VirtualTreeview(view_customers_win, columns=("客户ID", "姓名", "联系方式", "身份证号", "积分"),
+                               selectmode='browse', worker=self.worker)
         tree.heading("客户ID", text="客户ID")
         tree.heading("姓名", text="姓名")
         tree.heading("联系方式", text="联系方式")
@@ -662,17 +555,54 @@ class HotelManagementSystem:
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         tree.configure(yscrollcommand=scrollbar.set)
 
+        tree.load(self.service.customer_list())
+
+    def suggest_customers(self, entry, on_pick):
+        """客户输入框的输入提示：按客户ID、姓名、电话或身份证号开头列出客户，选中后 on_pick(customer)"""
+        return Autocomplete(entry, self.service.suggest_customers,
+                            lambda c: f"{c.customer_id}  {c.name}  {c.contact}  {c.id_card}", on_pick)
+
+    def choose_customer(self, parent, keyword, on_pick):
+        """按客户ID、姓名、联系方式或身份证号查找客户，唯一匹配时直接 on_pick(customer)，多个匹配时让用户选择"""
         try:
-            conn = sqlite3.connect('hotel.db')
-            cursor = conn.cursor()
-            cursor.execute("SELECT * FROM customers")
-            results = cursor.fetchall()
-            for row in results:
-                tree.insert('', tk.END, values=row)
-        finally:
-            conn.close()
-
-    def add_reservation(self):
+            customers = self.service.search_customers(keyword)
+        except service.ServiceError as e:
+            messagebox.showerror("错误", str(e), parent=parent)
+            return
+        if not customers:
+            messagebox.showerror("错误", "未找到匹配的客户", parent=parent)
+            return
+        if len(customers) == 1:
+            on_pick(customers[0])
+            return
+
+        choose_win = tk.Toplevel(parent)
+        choose_win.title("选择客户")
+        choose_win.geometry("600x300")
+        choose_win.transient(parent)
+
+        columns = ("客户ID", "姓名", "联系方式", "身份证号")
+        tree = ttk.Treeview(choose_win, columns=columns, show='headings', selectmode='browse')
+        for column in columns:
+            tree.heading(column, text=column)
+        tree.column("客户ID", width=80)
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        for customer in customers:
+            tree.insert('', tk.END, iid=str(customer.customer_id), values=customer[:4])
+
+        by_id = {str(customer.customer_id): customer for customer in customers}
+
+        def pick(event=None):
+            selected = tree.selection()
+            if not selected:
+                return
+            choose_win.destroy()
+            on_pick(by_id[selected[0]])
+
+        tree.bind("<Double-1>", pick)
+        ttk.Button(choose_win, text="选择", command=pick).pack(pady=5)
+
+    def add_reservation(self, room_number=None, check_in_date=None, check_out_date=None):
         # 创建添加预订的顶层窗口
         add_reservation_win = tk.Toplevel(self.root)  # 这里假设类中有 self.root 表示主窗口，若不是这种结构，根据实际情况调整
         add_reservation_win.title("新增预订")
@@ -683,25 +613,17 @@ class HotelManagementSystem:
         customer_id_entry = ttk.Entry(add_reservation_win)
         customer_id_entry.grid(row=0, column=1, padx=5, pady=5)
 
-        # 查询客户按钮
+        # 查询客户按钮（也可以输入姓名、联系方式或身份证号查找）
         def query_customer():
-            customer_id = customer_id_entry.get()
-            if not customer_id.isdigit():
-                messagebox.showerror("错误", "请输入有效的客户ID")
-                return
-            try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT name FROM customers WHERE customer_id = ?", (customer_id,))
-                result = cursor.fetchone()
-                if result:
-                    customer_name_label.config(text=f"客户姓名: {result[0]}")
-                else:
-                    messagebox.showerror("错误", "未找到该客户ID对应的客户")
-            finally:
-                conn.close()
+            self.choose_customer(add_reservation_win, customer_id_entry.get(), show_customer)
+
+        def show_customer(customer):
+            customer_id_entry.delete(0, tk.END)
+            customer_id_entry.insert(0, customer.customer_id)
+            customer_name_label.config(text=f"客户姓名: {customer.name}")
 
         ttk.Button(add_reservation_win, text="查询客户", command=query_customer).grid(row=0, column=2, padx=5, pady=5)
+        self.suggest_customers(customer_id_entry, show_customer)
         customer_name_label = ttk.Label(add_reservation_win, text="客户姓名: ")
         customer_name_label.grid(row=1, column=0, columnspan=3, padx=5, pady=5, sticky=tk.W)
 
@@ -709,24 +631,17 @@ class HotelManagementSystem:
         ttk.Label(add_reservation_win, text="房间号:").grid(row=2, column=0, padx=5, pady=5, sticky=tk.W)
         room_number_entry = ttk.Entry(add_reservation_win)
         room_number_entry.grid(row=2, column=1, padx=5, pady=5)
+        if room_number is not None:
+            room_number_entry.insert(0, str(room_number))
 
         # 查询房间按钮
         def query_room():
-            room_number = room_number_entry.get()
-            if not room_number.isdigit():
-                messagebox.showerror("错误", "请输入有效的房间号")
-                return
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute("SELECT room_type, price, status FROM rooms WHERE room_number = ?", (room_number,))
-                result = cursor.fetchone()
-                if result:
-                    room_info_label.config(text=f"房间类型: {result[0]}, 价格: {result[1]}, 状态: {result[2]}")
-                else:
-                    messagebox.showerror("错误", "未找到该房间号对应的房间")
-            finally:
-                conn.close()
+                room = self.service.get_room(room_number_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
+            room_info_label.config(text=f"房间类型: {room.room_type}, 价格: {room.price}, 状态: {room.status_label}")
 
         ttk.Button(add_reservation_win, text="查询房间", command=query_room).grid(row=2, column=2, padx=5, pady=5)
         room_info_label = ttk.Label(add_reservation_win, text="房间信息: ")
@@ -736,141 +651,26 @@ class HotelManagementSystem:
         ttk.Label(add_reservation_win, text="入住日期:").grid(row=4, column=0, padx=5, pady=5, sticky=tk.W)
         check_in_entry = ttk.Entry(add_reservation_win)
         check_in_entry.grid(row=4, column=1, padx=5, pady=5)
-        check_in_entry.insert(0, datetime.now().strftime("%Y-%m-%d"))
+        check_in_entry.insert(0, check_in_date or datetime.now().strftime("%Y-%m-%d"))
 
         # 退房日期
         ttk.Label(add_reservation_win, text="退房日期:").grid(row=5, column=0, padx=5, pady=5, sticky=tk.W)
         check_out_entry = ttk.Entry(add_reservation_win)
         check_out_entry.grid(row=5, column=1, padx=5, pady=5)
-        check_out_entry.insert(0, (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"))
+        check_out_entry.insert(0, check_out_date or (datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"))
 
         def save_reservation():
-            customer_id = customer_id_entry.get()
-            room_number = room_number_entry.get()
-            check_in_date = check_in_entry.get()
-            check_out_date = check_out_entry.get()
-
-            if not (customer_id.isdigit() and room_number.isdigit()):
-                messagebox.showerror("错误", "客户ID和房间号必须为数字")
-                return
-
-            # 验证日期格式
             try:
-                datetime.strptime(check_in_date, "%Y-%m-%d")
-                datetime.strptime(check_out_date, "%Y-%m-%d")
-            except ValueError:
-                messagebox.showerror("错误", "日期格式不正确，请使用YYYY-MM-DD格式")
-                return
-
-            # 验证退房日期晚于入住日期
-            if check_out_date <= check_in_date:
-                messagebox.showerror("错误", "退房日期必须晚于入住日期")
+                self.service.create_reservation(room_number_entry.get(), customer_id_entry.get(),
+                                                check_in_entry.get(), check_out_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
                 return
-
-            try:
-                # 解析日期
-                in_date = datetime.strptime(check_in_date, "%Y-%m-%d")
-                out_date = datetime.strptime(check_out_date, "%Y-%m-%d")
-
-                # 检查日期合理性
-                if in_date >= out_date:
-                    messagebox.showerror("错误", "退房日期必须晚于入住日期")
-                    return
-
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-
-
-                # 检查房间是否存在
-                cursor.execute("SELECT room_number FROM rooms WHERE room_number = ?", (room_number,))
-                if not cursor.fetchone():
-                    messagebox.showerror("错误", "该房间不存在")
-                    return
-
-                # 检查房间状态
-
-                # 检查房间是否存在，修改为查询实际存在的字段，这里用 room_number 示例
-                cursor.execute("SELECT room_number FROM rooms WHERE room_number = ?", (room_number,))
-                room = cursor.fetchone()
-                if not room:
-                    messagebox.showerror("错误", "该房间不存在")
-                    conn.close()
-                    return
-
-                # 检查房间状态，假设数据库中“空闲”存的是中文“空闲”
-
-                cursor.execute("SELECT status FROM rooms WHERE room_number = ?", (room_number,))
-                room_status = cursor.fetchone()[0]
-                if room_status != '空闲':
-                    messagebox.showerror("错误", f"该房间当前状态为: {room_status}, 不可预订")
-                    return
-
-                # 检查日期冲突
-                cursor.execute("""
-                    SELECT COUNT(*) FROM reservations 
-                    WHERE room_number = ? 
-                    AND (
-                        (check_in_date < ? AND check_out_date > ?) OR  -- 新预订开始日期在已有预订期间
-                        (check_in_date < ? AND check_out_date > ?) OR  -- 新预订结束日期在已有预订期间
-                        (check_in_date >= ? AND check_out_date <= ?)   -- 新预订完全包含在已有预订期间
-                    )
-                """, (room_number,
-                      check_out_date, check_in_date,  # 第一个条件
-                      check_out_date, check_in_date,  # 第二个条件
-                      check_in_date, check_out_date))  # 第三个条件
-
-                conflict_count = cursor.fetchone()[0]
-                if conflict_count > 0:
-                    messagebox.showerror("错误", "该房间在所选日期已被预订")
-                    return
-                    conn.close()
-                    return
-
-                # 生成入住到退房期间的所有日期
-                date_range = [(in_date + timedelta(days=i)).strftime("%Y-%m-%d")
-                              for i in range((out_date - in_date).days)]
-
-                # 检查每一天是否已有预订
-                for date in date_range:
-                    cursor.execute("""
-                        SELECT COUNT(*) FROM reservations 
-                        WHERE room_number = ? 
-                        AND status != 'cancelled'
-                        AND (
-                            (check_in_date <= ? AND check_out_date > ?)
-                        )
-                    """, (room_number, date, date))
-
-                    conflict_count = cursor.fetchone()[0]
-                    if conflict_count > 0:
-                        messagebox.showerror("错误", f"该房间在 {date} 已有预订，无法重复预订")
-                        conn.close()
-                        return
-
-                # 添加预订
-                cursor.execute("""
-                    INSERT INTO reservations (room_number, customer_id, check_in_date, check_out_date, status)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (room_number, customer_id, check_in_date, check_out_date, "已预订"))
-
-                # 更新房间状态
-                # 更新房间状态为已预订（这里根据实际需求，比如改为 '已预订' 等，也得和表结构对应）
-                cursor.execute("UPDATE rooms SET status = '已预订' WHERE room_number = ?", (room_number,))
-
-                conn.commit()
-                messagebox.showinfo("成功", "预订添加成功")
-                add_reservation_win.destroy()
-                conn.close()
-            except ValueError as ve:
-                messagebox.showerror("错误", f"日期格式错误: {str(ve)}")
-                if 'conn' in locals():
-                    conn.close()
             except Exception as e:
                 messagebox.showerror("错误", f"添加预订失败: {str(e)}")
-                if 'conn' in locals():
-                    conn.close()
-
-                    # 新增“保存”按钮，绑定 save_reservation 函数
+                return
+            messagebox.showinfo("成功", "预订添加成功")
+            add_reservation_win.destroy()
 
         save_btn = ttk.Button(add_reservation_win, text="保存", command=save_reservation)
         save_btn.grid(row=6, column=0, columnspan=3, pady=10)
@@ -888,43 +688,30 @@ class HotelManagementSystem:
 
         # 查询预订按钮
         def query_reservation():
-            reservation_id = reservation_id_entry.get()
-            if not reservation_id.isdigit():
-                messagebox.showerror("错误", "请输入有效的预订ID")
-                return
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT r.reservation_id, r.room_number, r.customer_id, c.name, 
-                           r.check_in_date, r.check_out_date, r.status
-                    FROM reservations r
-                    JOIN customers c ON r.customer_id = c.customer_id
-                    WHERE r.reservation_id = ?
-                """, (reservation_id,))
-                result = cursor.fetchone()
-                if result:
-                    # 显示预订信息
-                    reservation_info_label.config(text=f"预订ID: {result[0]}, 房间号: {result[1]}, 客户: {result[3]}")
-
-                    # 设置各个字段的值
-                    room_number_entry.delete(0, tk.END)
-                    room_number_entry.insert(0, str(result[1]))
-
-                    customer_id_entry.delete(0, tk.END)
-                    customer_id_entry.insert(0, str(result[2]))
-
-                    check_in_entry.delete(0, tk.END)
-                    check_in_entry.insert(0, result[4])
-
-                    check_out_entry.delete(0, tk.END)
-                    check_out_entry.insert(0, result[5])
-
-                    status_var.set(result[6])
-                else:
-                    messagebox.showerror("错误", "未找到该预订ID对应的预订")
-            finally:
-                conn.close()
+                reservation = self.service.get_reservation(reservation_id_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
+
+            # 显示预订信息
+            reservation_info_label.config(text=f"预订ID: {reservation.reservation_id}, "
+                                               f"房间号: {reservation.room_number}, 客户: {reservation.customer_name}")
+
+            # 设置各个字段的值
+            room_number_entry.delete(0, tk.END)
+            room_number_entry.insert(0, str(reservation.room_number))
+
+            customer_id_entry.delete(0, tk.END)
+            customer_id_entry.insert(0, str(reservation.customer_id))
+
+            check_in_entry.delete(0, tk.END)
+            check_in_entry.insert(0, reservation.check_in_date)
+
+            check_out_entry.delete(0, tk.END)
+            check_out_entry.insert(0, reservation.check_out_date)
+
+            status_var.set(reservation.status_label)
 
         ttk.Button(modify_reservation_win, text="查询预订", command=query_reservation).grid(row=0, column=2, padx=5,
                                                                                             pady=5)
@@ -953,69 +740,28 @@ class HotelManagementSystem:
 
         # 状态
         ttk.Label(modify_reservation_win, text="状态:").grid(row=6, column=0, padx=5, pady=5, sticky=tk.W)
-        status_var = tk.StringVar(value="reserved")
-        ttk.Combobox(modify_reservation_win, textvariable=status_var,
-                     values=["reserved", "checked_in", "canceled", "completed"]).grid(row=6, column=1, padx=5, pady=5)
+        status_var = tk.StringVar(value=ReservationStatus.RESERVED.label)
+        ttk.Combobox(modify_reservation_win, textvariable=status_var, state="readonly",
+                     values=[s.label for s in ReservationStatus]).grid(row=6, column=1, padx=5, pady=5)
 
         def save_modification():
-            reservation_id = reservation_id_entry.get()
-            room_number = room_number_entry.get()
-            customer_id = customer_id_entry.get()
-            check_in_date = check_in_entry.get()
-            check_out_date = check_out_entry.get()
-            status = status_var.get()
-
-            if not (reservation_id.isdigit() and room_number.isdigit() and customer_id.isdigit()):
-                messagebox.showerror("错误", "ID和房间号必须为数字")
-                return
-            if not (check_in_date and check_out_date):
-                messagebox.showerror("错误", "日期不能为空")
+            status = statuses.reservation_from_label(status_var.get())
+            if status is None:
+                messagebox.showerror("错误", "请选择有效的预订状态")
                 return
 
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-
-                # 获取原始房间号
-                cursor.execute("SELECT room_number FROM reservations WHERE reservation_id = ?", (reservation_id,))
-                original_room = cursor.fetchone()
-                if not original_room:
-                    messagebox.showerror("错误", "未找到该预订")
-                    return
-
-                original_room_number = original_room[0]
-
-                # 如果房间号改变了，需要更新房间状态
-                if original_room_number != int(room_number):
-                    # 恢复原房间状态
-                    cursor.execute("UPDATE rooms SET status = 'available' WHERE room_number = ?",
-                                   (original_room_number,))
-
-                    # 检查新房间是否可用
-                    cursor.execute("SELECT status FROM rooms WHERE room_number = ?", (room_number,))
-                    new_room_status = cursor.fetchone()
-                    if not new_room_status or new_room_status[0] != "available":
-                        messagebox.showerror("错误", "新房间不可用")
-                        conn.rollback()
-                        return
-
-                    # 更新新房间状态
-                    cursor.execute("UPDATE rooms SET status = 'reserved' WHERE room_number = ?", (room_number,))
-
-                # 更新预订信息
-                cursor.execute("""
-                    UPDATE reservations 
-                    SET room_number = ?, customer_id = ?, check_in_date = ?, check_out_date = ?, status = ?
-                    WHERE reservation_id = ?
-                """, (room_number, customer_id, check_in_date, check_out_date, status, reservation_id))
-
-                conn.commit()
-                messagebox.showinfo("成功", "预订修改成功")
-                modify_reservation_win.destroy()
+                self.service.update_reservation(reservation_id_entry.get(), room_number_entry.get(),
+                                                customer_id_entry.get(), check_in_entry.get(),
+                                                check_out_entry.get(), status)
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
             except Exception as e:
                 messagebox.showerror("错误", f"修改预订失败: {str(e)}")
-            finally:
-                conn.close()
+                return
+            messagebox.showinfo("成功", "预订修改成功")
+            modify_reservation_win.destroy()
 
         ttk.Button(modify_reservation_win, text="保存修改", command=save_modification).grid(row=7, column=0,
                                                                                             columnspan=3, pady=10)
@@ -1027,31 +773,14 @@ class HotelManagementSystem:
             return
 
         try:
-            conn = sqlite3.connect('hotel.db')
-            cursor = conn.cursor()
-
-            # 获取预订信息
-            cursor.execute("SELECT room_number FROM reservations WHERE reservation_id = ? AND status = 'reserved'",
-                           (reservation_id,))
-            result = cursor.fetchone()
-            if not result:
-                messagebox.showerror("错误", "未找到可取消的预订（可能已入住或已完成）")
-                return
-
-            room_number = result[0]
-
-            # 更新预订状态
-            cursor.execute("UPDATE reservations SET status = 'canceled' WHERE reservation_id = ?", (reservation_id,))
-
-            # 更新房间状态
-            cursor.execute("UPDATE rooms SET status = 'available' WHERE room_number = ?", (room_number,))
-
-            conn.commit()
-            messagebox.showinfo("成功", "预订已取消")
+            self.service.cancel_reservation(reservation_id)
+        except service.ServiceError as e:
+            messagebox.showerror("错误", str(e))
+            return
         except Exception as e:
             messagebox.showerror("错误", f"取消预订失败: {str(e)}")
-        finally:
-            conn.close()
+            return
+        messagebox.showinfo("成功", "预订已取消")
 
     def view_reservations(self):
         # 创建查看预订列表的顶层窗口
@@ -1059,10 +788,11 @@ class HotelManagementSystem:
         view_reservations_win.title("预订列表")
         view_reservations_win.geometry("1100x500")
 
-        # 创建树状视图展示预订数据
-        tree = ttk.Treeview(view_reservations_win,
-                            columns=("预订ID", "房间号", "客户ID", "客户姓名", "入住日期", "退房日期", "状态"),
-                            show='headings', selectmode='browse')
+        # 创建树状视图展示预订数据（按需分页加载，点击列标题排序）
+        tree = VirtualTreeview(view_reservations_win,
+                               columns=("预订ID", "房间号", "客户ID", "客户姓名", "入住日期", "退房日期", "状态"),
+                               format_row=lambda reservation: reservation[:6] + (reservation.status_label,),
+                               selectmode='browse', worker=self.worker)
 
         # 设置列标题
         tree.heading("预订ID", text="预订ID")
@@ -1094,48 +824,92 @@ class HotelManagementSystem:
         filter_frame.pack(fill=tk.X, padx=5, pady=5)
 
         ttk.Label(filter_frame, text="状态筛选:").pack(side=tk.LEFT, padx=5)
-        status_var = tk.StringVar(value="all")
-        status_combo = ttk.Combobox(filter_frame, textvariable=status_var,
-                                    values=["all", "reserved", "checked_in", "canceled", "completed"])
+        status_var = tk.StringVar(value="全部")
+        status_combo = ttk.Combobox(filter_frame, textvariable=status_var, state="readonly",
+                                    values=["全部"] + [s.label for s in ReservationStatus])
         status_combo.pack(side=tk.LEFT, padx=5)
 
         def load_reservations():
-            status = status_var.get()
-            try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
+            status = statuses.reservation_from_label(status_var.get())
+            tree.load(self.service.reservation_list(status))
 
-                # 清空现有数据
-                for item in tree.get_children():
-                    tree.delete(item)
+        ttk.Button(filter_frame, text="筛选", command=load_reservations).pack(side=tk.LEFT, padx=5)
 
-                # 构建查询
-                query = """
-                    SELECT r.reservation_id, r.room_number, r.customer_id, c.name, 
-                           r.check_in_date, r.check_out_date, r.status
-                    FROM reservations r
-                    JOIN customers c ON r.customer_id = c.customer_id
-                """
-                params = []
+        # 初始加载数据
+        load_reservations()
+        # 预订有变化时按当前筛选条件只刷新变了的行
+        self.watch(events.RESERVATION, tree.refresh, owner=tree)
+
+    def search_available_rooms(self):
+        """空房查询 - 按房间类型和日期范围查出全部空闲房间"""
+        search_win = tk.Toplevel(self.root)
+        search_win.title("空房查询")
+        search_win.geometry("800x500")
+
+        # 查询条件
+        filter_frame = ttk.Frame(search_win, padding="10 10 10 10")
+        filter_frame.pack(fill=tk.X)
+
+        ttk.Label(filter_frame, text="入住日期:").pack(side=tk.LEFT, padx=(0, 5))
+        check_in_var = tk.StringVar(value=datetime.now().strftime("%Y-%m-%d"))
+        ttk.Entry(filter_frame, textvariable=check_in_var, width=12).pack(side=tk.LEFT, padx=(0, 10))
+
+        ttk.Label(filter_frame, text="退房日期:").pack(side=tk.LEFT, padx=(0, 5))
+        check_out_var = tk.StringVar(value=(datetime.now() + timedelta(days=1)).strftime("%Y-%m-%d"))
+        ttk.Entry(filter_frame, textvariable=check_out_var, width=12).pack(side=tk.LEFT, padx=(0, 10))
+
+        ttk.Label(filter_frame, text="房间类型:").pack(side=tk.LEFT, padx=(0, 5))
+        types = self.service.room_types()
+        room_type_var = tk.StringVar(value="全部")
+        ttk.Combobox(filter_frame, textvariable=room_type_var, values=["全部"] + types,
+                     width=12, state="readonly").pack(side=tk.LEFT, padx=(0, 10))
+
+        # 结果列表
+        table_frame = ttk.Frame(search_win)
+        table_frame.pack(fill=tk.BOTH, expand=True, padx=10)
+
+        tree = ttk.Treeview(table_frame, columns=("房间号", "房间类型", "价钱", "状态", "清洁状态"),
+                            show='headings', selectmode='browse')
+        tree.heading("房间号", text="房间号")
+        tree.heading("房间类型", text="房间类型")
+        tree.heading("价钱", text="价钱(元)")
+        tree.heading("状态", text="当前状态")
+        tree.heading("清洁状态", text="清洁状态")
+        tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-                if status != "all":
-                    query += " WHERE r.status = ?"
-                    params.append(status)
+        scrollbar = ttk.Scrollbar(table_frame, orient='vertical', command=tree.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        tree.configure(yscrollcommand=scrollbar.set)
 
-                query += " ORDER BY r.check_in_date"
+        result_label = ttk.Label(search_win, text="")
+        result_label.pack(fill=tk.X, padx=10, pady=5)
 
-                cursor.execute(query, params)
-                results = cursor.fetchall()
+        def search():
+            room_type = room_type_var.get()
+            try:
+                rooms = self.service.find_free_rooms(check_in_var.get(), check_out_var.get(),
+                                                     None if room_type == "全部" else room_type)
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e), parent=search_win)
+                return
 
-                for row in results:
-                    tree.insert('', tk.END, values=row)
-            finally:
-                conn.close()
+            tree.delete(*tree.get_children())
+            for room in rooms:
+                tree.insert('', tk.END, values=(room.room_number, room.room_type, room.price, room.status_label,
+                                                room.clean_status))
+            result_label.config(text=f"{check_in_var.get()} 至 {check_out_var.get()} 共有 {len(rooms)} 间空房（双击房间直接预订）")
 
-        ttk.Button(filter_frame, text="筛选", command=load_reservations).pack(side=tk.LEFT, padx=5)
+        def book_selected(event):
+            selected = tree.selection()
+            if not selected:
+                return
+            room_number = tree.item(selected[0], "values")[0]
+            self.add_reservation(room_number, check_in_var.get(), check_out_var.get())
 
-        # 初始加载数据
-        load_reservations()
+        tree.bind("<Double-1>", book_selected)
+        ttk.Button(filter_frame, text="查询", command=search, width=8).pack(side=tk.LEFT, padx=5)
+
+        search()
 
     def check_in(self):
         """办理入住 - 需预订房间号和客户ID匹配"""
@@ -1149,46 +923,31 @@ class HotelManagementSystem:
         room_entry.grid(row=0, column=1, padx=5, pady=5)
         room_entry.focus()
 
-        # 客户ID输入
+        # 客户ID输入（输入姓名、电话或身份证号开头时列出匹配的客户）
         ttk.Label(win, text="客户ID:").grid(row=1, column=0, padx=5, pady=5)
         customer_entry = ttk.Entry(win)
         customer_entry.grid(row=1, column=1, padx=5, pady=5)
 
-        def validate_booking():
-            """验证预订信息是否匹配"""
-            room = room_entry.get()
-            customer = customer_entry.get()
+        def fill_customer(customer):
+            customer_entry.delete(0, tk.END)
+            customer_entry.insert(0, customer.customer_id)
 
-            if not (room and customer):
-                messagebox.showerror("错误", "房间号和客户ID不能为空")
-                return False
+        self.suggest_customers(customer_entry, fill_customer)
 
+        def validate_booking():
+            """验证预订信息是否匹配"""
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-
-                # 检查是否存在匹配的预订（房间号、客户ID、状态为"已预订"）
-                cursor.execute("""
-                    SELECT r.reservation_id, c.name
-                    FROM reservations r
-                    JOIN customers c ON r.customer_id = c.customer_id
-                    WHERE r.room_number = ? AND r.customer_id = ? AND r.status = '已预订'
-                """, (room, customer))
-
-                reservation = cursor.fetchone()
-                if not reservation:
-                    messagebox.showerror("错误", "未找到匹配的预订记录\n请确认房间号和客户ID是否正确")
-                    return False
-
-                reservation_id, customer_name = reservation
-                messagebox.showinfo("验证成功", f"已找到匹配预订\n预订ID: {reservation_id}\n客户: {customer_name}")
-                return True
-
+                reservation = self.service.find_check_in_reservation(room_entry.get(), customer_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return False
             except Exception as e:
                 messagebox.showerror("错误", f"验证预订失败: {str(e)}")
                 return False
-            finally:
-                conn.close()
+
+            messagebox.showinfo("验证成功", f"已找到匹配预订\n预订ID: {reservation.reservation_id}\n"
+                                            f"客户: {reservation.customer_name}")
+            return True
 
         def confirm_check_in():
             """确认入住，仅当预订验证通过时执行"""
@@ -1199,38 +958,22 @@ class HotelManagementSystem:
             customer = customer_entry.get()
 
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-
-                # 检查房间状态是否为"已预订"
-                cursor.execute("SELECT status FROM rooms WHERE room_number=?", (room,))
-                room_status = cursor.fetchone()
-                if not room_status or room_status[0] != "已预订":
-                    messagebox.showerror("错误", f"房间{room}状态异常，无法办理入住")
-                    return
-
-                # 更新房间状态为"已入住"
-                cursor.execute("UPDATE rooms SET status='已入住' WHERE room_number=?", (room,))
-
-                # 更新预订状态为"已入住"
-                cursor.execute("UPDATE reservations SET status='已入住' WHERE room_number=? AND customer_id=?",
-                               (room, customer))
-
-                conn.commit()
-                messagebox.showinfo("成功", f"房间{room}入住成功\n客户ID: {customer}")
-                win.destroy()
-
+                self.service.check_in(room, customer)
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
             except Exception as e:
                 messagebox.showerror("错误", f"入住失败：{str(e)}")
-            finally:
-                conn.close()
+                return
+            messagebox.showinfo("成功", f"房间{room}入住成功\n客户ID: {customer}")
+            win.destroy()
 
         # 按钮区域
         ttk.Button(win, text="验证预订", command=validate_booking).grid(row=2, column=0, padx=5, pady=10)
         ttk.Button(win, text="确认入住", command=confirm_check_in).grid(row=2, column=1, padx=5, pady=10)
 
     def check_out(self):
-        """简化版办理退房"""
+        """办理退房：结清房费和全部收费项目，显示账单"""
         win = tk.Toplevel(self.root)
         win.title("办理退房")
 
@@ -1240,43 +983,51 @@ class HotelManagementSystem:
         room_entry.grid(row=0, column=1)
 
         def confirm():
-            room = room_entry.get()
-
-            if not room:
-                messagebox.showerror("错误", "请填写房间号")
-                return
-
             try:
-                conn = sqlite3.connect('hotel.db')
-                cursor = conn.cursor()
-
-                # 获取房间价格
-                cursor.execute("SELECT price FROM rooms WHERE room_number=?", (room,))
-                price = cursor.fetchone()[0]
-
-                # 更新房间状态
-                cursor.execute("""
-                    UPDATE rooms 
-                    SET status='空闲', clean_status='未清洁' 
-                    WHERE room_number=?
-                """, (room,))
-
-                # 记录交易（简化：按1天计算）
-                cursor.execute("""
-                    INSERT INTO transactions (amount, transaction_date, description)
-                    VALUES (?, datetime('now'), '房费')
-                """, (price,))
-
-                conn.commit()
-                messagebox.showinfo("成功", f"房间 {room} 退房成功\n应收: {price}元")
-                win.destroy()
+                result = self.service.check_out(room_entry.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e))
+                return
             except Exception as e:
                 messagebox.showerror("错误", f"退房失败: {str(e)}")
-            finally:
-                conn.close()
+                return
+            win.destroy()
+            self.show_bill(result)
+            self.update_status(f"房间 {result.room_number} 退房成功，应收 ¥{result.total:.2f}")
 
         ttk.Button(win, text="确认退房", command=confirm).grid(row=1, columnspan=2)
 
+    def show_bill(self, bill):
+        """显示退房账单（billing.Bill）"""
+        bill_win = tk.Toplevel(self.root)
+        bill_win.title(f"账单 - 房间 {bill.room_number}")
+        bill_win.geometry("600x420")
+        bill_win.transient(self.root)
+
+        info_frame = ttk.Frame(bill_win, padding="10 10 10 0")
+        info_frame.pack(fill=tk.X)
+        ttk.Label(info_frame, text=f"订单ID: {bill.reservation_id}    客户: {bill.customer_name or ''}").pack(anchor=tk.W)
+        ttk.Label(info_frame, text=f"入住: {bill.check_in_date}    退房: {bill.check_out_date}    "
+                                   f"共 {bill.nights} 晚 × ¥{bill.rate:.2f}").pack(anchor=tk.W, pady=(5, 0))
+
+        columns = ("交易ID", "交易日期", "描述", "金额")
+        tree = ttk.Treeview(bill_win, columns=columns, show="headings", height=10)
+        for column, width in zip(columns, (80, 160, 220, 100)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width)
+        for line in bill.lines:
+            tree.insert("", tk.END, values=(line.transaction_id, line.transaction_date, line.description,
+                                            f"{line.amount:.2f}"))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+        total_frame = ttk.Frame(bill_win, padding="10 0 10 10")
+        total_frame.pack(fill=tk.X)
+        ttk.Label(total_frame, text=f"房费: ¥{bill.room_charge:.2f}    "
+                                    f"其他消费: ¥{bill.total - bill.room_charge:.2f}").pack(side=tk.LEFT)
+        ttk.Label(total_frame, text=f"应收合计: ¥{bill.total:.2f}",
+                  font=("Arial", 12, "bold")).pack(side=tk.RIGHT)
+        ttk.Button(bill_win, text="关闭", command=bill_win.destroy).pack(pady=(0, 10))
+
     def view_finance(self):
         """显示财务统计信息"""
         finance_window = tk.Toplevel(self.root)
@@ -1294,135 +1045,119 @@ class HotelManagementSystem:
         stats_frame = ttk.LabelFrame(main_frame, text="收入概览", padding="10 10 10 10")
         stats_frame.pack(fill=tk.X, pady=10)
 
-        # 获取统计数据
-        try:
-            cursor = self.conn.cursor()
-
-            # 总收入
-            cursor.execute("SELECT SUM(amount) FROM transactions")
-            total_income = cursor.fetchone()[0] or 0
-
-            # 今日收入
-            cursor.execute("SELECT SUM(amount) FROM transactions WHERE date(transaction_date) = date('now')")
-            today_income = cursor.fetchone()[0] or 0
-
-            # 本月收入
-            cursor.execute(
-                "SELECT SUM(amount) FROM transactions WHERE strftime('%Y-%m', transaction_date) = strftime('%Y-%m', 'now')")
-            month_income = cursor.fetchone()[0] or 0
-
-            # 订单数量
-            cursor.execute("SELECT COUNT(DISTINCT reservation_id) FROM transactions")
-            order_count = cursor.fetchone()[0] or 0
-
-            # 平均每订单收入
-            avg_income_per_order = total_income / order_count if order_count > 0 else 0
-
-        except sqlite3.Error as e:
-            messagebox.showerror("数据库错误", f"获取财务数据失败: {str(e)}", parent=finance_window)
-            return
-
-        # 显示统计数据
-        stats_grid = ttk.Frame(stats_frame)
-        stats_grid.pack(fill=tk.X, padx=20, pady=10)
-
-        # 第一行
-        ttk.Label(stats_grid, text="总收入:", font=("Arial", 12)).grid(row=0, column=0, sticky=tk.W, padx=10, pady=5)
-        ttk.Label(stats_grid, text=f"¥ {total_income:.2f}", font=("Arial", 12, "bold")).grid(row=0, column=1,
-                                                                                             sticky=tk.W, padx=10,
-                                                                                             pady=5)
-
-        ttk.Label(stats_grid, text="今日收入:", font=("Arial", 12)).grid(row=0, column=2, sticky=tk.W, padx=10, pady=5)
-        ttk.Label(stats_grid, text=f"¥ {today_income:.2f}", font=("Arial", 12, "bold")).grid(row=0, column=3,
-                                                                                             sticky=tk.W, padx=10,
-                                                                                             pady=5)
-
-        # 第二行
-        ttk.Label(stats_grid, text="本月收入:", font=("Arial", 12)).grid(row=1, column=0, sticky=tk.W, padx=10, pady=5)
-        ttk.Label(stats_grid, text=f"¥ {month_income:.2f}", font=("Arial", 12, "bold")).grid(row=1, column=1,
-                                                                                             sticky=tk.W, padx=10,
-                                                                                             pady=5)
-
-        ttk.Label(stats_grid, text="订单数量:", font=("Arial", 12)).grid(row=1, column=2, sticky=tk.W, padx=10, pady=5)
-        ttk.Label(stats_grid, text=f"{order_count}", font=("Arial", 12, "bold")).grid(row=1, column=3, sticky=tk.W,
-                                                                                      padx=10, pady=5)
-
-        # 第三行
-        ttk.Label(stats_grid, text="平均每订单收入:", font=("Arial", 12)).grid(row=2, column=0, sticky=tk.W, padx=10,
-                                                                               pady=5)
-        ttk.Label(stats_grid, text=f"¥ {avg_income_per_order:.2f}", font=("Arial", 12, "bold")).grid(row=2, column=1,
-                                                                                                     sticky=tk.W,
-                                                                                                     padx=10, pady=5)
+        # 统计数据在后台读取（营收日汇总表），读完之前先显示提示
+        loading_label = ttk.Label(stats_frame, text="正在加载...", font=("Arial", 12))
+        loading_label.pack(padx=20, pady=10)
 
         # 创建图表框架
         charts_frame = ttk.LabelFrame(main_frame, text="收入趋势", padding="10 10 10 10")
         charts_frame.pack(fill=tk.BOTH, expand=True, pady=10)
 
-        # 使用matplotlib创建简单图表
-        try:
-            # 过去7天的收入
-            cursor.execute("""
-                SELECT date(transaction_date) as date, SUM(amount) as daily_income
-                FROM transactions
-                WHERE date(transaction_date) >= date('now', '-6 days')
-                GROUP BY date(transaction_date)
-                ORDER BY date(transaction_date)
-            """)
-
-            daily_data = cursor.fetchall()
-            dates = []
-            incomes = []
-
-            # 确保有7天的数据（即使某天没有收入）
-            date_income_dict = {row[0]: row[1] for row in daily_data}
-
-            for i in range(6, -1, -1):
-                date_str = self.get_date_str(i)
-                dates.append(date_str.split('-')[2])  # 只显示日期部分
-                incomes.append(date_income_dict.get(date_str, 0))
-
-            # 创建绘图控件
-            from matplotlib.figure import Figure
-            from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-            fig = Figure(figsize=(8, 4), dpi=100)
-            ax = fig.add_subplot(111)
-
-            # 绘制柱状图
-            bars = ax.bar(dates, incomes, color='skyblue')
-            ax.set_xlabel('日期')
-            ax.set_ylabel('收入 (¥)')
-            ax.set_title('过去7天收入统计')
-
-            # 添加数据标签
-            for bar, income in zip(bars, incomes):
-                height = bar.get_height()
-                ax.text(bar.get_x() + bar.get_width() / 2., height + 5,
-                        f'¥{income:.0f}', ha='center', va='bottom')
-
-            # 将图表添加到界面
-            canvas = FigureCanvasTkAgg(fig, master=charts_frame)
-            canvas.draw()
-            canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-
-        except Exception as e:
-            error_label = ttk.Label(charts_frame, text=f"无法加载图表: {str(e)}", foreground="red")
-            error_label.pack(padx=20, pady=20)
-            import traceback
-            traceback.print_exc()  # 在控制台打印详细错误信息
-
         # 底部按钮
         button_frame = ttk.Frame(main_frame)
         button_frame.pack(pady=10)
 
-        ttk.Button(button_frame, text="导出报表", command=lambda: self.export_finance_report(
-            total_income, today_income, month_income, order_count, avg_income_per_order
-        ), width=15).pack(side=tk.LEFT, padx=5)
+        # 数据加载完成后才能导出
+        export_button = ttk.Button(button_frame, text="导出报表", width=15, state="disabled")
+        export_button.pack(side=tk.LEFT, padx=5)
+
+        ttk.Button(button_frame, text="导出分析数据", command=self.export_ledger, width=15).pack(side=tk.LEFT, padx=5)
 
         ttk.Button(button_frame, text="查看详细交易", command=self.view_transactions, width=15).pack(side=tk.LEFT,
                                                                                                      padx=5)
         ttk.Button(button_frame, text="关闭", command=finance_window.destroy, width=15).pack(side=tk.LEFT, padx=5)
 
+        def show_summary(summary):
+            loading_label.destroy()
+            total_income, today_income, month_income, order_count, avg_income_per_order, daily_data = summary
+
+            # 显示统计数据
+            stats_grid = ttk.Frame(stats_frame)
+            stats_grid.pack(fill=tk.X, padx=20, pady=10)
+
+            # 第一行
+            ttk.Label(stats_grid, text="总收入:", font=("Arial", 12)).grid(row=0, column=0, sticky=tk.W, padx=10, pady=5)
+            ttk.Label(stats_grid, text=f"¥ {total_income:.2f}", font=("Arial", 12, "bold")).grid(row=0, column=1,
+                                                                                                 sticky=tk.W, padx=10,
+                                                                                                 pady=5)
+
+            ttk.Label(stats_grid, text="今日收入:", font=("Arial", 12)).grid(row=0, column=2, sticky=tk.W, padx=10, pady=5)
+            ttk.Label(stats_grid, text=f"¥ {today_income:.2f}", font=("Arial", 12, "bold")).grid(row=0, column=3,
+                                                                                                 sticky=tk.W, padx=10,
+                                                                                                 pady=5)
+
+            # 第二行
+            ttk.Label(stats_grid, text="本月收入:", font=("Arial", 12)).grid(row=1, column=0, sticky=tk.W, padx=10, pady=5)
+            ttk.Label(stats_grid, text=f"¥ {month_income:.2f}", font=("Arial", 12, "bold")).grid(row=1, column=1,
+                                                                                                 sticky=tk.W, padx=10,
+                                                                                                 pady=5)
+
+            ttk.Label(stats_grid, text="订单数量:", font=("Arial", 12)).grid(row=1, column=2, sticky=tk.W, padx=10, pady=5)
+            ttk.Label(stats_grid, text=f"{order_count}", font=("Arial", 12, "bold")).grid(row=1, column=3, sticky=tk.W,
+                                                                                          padx=10, pady=5)
+
+            # 第三行
+            ttk.Label(stats_grid, text="平均每订单收入:", font=("Arial", 12)).grid(row=2, column=0, sticky=tk.W, padx=10,
+                                                                                   pady=5)
+            ttk.Label(stats_grid, text=f"¥ {avg_income_per_order:.2f}", font=("Arial", 12, "bold")).grid(row=2, column=1,
+                                                                                                         sticky=tk.W,
+                                                                                                         padx=10, pady=5)
+
+            # 使用matplotlib创建简单图表
+            try:
+                day_labels = []
+                incomes = []
+
+                # 确保有7天的数据（即使某天没有收入）
+                date_income_dict = {row[0]: row[1] for row in daily_data}
+
+                for i in range(6, -1, -1):
+                    date_str = self.get_date_str(i)
+                    day_labels.append(date_str.split('-')[2])  # 只显示日期部分
+                    incomes.append(date_income_dict.get(date_str, 0))
+
+                # 创建绘图控件
+                from matplotlib.figure import Figure
+                from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+                fig = Figure(figsize=(8, 4), dpi=100)
+                ax = fig.add_subplot(111)
+
+                # 绘制柱状图
+                bars = ax.bar(day_labels, incomes, color='skyblue')
+                ax.set_xlabel('日期')
+                ax.set_ylabel('收入 (¥)')
+                ax.set_title('过去7天收入统计')
+
+                # 添加数据标签
+                for bar, income in zip(bars, incomes):
+                    height = bar.get_height()
+                    ax.text(bar.get_x() + bar.get_width() / 2., height + 5,
+                            f'¥{income:.0f}', ha='center', va='bottom')
+
+                # 将图表添加到界面
+                canvas = FigureCanvasTkAgg(fig, master=charts_frame)
+                canvas.draw()
+                canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+
+            except Exception as e:
+                error_label = ttk.Label(charts_frame, text=f"无法加载图表: {str(e)}", foreground="red")
+                error_label.pack(padx=20, pady=20)
+                import traceback
+                traceback.print_exc()  # 在控制台打印详细错误信息
+
+            export_button.configure(command=lambda: self.export_finance_report(
+                total_income, today_income, month_income, order_count, avg_income_per_order
+            ))
+            export_button.state(["!disabled"])
+
+        def show_error(e):
+            loading_label.config(text="获取财务数据失败", foreground="red")
+            messagebox.showerror("数据库错误", f"获取财务数据失败: {str(e)}", parent=finance_window)
+
+        self.worker.submit(self.service.finance_summary, 7, on_done=show_summary, on_error=show_error,
+                           owner=finance_window, busy=finance_window)
+
     def get_date_str(self, days_ago):
         """获取指定天数前的日期字符串，格式为YYYY-MM-DD"""
         import datetime
@@ -1431,8 +1166,7 @@ class HotelManagementSystem:
         return target_date.strftime("%Y-%m-%d")
 
     def export_finance_report(self, total_income, today_income, month_income, order_count, avg_income_per_order):
-        """导出财务报表到CSV文件"""
-        import csv
+        """导出财务报表到CSV文件（后台线程从数据库流式写出全部交易记录）"""
         import datetime
         from tkinter import filedialog
 
@@ -1446,45 +1180,112 @@ class HotelManagementSystem:
         if not filename:
             return  # 用户取消了保存
 
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile)
-
-                # 写入报表头
-                writer.writerow(['酒店住房管理系统财务报表'])
-                writer.writerow(['生成时间', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")])
-                writer.writerow([])  # 空行
-
-                # 写入摘要数据
-                writer.writerow(['财务摘要'])
-                writer.writerow(['总收入', f'¥ {total_income:.2f}'])
-                writer.writerow(['今日收入', f'¥ {today_income:.2f}'])
-                writer.writerow(['本月收入', f'¥ {month_income:.2f}'])
-                writer.writerow(['订单数量', order_count])
-                writer.writerow(['平均每订单收入', f'¥ {avg_income_per_order:.2f}'])
-                writer.writerow([])  # 空行
-
-                # 写入详细交易记录
-                writer.writerow(['详细交易记录'])
-                writer.writerow(['交易ID', '订单ID', '房间号', '客户姓名', '金额', '交易日期', '描述'])
-
-                cursor = self.conn.cursor()
-                cursor.execute("""
-                    SELECT t.transaction_id, t.reservation_id, r.room_number, c.name, t.amount, 
-                           t.transaction_date, t.description
-                    FROM transactions t
-                    LEFT JOIN reservations r ON t.reservation_id = r.reservation_id
-                    LEFT JOIN customers c ON r.customer_id = c.customer_id
-                    ORDER BY t.transaction_date DESC
-                """)
-
-                transactions = cursor.fetchall()
-                for transaction in transactions:
-                    writer.writerow(transaction)
-
-            messagebox.showinfo("成功", f"财务报表已成功导出到: {filename}")
-        except Exception as e:
-            messagebox.showerror("错误", f"导出报表失败: {str(e)}")
+        # 报表头和摘要数据
+        preamble = [
+            ['酒店住房管理系统财务报表'],
+            ['生成时间', datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")],
+            [],  # 空行
+            ['财务摘要'],
+            ['总收入', f'¥ {total_income:.2f}'],
+            ['今日收入', f'¥ {today_income:.2f}'],
+            ['本月收入', f'¥ {month_income:.2f}'],
+            ['订单数量', order_count],
+            ['平均每订单收入', f'¥ {avg_income_per_order:.2f}'],
+            [],  # 空行
+            ['详细交易记录'],
+        ]
+        transactions = self.service.transaction_list()
+        task = export.ExportTask(filename, ['交易ID', '订单ID', '房间号', '客户姓名', '金额', '交易日期', '描述'],
+                                 transactions.all(), transactions.count, preamble)
+        self.run_export(task, "导出财务报表", f"财务报表已成功导出到: {filename}")
+
+    def export_ledger(self):
+        """把新增的交易追加导出为按月分区的 Parquet 文件，供财务在笔记本中分析（见 ledger.py）"""
+        from tkinter import filedialog
+
+        if not self.require_local("导出分析数据"):
+            return
+        directory = filedialog.askdirectory(title="选择分析数据目录（再次导出到同一目录时只追加新交易）")
+        if not directory:
+            return
+        task = ledger.LedgerExportTask(directory)
+        self.run_export(task, "导出分析数据", f"分析数据已导出到: {directory}")
+
+    def night_audit(self):
+        """夜审：给在住房间记一晚房费、标记未到店的预订、营业日前进一天（见 night_audit.py）"""
+        def confirm(business_date):
+            if not messagebox.askyesno("夜审", f"确定结束营业日 {business_date} 吗？\n"
+                                               f"将给所有在住房间记一晚房费，并把入住日期已过仍未入住的预订标记为未到店。"):
+                return
+            self.worker.submit(self.service.night_audit, business_date, self.current_user['username'],
+                               on_done=done, busy=self.root)
+
+        def done(result):
+            messagebox.showinfo("夜审完成",
+                                f"营业日 {result.business_date} 已结束\n"
+                                f"记房费 {result.room_charges} 笔，合计 ¥{result.charge_total:.2f}\n"
+                                f"未到店 {result.no_shows} 个")
+            self.update_status(f"夜审完成，当前营业日 {dates.next_day(result.business_date)}")
+
+        self.worker.submit(self.service.current_business_date, on_done=confirm, busy=self.root)
+
+    def require_local(self, title):
+        """直接读写数据库文件的功能只能在本机模式下使用；客户端模式下提示到服务器所在的电脑上操作"""
+        if self.local:
+            return True
+        messagebox.showinfo(title, f"连接服务器时不能{title}，请在服务器所在的电脑上以本机模式操作")
+        return False
+
+    def run_export(self, task, title, success_message, action="导出"):
+        """启动后台导出（或导入）并显示进度窗口，可以取消
+
+        success_message 可以是完成后调用的函数 success_message(task)，返回要显示的消息
+        """
+        progress_win = tk.Toplevel(self.root)
+        progress_win.title(title)
+        progress_win.geometry("360x130")
+        progress_win.transient(self.root)
+        progress_win.resizable(False, False)
+
+        status_label = ttk.Label(progress_win, text=f"正在准备{action}...")
+        status_label.pack(pady=(15, 5))
+        progress_bar = ttk.Progressbar(progress_win, mode="indeterminate", length=300)
+        progress_bar.pack(pady=5)
+        progress_bar.start(10)
+        cancel_button = ttk.Button(progress_win, text="取消", command=task.cancel)
+        cancel_button.pack(pady=5)
+        progress_win.protocol("WM_DELETE_WINDOW", task.cancel)
+
+        def poll():
+            if not progress_win.winfo_exists():
+                return
+            if task.total and str(progress_bar["mode"]) != "determinate":
+                progress_bar.stop()
+                progress_bar.configure(mode="determinate", maximum=task.total)
+            if task.total:
+                progress_bar["value"] = task.written
+                status_label.config(text=f"已{action} {task.written} / {task.total} 条")
+            elif task.written:
+                status_label.config(text=f"已{action} {task.written} 条")
+            if task.cancelled:
+                cancel_button.state(["disabled"])
+                status_label.config(text="正在取消...")
+            progress_win.after(100, poll)
+
+        def finish(_):
+            progress_win.destroy()
+            if task.error is not None:
+                messagebox.showerror("错误", f"{action}失败: {str(task.error)}")
+            elif task.cancelled:
+                self.update_status(f"{action}已取消")
+            else:
+                message = success_message(task) if callable(success_message) else success_message
+                messagebox.showinfo("成功", message)
+                self.update_status(f"已{action} {task.written} 条记录")
+
+        # 在后台线程中执行，进度窗口定时读取进度
+        self.worker.submit(task.run, on_done=finish)
+        poll()
 
     def add_transaction(self):
         """添加新的交易记录"""
@@ -1507,17 +1308,9 @@ class HotelManagementSystem:
         reservation_combo.grid(column=1, row=1, pady=5, sticky=tk.W)
 
         # 加载活跃订单
-        cursor = self.conn.cursor()
-        cursor.execute("""
-            SELECT r.reservation_id, r.room_number, c.name, r.check_in_date, r.check_out_date
-            FROM reservations r
-            JOIN customers c ON r.customer_id = c.customer_id
-            WHERE r.status IN ('confirmed', 'checked_in')
-            ORDER BY r.check_in_date DESC
-        """)
-        reservations = cursor.fetchall()
-
-        reservation_combo['values'] = [f"{r[0]} - 房间{r[1]} - {r[2]}" for r in reservations]
+        reservations = self.service.active_reservations()
+        reservation_combo['values'] = [f"{r.reservation_id} - 房间{r.room_number} - {r.customer_name}"
+                                       for r in reservations]
         if reservations:
             reservation_combo.current(0)
 
@@ -1554,47 +1347,31 @@ class HotelManagementSystem:
                 messagebox.showerror("错误", "请选择关联订单", parent=transaction_window)
                 return
 
-            try:
-                amount = float(amount_var.get())
-                if amount <= 0:
-                    messagebox.showerror("错误", "金额必须大于零", parent=transaction_window)
-                    return
-            except ValueError:
-                messagebox.showerror("错误", "请输入有效的金额", parent=transaction_window)
-                return
-
             if not description_var.get():
                 # 如果没有填写描述，则使用交易类型作为描述
                 description_var.set(f"{type_var.get()} 费用")
 
+            # 从选择的订单中提取订单ID
+            reservation_id = reservation_var.get().split(" - ")[0]
+
             try:
-                # 从选择的订单中提取订单ID
-                reservation_id = reservation_var.get().split(" - ")[0]
-
-                # 保存交易记录
-                cursor = self.conn.cursor()
-                cursor.execute("""
-                    INSERT INTO transactions (reservation_id, amount, transaction_date, description)
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    reservation_id,
-                    amount,
-                    date_var.get(),
-                    description_var.get()
-                ))
-
-                self.conn.commit()
-                messagebox.showinfo("成功", "交易记录已成功添加", parent=transaction_window)
-
-                # 清空表单
-                amount_var.set("")
-                description_var.set("")
-                type_var.set("房费")
-
-                self.update_status(f"已添加金额为 ¥{amount:.2f} 的新交易记录")
+                # 交易日期只填日期时，按当前时刻补齐
+                self.service.add_transaction(reservation_id, amount_var.get(), date_var.get(),
+                                             description_var.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e), parent=transaction_window)
+                return
             except sqlite3.Error as e:
-                self.conn.rollback()
                 messagebox.showerror("数据库错误", f"添加交易记录失败: {str(e)}", parent=transaction_window)
+                return
+
+            messagebox.showinfo("成功", "交易记录已成功添加", parent=transaction_window)
+            self.update_status(f"已添加金额为 ¥{float(amount_var.get()):.2f} 的新交易记录")
+
+            # 清空表单
+            amount_var.set("")
+            description_var.set("")
+            type_var.set("房费")
 
         # 添加按钮
         button_frame = ttk.Frame(frame)
@@ -1642,7 +1419,10 @@ class HotelManagementSystem:
 
         # 创建交易记录表格
         columns = ("交易ID", "订单ID", "房间号", "客户姓名", "金额", "交易日期", "描述")
-        transactions_tree = ttk.Treeview(table_frame, columns=columns, show="headings", height=20)
+        # 按需分页加载，点击列标题排序；金额格式化显示
+        transactions_tree = VirtualTreeview(
+            table_frame, columns=columns, height=20, worker=self.worker,
+            format_row=lambda transaction: transaction._replace(amount=f"¥ {transaction.amount:.2f}"))
 
         # 添加滚动条
         scrollbar_y = ttk.Scrollbar(table_frame, orient=tk.VERTICAL, command=transactions_tree.yview)
@@ -1677,62 +1457,17 @@ class HotelManagementSystem:
 
         # 定义加载数据函数
         def load_transactions():
-            # 清空现有数据
-            for item in transactions_tree.get_children():
-                transactions_tree.delete(item)
-
-            # 构建查询条件
-            conditions = []
-            params = []
-
-            # 日期条件
-            if start_date_var.get():
-                conditions.append("t.transaction_date >= ?")
-                params.append(start_date_var.get())
-
-            if end_date_var.get():
-                conditions.append("t.transaction_date <= ?")
-                params.append(end_date_var.get())
-
-            # 关键词条件
-            if keyword_var.get():
-                keyword = f"%{keyword_var.get()}%"
-                conditions.append("(t.description LIKE ? OR c.name LIKE ?)")
-                params.extend([keyword, keyword])
-
-            # 构建完整查询
-            query = """
-                SELECT t.transaction_id, t.reservation_id, r.room_number, c.name, t.amount, 
-                       t.transaction_date, t.description
-                FROM transactions t
-                LEFT JOIN reservations r ON t.reservation_id = r.reservation_id
-                LEFT JOIN customers c ON r.customer_id = c.customer_id
-            """
-
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-
-            query += " ORDER BY t.transaction_date DESC"
-
             try:
-                cursor = self.conn.cursor()
-                cursor.execute(query, params)
-
-                transactions = cursor.fetchall()
-
-                # 填充表格
-                for transaction in transactions:
-                    # 格式化金额显示
-                    formatted_amount = f"¥ {transaction[4]:.2f}"
-                    # 使用修改后的金额替换原始金额
-                    row_data = list(transaction)
-                    row_data[4] = formatted_amount
-
-                    transactions_tree.insert("", tk.END, values=row_data)
-
-                self.update_status(f"已加载 {len(transactions)} 条交易记录")
-            except sqlite3.Error as e:
-                messagebox.showerror("数据库错误", f"加载交易数据失败: {str(e)}", parent=transactions_window)
+                # 日期范围含首尾两天，关键词匹配描述或客户姓名
+                transactions = self.service.transaction_list(start_date_var.get(), end_date_var.get(),
+                                                             keyword_var.get())
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e), parent=transactions_window)
+                return
+            transactions_tree.load(transactions)
+            # 总数在后台统计，统计完再更新状态栏
+            self.worker.submit(transactions.count, owner=transactions_window,
+                               on_done=lambda count: self.update_status(f"共 {count} 条交易记录"))
 
         # 添加搜索按钮
         ttk.Button(search_frame, text="搜索", command=load_transactions, width=10).pack(side=tk.LEFT, padx=10)
@@ -1755,6 +1490,7 @@ class HotelManagementSystem:
 
         # 加载初始数据
         load_transactions()
+        self.watch(events.TRANSACTION, transactions_tree.refresh, owner=transactions_tree)
 
         # 添加右键菜单
         context_menu = tk.Menu(transactions_tree, tearoff=0)
@@ -1779,97 +1515,86 @@ class HotelManagementSystem:
         transaction_id = tree_view.item(item, "values")[0]
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT t.transaction_id, t.reservation_id, r.room_number, c.name, c.contact, c.id_card,
-                       t.amount, t.transaction_date, t.description, r.check_in_date, r.check_out_date
-                FROM transactions t
-                LEFT JOIN reservations r ON t.reservation_id = r.reservation_id
-                LEFT JOIN customers c ON r.customer_id = c.customer_id
-                WHERE t.transaction_id = ?
-            """, (transaction_id,))
-
-            transaction = cursor.fetchone()
-
-            if not transaction:
-                messagebox.showerror("错误", "找不到交易记录")
-                return
-
-            # 创建详情窗口
-            details_window = tk.Toplevel(self.root)
-            details_window.title(f"交易详情 - ID: {transaction_id}")
-            details_window.geometry("500x400")
-            details_window.transient(self.root)
-            details_window.grab_set()  # 模态窗口
+            transaction = self.service.get_transaction(transaction_id)
+        except service.ServiceError as e:
+            messagebox.showerror("错误", str(e))
+            return
+        except sqlite3.Error as e:
+            messagebox.showerror("数据库错误", f"获取交易详情失败: {str(e)}")
+            return
 
-            # 创建详情框架
-            frame = ttk.Frame(details_window, padding="20 20 20 20")
-            frame.pack(fill=tk.BOTH, expand=True)
+        # 创建详情窗口
+        details_window = tk.Toplevel(self.root)
+        details_window.title(f"交易详情 - ID: {transaction_id}")
+        details_window.geometry("500x400")
+        details_window.transient(self.root)
+        details_window.grab_set()  # 模态窗口
 
-            ttk.Label(frame, text="交易详细信息", font=("Arial", 14, "bold")).grid(column=0, row=0, columnspan=2,
-                                                                                   pady=10)
+        # 创建详情框架
+        frame = ttk.Frame(details_window, padding="20 20 20 20")
+        frame.pack(fill=tk.BOTH, expand=True)
 
-            # 交易信息
-            info_frame = ttk.LabelFrame(frame, text="基本信息", padding="10 10 10 10")
-            info_frame.grid(column=0, row=1, columnspan=2, sticky=tk.EW, pady=10)
+        ttk.Label(frame, text="交易详细信息", font=("Arial", 14, "bold")).grid(column=0, row=0, columnspan=2,
+                                                                               pady=10)
 
-            # 第一列
-            ttk.Label(info_frame, text="交易ID:").grid(column=0, row=0, sticky=tk.W, pady=5)
-            ttk.Label(info_frame, text=transaction[0]).grid(column=1, row=0, sticky=tk.W, pady=5)
+        # 交易信息
+        info_frame = ttk.LabelFrame(frame, text="基本信息", padding="10 10 10 10")
+        info_frame.grid(column=0, row=1, columnspan=2, sticky=tk.EW, pady=10)
 
-            ttk.Label(info_frame, text="订单ID:").grid(column=0, row=1, sticky=tk.W, pady=5)
-            ttk.Label(info_frame, text=transaction[1]).grid(column=1, row=1, sticky=tk.W, pady=5)
+        # 第一列
+        ttk.Label(info_frame, text="交易ID:").grid(column=0, row=0, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text=transaction[0]).grid(column=1, row=0, sticky=tk.W, pady=5)
 
-            ttk.Label(info_frame, text="房间号:").grid(column=0, row=2, sticky=tk.W, pady=5)
-            ttk.Label(info_frame, text=transaction[2] or "未指定").grid(column=1, row=2, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text="订单ID:").grid(column=0, row=1, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text=transaction[1]).grid(column=1, row=1, sticky=tk.W, pady=5)
 
-            ttk.Label(info_frame, text="交易金额:").grid(column=0, row=3, sticky=tk.W, pady=5)
-            ttk.Label(info_frame, text=f"¥ {transaction[6]:.2f}", font=("Arial", "10", "bold")).grid(column=1, row=3,
-                                                                                                     sticky=tk.W,
-                                                                                                     pady=5)
+        ttk.Label(info_frame, text="房间号:").grid(column=0, row=2, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text=transaction[2] or "未指定").grid(column=1, row=2, sticky=tk.W, pady=5)
 
-            # 第二列
-            ttk.Label(info_frame, text="交易日期:").grid(column=2, row=0, sticky=tk.W, pady=5, padx=(20, 0))
-            ttk.Label(info_frame, text=transaction[7]).grid(column=3, row=0, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text="交易金额:").grid(column=0, row=3, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text=f"¥ {transaction[6]:.2f}", font=("Arial", "10", "bold")).grid(column=1, row=3,
+                                                                                                 sticky=tk.W,
+                                                                                                 pady=5)
 
-            ttk.Label(info_frame, text="入住日期:").grid(column=2, row=1, sticky=tk.W, pady=5, padx=(20, 0))
-            ttk.Label(info_frame, text=transaction[9] or "未指定").grid(column=3, row=1, sticky=tk.W, pady=5)
+        # 第二列
+        ttk.Label(info_frame, text="交易日期:").grid(column=2, row=0, sticky=tk.W, pady=5, padx=(20, 0))
+        ttk.Label(info_frame, text=transaction[7]).grid(column=3, row=0, sticky=tk.W, pady=5)
 
-            ttk.Label(info_frame, text="退房日期:").grid(column=2, row=2, sticky=tk.W, pady=5, padx=(20, 0))
-            ttk.Label(info_frame, text=transaction[10] or "未指定").grid(column=3, row=2, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text="入住日期:").grid(column=2, row=1, sticky=tk.W, pady=5, padx=(20, 0))
+        ttk.Label(info_frame, text=transaction[9] or "未指定").grid(column=3, row=1, sticky=tk.W, pady=5)
 
-            ttk.Label(info_frame, text="描述:").grid(column=2, row=3, sticky=tk.W, pady=5, padx=(20, 0))
-            ttk.Label(info_frame, text=transaction[8]).grid(column=3, row=3, sticky=tk.W, pady=5)
+        ttk.Label(info_frame, text="退房日期:").grid(column=2, row=2, sticky=tk.W, pady=5, padx=(20, 0))
+        ttk.Label(info_frame, text=transaction[10] or "未指定").grid(column=3, row=2, sticky=tk.W, pady=5)
 
-            # 客户信息
-            customer_frame = ttk.LabelFrame(frame, text="客户信息", padding="10 10 10 10")
-            customer_frame.grid(column=0, row=2, columnspan=2, sticky=tk.EW, pady=10)
+        ttk.Label(info_frame, text="描述:").grid(column=2, row=3, sticky=tk.W, pady=5, padx=(20, 0))
+        ttk.Label(info_frame, text=transaction[8]).grid(column=3, row=3, sticky=tk.W, pady=5)
 
-            ttk.Label(customer_frame, text="客户姓名:").grid(column=0, row=0, sticky=tk.W, pady=5)
-            ttk.Label(customer_frame, text=transaction[3] or "未知").grid(column=1, row=0, sticky=tk.W, pady=5)
+        # 客户信息
+        customer_frame = ttk.LabelFrame(frame, text="客户信息", padding="10 10 10 10")
+        customer_frame.grid(column=0, row=2, columnspan=2, sticky=tk.EW, pady=10)
 
-            ttk.Label(customer_frame, text="联系方式:").grid(column=0, row=1, sticky=tk.W, pady=5)
-            ttk.Label(customer_frame, text=transaction[4] or "未知").grid(column=1, row=1, sticky=tk.W, pady=5)
+        ttk.Label(customer_frame, text="客户姓名:").grid(column=0, row=0, sticky=tk.W, pady=5)
+        ttk.Label(customer_frame, text=transaction[3] or "未知").grid(column=1, row=0, sticky=tk.W, pady=5)
 
-            ttk.Label(customer_frame, text="身份证号:").grid(column=0, row=2, sticky=tk.W, pady=5)
-            id_card = transaction[5] or "未知"
-            # 如果有身份证号，只显示前4位和后4位，中间用*替代
-            if len(id_card) >= 8 and id_card != "未知":
-                masked_id = id_card[:4] + '*' * (len(id_card) - 8) + id_card[-4:]
-                ttk.Label(customer_frame, text=masked_id).grid(column=1, row=2, sticky=tk.W, pady=5)
-            else:
-                ttk.Label(customer_frame, text=id_card).grid(column=1, row=2, sticky=tk.W, pady=5)
+        ttk.Label(customer_frame, text="联系方式:").grid(column=0, row=1, sticky=tk.W, pady=5)
+        ttk.Label(customer_frame, text=transaction[4] or "未知").grid(column=1, row=1, sticky=tk.W, pady=5)
 
-            # 底部按钮
-            button_frame = ttk.Frame(frame)
-            button_frame.grid(column=0, row=3, columnspan=2, pady=15)
+        ttk.Label(customer_frame, text="身份证号:").grid(column=0, row=2, sticky=tk.W, pady=5)
+        id_card = transaction[5] or "未知"
+        # 如果有身份证号，只显示前4位和后4位，中间用*替代
+        if len(id_card) >= 8 and id_card != "未知":
+            masked_id = id_card[:4] + '*' * (len(id_card) - 8) + id_card[-4:]
+            ttk.Label(customer_frame, text=masked_id).grid(column=1, row=2, sticky=tk.W, pady=5)
+        else:
+            ttk.Label(customer_frame, text=id_card).grid(column=1, row=2, sticky=tk.W, pady=5)
 
-            ttk.Button(button_frame, text="打印收据", command=lambda: self.print_receipt(transaction), width=15).pack(
-                side=tk.LEFT, padx=5)
-            ttk.Button(button_frame, text="关闭", command=details_window.destroy, width=15).pack(side=tk.LEFT, padx=5)
+        # 底部按钮
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(column=0, row=3, columnspan=2, pady=15)
 
-        except sqlite3.Error as e:
-            messagebox.showerror("数据库错误", f"获取交易详情失败: {str(e)}")
+        ttk.Button(button_frame, text="打印收据", command=lambda: self.print_receipt(transaction), width=15).pack(
+            side=tk.LEFT, padx=5)
+        ttk.Button(button_frame, text="关闭", command=details_window.destroy, width=15).pack(side=tk.LEFT, padx=5)
 
     def print_receipt(self, transaction):
         """打印交易收据（模拟）"""
@@ -1979,22 +1704,20 @@ class HotelManagementSystem:
             return
 
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("DELETE FROM transactions WHERE transaction_id = ?", (transaction_id,))
-            self.conn.commit()
+            self.service.delete_transaction(transaction_id)
 
             # 从树形视图中移除
             tree_view.delete(item)
 
             messagebox.showinfo("成功", "交易记录已成功删除")
             self.update_status(f"交易记录 #{transaction_id} 已删除")
+        except service.ServiceError as e:
+            messagebox.showerror("错误", str(e))
         except sqlite3.Error as e:
-            self.conn.rollback()
             messagebox.showerror("数据库错误", f"删除交易记录失败: {str(e)}")
 
     def export_transaction_data(self, tree_view):
-        """导出交易数据到CSV文件"""
-        import csv
+        """导出交易数据到CSV文件（当前筛选条件下的全部记录，按表格当前排序，后台线程流式写出）"""
         from tkinter import filedialog
 
         # 让用户选择保存位置
@@ -2007,21 +1730,70 @@ class HotelManagementSystem:
         if not filename:
             return  # 用户取消了保存
 
-        try:
-            with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-                writer = csv.writer(csvfile)
+        # 表格只加载了一部分，直接从数据库读取全部记录
+        rows = (tree_view.format_row(row) for row in tree_view.all_rows())
+        task = export.ExportTask(filename, ["交易ID", "订单ID", "房间号", "客户姓名", "金额", "交易日期", "描述"],
+                                 rows, tree_view.source.count)
+        self.run_export(task, "导出交易数据", f"交易数据已成功导出到: {filename}")
 
-                # 写入表头
-                writer.writerow(["交易ID", "订单ID", "房间号", "客户姓名", "金额", "交易日期", "描述"])
+    def bulk_import(self):
+        """从 CSV 批量导入房间或客户（见 bulk_import.py），后台线程分批写入"""
+        from tkinter import filedialog
 
-                # 写入所有数据
-                for item in tree_view.get_children():
-                    values = tree_view.item(item, "values")
-                    writer.writerow(values)
+        if not self.require_local("批量导入"):
+            return
 
-            messagebox.showinfo("成功", f"交易数据已成功导出到: {filename}")
-        except Exception as e:
-            messagebox.showerror("错误", f"导出数据失败: {str(e)}")
+        import_win = tk.Toplevel(self.root)
+        import_win.title("批量导入")
+        import_win.geometry("420x200")
+        import_win.resizable(False, False)
+        import_win.transient(self.root)
+
+        ttk.Label(import_win, text="导入内容:").grid(row=0, column=0, padx=10, pady=10, sticky=tk.W)
+        kind_var = tk.StringVar(value="customers")
+        kind_frame = ttk.Frame(import_win)
+        kind_frame.grid(row=0, column=1, columnspan=2, pady=10, sticky=tk.W)
+        for kind_name, kind in bulk_import.KINDS.items():
+            ttk.Radiobutton(kind_frame, text=kind.label, variable=kind_var, value=kind_name).pack(side=tk.LEFT,
+                                                                                                  padx=(0, 15))
+
+        ttk.Label(import_win, text="CSV文件:").grid(row=1, column=0, padx=10, pady=5, sticky=tk.W)
+        path_entry = ttk.Entry(import_win, width=30)
+        path_entry.grid(row=1, column=1, pady=5)
+
+        def choose_file():
+            filename = filedialog.askopenfilename(parent=import_win, title="选择要导入的CSV文件",
+                                                  filetypes=[("CSV文件", "*.csv"), ("所有文件", "*.*")])
+            if filename:
+                path_entry.delete(0, tk.END)
+                path_entry.insert(0, filename)
+
+        ttk.Button(import_win, text="浏览...", command=choose_file).grid(row=1, column=2, padx=5, pady=5)
+
+        ttk.Label(import_win, text="文件编码:").grid(row=2, column=0, padx=10, pady=5, sticky=tk.W)
+        encoding_box = ttk.Combobox(import_win, values=[export.CSV_ENCODING, "gbk"], width=12)
+        encoding_box.set(export.CSV_ENCODING)
+        encoding_box.grid(row=2, column=1, pady=5, sticky=tk.W)
+
+        def start():
+            path = path_entry.get().strip()
+            if not path:
+                messagebox.showerror("错误", "请选择要导入的CSV文件", parent=import_win)
+                return
+            kind = bulk_import.KINDS[kind_var.get()]
+            task = bulk_import.ImportTask(kind_var.get(), path, encoding_box.get().strip() or export.CSV_ENCODING)
+            import_win.destroy()
+
+            def summary(task):
+                result = task.result
+                message = f"已导入{kind.label} {result.imported} 条"
+                if result.rejected:
+                    message += f"\n有 {result.rejected} 行未导入，原因见: {result.rejected_path}"
+                return message
+
+            self.run_export(task, f"批量导入{kind.label}", summary, action="处理")
+
+        ttk.Button(import_win, text="开始导入", command=start).grid(row=3, column=0, columnspan=3, pady=15)
 
     def add_user(self):
         # 创建添加用户的对话框
@@ -2096,31 +1868,21 @@ class HotelManagementSystem:
                 confirm_password_entry.focus_set()
                 return
 
-            # 打开新的数据库连接
-            conn = sqlite3.connect('hotel.db')
-            cursor = conn.cursor()
-
             try:
-                # 检查用户名是否已存在
-                cursor.execute("SELECT COUNT(*) FROM users WHERE username = ?", (username,))
-                if cursor.fetchone()[0] > 0:
-                    messagebox.showerror("错误", f"用户名 '{username}' 已存在", parent=add_user_window)
-                    username_entry.focus_set()
-                    return
-
-                # 添加新用户
-                password_hash = hashlib.sha256(password.encode()).hexdigest()
-                cursor.execute("INSERT INTO users (username, password_hash, role) VALUES (?, ?, ?)",
-                               (username, password_hash, role))
-                conn.commit()
-                messagebox.showinfo("成功", f"用户 '{username}' 添加成功", parent=add_user_window)
-                add_user_window.destroy()
-                self.update_status(f"用户 '{username}' 已添加")
+                self.service.add_user(username, password, role)
+            except service.Conflict as e:
+                messagebox.showerror("错误", str(e), parent=add_user_window)
+                username_entry.focus_set()
+                return
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e), parent=add_user_window)
+                return
             except sqlite3.Error as e:
-                conn.rollback()
                 messagebox.showerror("数据库错误", f"添加用户失败: {str(e)}", parent=add_user_window)
-            finally:
-                conn.close()
+                return
+            messagebox.showinfo("成功", f"用户 '{username}' 添加成功", parent=add_user_window)
+            add_user_window.destroy()
+            self.update_status(f"用户 '{username}' 已添加")
 
         # 为按钮添加调试功能
         ttk.Button(button_frame, text="打印值", command=print_values).pack(side=tk.LEFT, padx=5)
@@ -2163,12 +1925,8 @@ class HotelManagementSystem:
             user_tree.column(col, width=100)
 
         # 加载用户数据
-        cursor = self.conn.cursor()
-        cursor.execute("SELECT user_id, username, role FROM users ORDER BY username")
-        users = cursor.fetchall()
-
-        for user in users:
-            user_tree.insert("", tk.END, values=(user[1], user[2]), tags=(str(user[0]),))
+        for user in self.service.list_users(order_by="username"):
+            user_tree.insert("", tk.END, values=(user.username, user.role), tags=(str(user.user_id),))
 
         # 用户详情框架
         details_frame = ttk.LabelFrame(frame, text="用户详情", padding="10 10 10 10")
@@ -2207,14 +1965,14 @@ class HotelManagementSystem:
             selected_user_id.set(user_id)
 
             # 获取用户详情
-            cursor = self.conn.cursor()
-            cursor.execute("SELECT username, role FROM users WHERE user_id = ?", (user_id,))
-            user = cursor.fetchone()
+            try:
+                user = self.service.get_user(user_id)
+            except service.ServiceError:
+                return
 
-            if user:
-                username_var.set(user[0])
-                role_var.set(user[1])
-                password_var.set("")  # 清空密码字段
+            username_var.set(user.username)
+            role_var.set(user.role)
+            password_var.set("")  # 清空密码字段
 
         user_tree.bind("<<TreeviewSelect>>", on_user_select)
 
@@ -2229,17 +1987,9 @@ class HotelManagementSystem:
             new_password = password_var.get()
 
             try:
-                cursor = self.conn.cursor()
-
-                # 更新角色
-                cursor.execute("UPDATE users SET role = ? WHERE user_id = ?", (new_role, user_id))
+                # 更新角色；如果提供了新密码，则同时更新密码
+                self.service.update_user(user_id, new_role, new_password)
 
-                # 如果提供了新密码，则更新密码
-                if new_password:
-                    password_hash = self.hash_password(new_password)
-                    cursor.execute("UPDATE users SET password_hash = ? WHERE user_id = ?", (password_hash, user_id))
-
-                self.conn.commit()
                 messagebox.showinfo("成功", f"用户 '{username_var.get()}' 的信息已更新", parent=modify_user_window)
 
                 # 更新用户列表
@@ -2249,8 +1999,9 @@ class HotelManagementSystem:
                         break
 
                 self.update_status(f"用户 '{username_var.get()}' 的信息已更新")
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e), parent=modify_user_window)
             except sqlite3.Error as e:
-                self.conn.rollback()
                 messagebox.showerror("数据库错误", f"更新用户失败: {str(e)}", parent=modify_user_window)
 
         # 删除用户
@@ -2266,15 +2017,9 @@ class HotelManagementSystem:
             if not messagebox.askyesno("确认删除", f"确定要删除用户 '{username}' 吗？", parent=modify_user_window):
                 return
 
-            # 检查是否为当前登录用户
-            if int(user_id) == self.current_user['user_id']:
-                messagebox.showerror("错误", "不能删除当前登录的用户", parent=modify_user_window)
-                return
-
             try:
-                cursor = self.conn.cursor()
-                cursor.execute("DELETE FROM users WHERE user_id = ?", (user_id,))
-                self.conn.commit()
+                # 不能删除当前登录的用户
+                self.service.delete_user(user_id, self.current_user['user_id'])
 
                 # 从列表中移除
                 selected_items = user_tree.selection()
@@ -2289,8 +2034,9 @@ class HotelManagementSystem:
 
                 messagebox.showinfo("成功", f"用户 '{username}' 已删除", parent=modify_user_window)
                 self.update_status(f"用户 '{username}' 已删除")
+            except service.ServiceError as e:
+                messagebox.showerror("错误", str(e), parent=modify_user_window)
             except sqlite3.Error as e:
-                self.conn.rollback()
                 messagebox.showerror("数据库错误", f"删除用户失败: {str(e)}", parent=modify_user_window)
 
         # 按钮框架
@@ -2316,7 +2062,10 @@ class HotelManagementSystem:
 
         # 创建用户表格
         columns = ("ID", "用户名", "角色", "创建时间")
-        user_tree = ttk.Treeview(frame, columns=columns, show="headings", height=15)
+        user_tree = VirtualTreeview(frame, columns=columns, height=15,
+                                    format_row=lambda user: (user.user_id, user.username, user.role,
+                                                             user.create_time or "--"),
+                                    worker=self.worker)
         user_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
         # 添加滚动条
@@ -2337,32 +2086,12 @@ class HotelManagementSystem:
         user_tree.heading("创建时间", text="创建时间")
         user_tree.column("创建时间", width=150, anchor=tk.CENTER)
 
-        # 加载用户数据
-        # 注：SQLite默认不存储用户创建时间，这里我们假设有一个创建时间字段
-        # 如果没有，我们可以在下面的查询中修改或省略该字段
+        # 加载用户数据（users 表没有创建时间字段时显示"--"）
         try:
-            cursor = self.conn.cursor()
-            # 尝试查询包含创建时间的表结构
-            cursor.execute("PRAGMA table_info(users)")
-            columns_info = cursor.fetchall()
-            has_create_time = any(col[1] == 'create_time' for col in columns_info)
-
-            if has_create_time:
-                cursor.execute("SELECT user_id, username, role, create_time FROM users ORDER BY user_id")
-            else:
-                # 如果没有创建时间字段，我们使用"--"代替
-                cursor.execute("SELECT user_id, username, role FROM users ORDER BY user_id")
-
-            users = cursor.fetchall()
-
-            for user in users:
-                if has_create_time:
-                    user_tree.insert("", tk.END, values=user)
-                else:
-                    # 添加"--"作为创建时间占位符
-                    user_tree.insert("", tk.END, values=(user[0], user[1], user[2], "--"))
-
-            self.update_status(f"已加载 {len(users)} 个用户记录")
+            users = self.service.user_list()
+            user_tree.load(users)
+            self.worker.submit(users.count, owner=view_users_window,
+                               on_done=lambda count: self.update_status(f"共 {count} 个用户记录"))
         except sqlite3.Error as e:
             messagebox.showerror("数据库错误", f"加载用户数据失败: {str(e)}", parent=view_users_window)
 
@@ -2370,46 +2099,57 @@ class HotelManagementSystem:
         button_frame = ttk.Frame(view_users_window)
         button_frame.pack(pady=15)
 
-        ttk.Button(button_frame, text="刷新", command=lambda: self.refresh_user_list(user_tree, has_create_time),
+        ttk.Button(button_frame, text="刷新", command=lambda: self.refresh_user_list(user_tree),
                    width=10).pack(side=tk.LEFT, padx=5)
         ttk.Button(button_frame, text="关闭", command=view_users_window.destroy, width=10).pack(side=tk.LEFT, padx=5)
 
-    def refresh_user_list(self, tree_view, has_create_time=False):
-        # 清空现有数据
-        for item in tree_view.get_children():
-            tree_view.delete(item)
-
-        # 重新加载数据
+    def refresh_user_list(self, tree_view):
+        # 重新加载数据（保持当前排序）
         try:
-            cursor = self.conn.cursor()
-
-            if has_create_time:
-                cursor.execute("SELECT user_id, username, role, create_time FROM users ORDER BY user_id")
-            else:
-                cursor.execute("SELECT user_id, username, role FROM users ORDER BY user_id")
-
-            users = cursor.fetchall()
-
-            for user in users:
-                if has_create_time:
-                    tree_view.insert("", tk.END, values=user)
-                else:
-                    tree_view.insert("", tk.END, values=(user[0], user[1], user[2], "--"))
-
-            self.update_status(f"用户列表已刷新，共 {len(users)} 条记录")
+            users = self.service.user_list()
+            tree_view.load(users)
+            self.worker.submit(users.count, owner=tree_view,
+                               on_done=lambda count: self.update_status(f"用户列表已刷新，共 {count} 条记录"))
         except sqlite3.Error as e:
             messagebox.showerror("数据库错误", f"刷新用户数据失败: {str(e)}")
 
 # ==== 主程序 ====
 if __name__ == "__main__":
+    startup.mark("导入模块")
+
+    import argparse
+
+    parser = argparse.ArgumentParser(description="酒店住房管理系统")
+    parser.add_argument("--server", metavar="URL",
+                        help="以客户端模式连接 server.py，例如 http://127.0.0.1:8765（不给时直接使用本机的 hotel.db）")
+    parser.add_argument(startup.FLAG, action="store_true", help="在终端打印启动各阶段耗时")
+    args = parser.parse_args()
+
+    remote = None
+    if args.server:
+        import client
+        remote = client.RemoteService(args.server)
+
     def start_application(user):
+        startup.restart()
         root = tk.Tk()
-        app = HotelManagementSystem(root, user)
+        app = HotelManagementSystem(root, user, remote)
+        startup.mark("创建主窗口")
+        root.update_idletasks()
+        startup.mark("主窗口首次绘制")
+        startup.report("登录后到主窗口可用")
         root.mainloop()
+        app.worker.shutdown()
 
-    # 初始化数据库
-    init_db()
+    # 初始化数据库（客户端模式下由服务器负责）
+    if remote is None:
+        init_db()
+        startup.mark("数据库迁移")
 
     # 启动登录窗口
-    login_window = lo.LoginWindow(start_application)
+    login_window = lo.LoginWindow(start_application, remote)
+    startup.mark("创建登录窗口")
+    login_window.update_idletasks()
+    startup.mark("登录窗口首次绘制")
+    startup.report("到登录界面可用")
     login_window.mainloop()
\ No newline at end of file